@@ -26,6 +26,8 @@ from rich.console import Console
 from MiniCppLex      import print_lexer
 from MiniCppAST   import RenderTreeVisitor
 from MiniCppContext   import Context
+from MiniCppPasses    import PassManager
+from MiniCppBuiltins  import patterns, rng
 
 import argparse
 
@@ -67,18 +69,173 @@ def parse_args():
           action='store_true',
           help='Dump the symbol table')
   
+  mutex.add_argument(
+          '-I', '--ir',
+          action='store_true',
+          help='Dump the generated Intermediate representation (SSA)')
+
+  mutex.add_argument(
+          '-P', '--peval',
+          action='store_true',
+          help='Print the residual program after partial evaluation')
+
   mutex.add_argument(
           '--exec',
           action='store_true',
           help='Dump the symbol table')
 
-  return cli.parse_args()
+  ogroup = cli.add_argument_group('Optimization options')
+
+  ogroup.add_argument(
+          '-O',
+          type=int,
+          choices=[0, 1, 2],
+          default=1,
+          dest='level',
+          help='Optimization level: -O0, -O1 (default) or -O2')
+
+  ogroup.add_argument(
+          '--enable-pass',
+          action='append',
+          default=[],
+          choices=PassManager.names(),
+          metavar='PASS',
+          help=f'Run a pass regardless of the level ({", ".join(PassManager.names())})')
+
+  ogroup.add_argument(
+          '--disable-pass',
+          action='append',
+          default=[],
+          choices=PassManager.names(),
+          metavar='PASS',
+          help='Skip a pass regardless of the level')
+
+  ogroup.add_argument(
+          '-d', '--debug',
+          action='store_true',
+          default=False,
+          help='Verify the AST and the IR after each pass')
+
+  ogroup.add_argument(
+          '--time-passes',
+          action='store_true',
+          default=False,
+          help='Report the wall time and node-count change of each pass')
+
+  ogroup.add_argument(
+          '--tailcalls',
+          action='store_true',
+          default=False,
+          help='Report the tail calls converted to loops')
+
+  ogroup.add_argument(
+          '--stack',
+          action='store_true',
+          default=False,
+          help='Execute with the non-recursive evaluator (explicit stack)')
+
+  ogroup.add_argument(
+          '--stack-budget',
+          type=int,
+          default=256,
+          metavar='MB',
+          help='Memory budget in MB for the explicit stack (default: 256)')
+
+  ogroup.add_argument(
+          '--memo',
+          action='store_true',
+          default=False,
+          help='Cache the results of pure functions (needs the purity pass)')
+
+  ogroup.add_argument(
+          '--memo-size',
+          type=int,
+          default=1024,
+          metavar='N',
+          help='LRU cache entries per memoized function (default: 1024)')
+
+  ogroup.add_argument(
+          '--checked',
+          action='store_true',
+          default=False,
+          help='Check the bounds of every array access, even those proven safe')
+
+  ogroup.add_argument(
+          '--mem',
+          action='store_true',
+          default=False,
+          help='Report the memory used by arrays, per element type')
+
+  ogroup.add_argument(
+          '--re-cache',
+          type=int,
+          default=128,
+          metavar='N',
+          help='Compiled regular expressions kept by the re_* builtins (default: 128)')
+
+  ogroup.add_argument(
+          '--re-stats',
+          action='store_true',
+          default=False,
+          help='Report the hit rate of the compiled regular expression cache')
+
+  ogroup.add_argument(
+          '--seed',
+          type=int,
+          default=None,
+          metavar='N',
+          help='Non-negative seed of the rand_* builtins, for reproducible runs (default: random)')
+
+  ogroup.add_argument(
+          '--peval-budget',
+          type=int,
+          default=20000,
+          metavar='STEPS',
+          help='Loop iterations and calls allowed at compile time (default: 20000)')
+
+  ogroup.add_argument(
+          '--unroll-factor',
+          type=int,
+          default=4,
+          metavar='N',
+          help='Copies of the body per iteration of an unrolled loop (default: 4)')
+
+  ogroup.add_argument(
+          '--unroll-full',
+          type=int,
+          default=8,
+          metavar='N',
+          help='Fully unroll counted loops of at most N iterations (default: 8)')
+
+  args = cli.parse_args()
+  # El Generator de NumPy solo acepta semillas no negativas
+  if args.seed is not None and args.seed < 0:
+    cli.error('--seed must be a non-negative integer')
+  return args
 
 
 if __name__ == '__main__':
 
   args = parse_args()
   context = Context()
+  context.report_tailcalls = args.tailcalls
+  context.time_passes = args.time_passes
+  context.peval_budget = args.peval_budget
+  context.unroll_factor = args.unroll_factor
+  context.unroll_full = args.unroll_full
+  context.passes.level = args.level
+  context.passes.enabled = set(args.enable_pass)
+  context.passes.disabled = set(args.disable_pass)
+  context.passes.debug = args.debug
+  if args.memo:
+    context.interprete.memo_size = args.memo_size
+  context.interprete.mem_report = args.mem
+  context.interprete.checked = args.checked
+  context.interprete.re_report = args.re_stats
+  patterns.maxsize = args.re_cache
+  rng.seed(args.seed)
+  if args.stack:
+    context.interprete.stack_budget = args.stack_budget * 1024 * 1024
   console = Console()
 
   if args.input:
@@ -103,6 +260,14 @@ if __name__ == '__main__':
       context.parse(source)
       context.checker.print_table(context.ast)
     
+    elif args.ir:
+      context.parse(source)
+      context.dump_ir()
+
+    elif args.peval:
+      context.parse(source)
+      context.partial_eval(args.peval_budget)
+
     elif args.exec:
       context.parse(source)
       context.run()
@@ -189,6 +189,7 @@ class VarExpr(Expression):
 class ArrayLoockupExpr(Expression):
     ident : str
     expr  : Expression
+    safe = False        # indice en rango, ver MiniCppBounds
     
 @dataclass
 class CallExpr(Expression):
@@ -205,6 +206,7 @@ class ArrayAssignmentExpr(Expression):
     ident : str
     ndx   : Expression
     expr  : Expression
+    safe = False        # indice en rango, ver MiniCppBounds
     
 @dataclass
 class BinaryOpExpr(Expression):
@@ -303,7 +305,36 @@ class SprintfStmt(Expression):
     ident : str
     string : str
     args   : List[Expression] = field(default_factory=list)
-        
+
+#==========================================================
+# Recorrido generico
+#==========================================================
+
+from dataclasses import fields
+
+def children(node):
+    '''
+    Genera los nodos hijos directos de node (campos y listas de nodos)
+    '''
+    for f in fields(node):
+        value = getattr(node, f.name)
+        if isinstance(value, Node):
+            yield value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, Node):
+                    yield item
+
+def walk(node):
+    '''
+    Genera node y todos sus descendientes (preorden)
+    '''
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(list(children(node))))
+
 #==========================================================
 # Render del AST - RICH
 #==========================================================
@@ -580,3 +611,199 @@ class RenderTreeVisitor(Visitor):
             self.visit(root_node, tree)
             console = Console()
             console.print(tree)
+
+#==========================================================
+# Generacion de codigo fuente Mini-C++ a partir del AST
+#==========================================================
+
+class SourceVisitor(Visitor):
+    '''
+    Reconstruye el texto fuente de un AST (usado para mostrar los
+    programas residuales de las transformaciones)
+    '''
+    indent = '    '
+
+    @classmethod
+    def unparse(cls, node):
+        return node.accept(cls(), 0)
+
+    def _block(self, n, level):
+        if isinstance(n, CompoundStmt):
+            return n.accept(self, level)
+        return '{\n' + self._stmt(n, level + 1) + '\n' + self.indent * level + '}'
+
+    def _stmt(self, n, level):
+        text = n.accept(self, level)
+        if isinstance(n, Expression) and not isinstance(n, (ExprStmt, PrintfStmt, ScanfStmt, SprintfStmt)):
+            text += ';'
+        return self.indent * level + text
+
+    def _operand(self, n):
+        text = n.accept(self, 0)
+        if isinstance(n, (BinaryOpExpr, LogicalOpExpr, VarAssignmentExpr, OperatorAssign)):
+            return f'({text})'
+        return text
+
+    def _args(self, args):
+        return ', '.join(arg.accept(self, 0) for arg in (args or []))
+
+    def _string(self, value):
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+        value = value.replace('\n', '\\n').replace('\t', '\\t').replace('\r', '\\r')
+        return f'"{value}"'
+
+    # Declaraciones
+
+    def visit(self, n: Program, level: int):
+        return '\n\n'.join(decl.accept(self, level) for decl in n.decls) + '\n'
+
+    def visit(self, n: VarDeclStmt, level: int):
+        if n.expr is not None:
+            return f'{n._type} {n.ident} = {n.expr.accept(self, 0)};'
+        return f'{n._type} {n.ident};'
+
+    def visit(self, n: ArrayDeclStmt, level: int):
+        return f'{n._type} {n.ident}[];'
+
+    def visit(self, n: FuncDeclStmt, level: int):
+        params = []
+        for p in n.params or []:
+            params.append(f'{p._type} {p.ident}[]' if isinstance(p, ArrayDeclStmt) else f'{p._type} {p.ident}')
+        return f'{n._type} {n.ident}({", ".join(params)}) ' + self._block(n.stmts, level)
+
+    def visit(self, n: ClassDeclStmt, level: int):
+        sclass = f' : {n.sclass}' if isinstance(n.sclass, str) else ''
+        body = '\n\n'.join(self.indent * (level + 1) + m.accept(self, level + 1) for m in n.class_body)
+        return f'class {n.ident}{sclass} {{\n{body}\n{self.indent * level}}};'
+
+    # Statements
+
+    def visit(self, n: CompoundStmt, level: int):
+        lines = [ self._stmt(d, level + 1) for d in n.decls ]
+        lines += [ self._stmt(s, level + 1) for s in n.stmts ]
+        if not n.stmts:
+            lines.append(self.indent * (level + 1) + ';')
+        return '{\n' + '\n'.join(lines) + '\n' + self.indent * level + '}'
+
+    def visit(self, n: NullStmt, level: int):
+        return ';'
+
+    def visit(self, n: ExprStmt, level: int):
+        return n.expr.accept(self, 0) + ';'
+
+    def visit(self, n: IfStmt, level: int):
+        text = f'if ({n.expr.accept(self, 0)}) ' + self._block(n.then, level)
+        if n.else_:
+            text += ' else ' + self._block(n.else_, level)
+        return text
+
+    def visit(self, n: WhileStmt, level: int):
+        return f'while ({n.expr.accept(self, 0)}) ' + self._block(n.stmt, level)
+
+    def visit(self, n: ForStmt, level: int):
+        if isinstance(n.init, VarDeclStmt):
+            init = n.init.accept(self, 0)
+        else:
+            init = n.init.accept(self, 0) + ';'
+        return f'for ({init} {n.cond.accept(self, 0)}; {n.iter.accept(self, 0)}) ' + self._block(n.stmt, level)
+
+    def visit(self, n: ReturnStmt, level: int):
+        if n.expr is None:
+            return 'return;'
+        return f'return {n.expr.accept(self, 0)};'
+
+    def visit(self, n: BreakStmt, level: int):
+        return 'break;'
+
+    def visit(self, n: ContinueStmt, level: int):
+        return 'continue;'
+
+    def visit(self, n: PrintfStmt, level: int):
+        if n.args:
+            return f'printf({self._string(n.string)}, {self._args(n.args)});'
+        return f'printf({self._string(n.string)});'
+
+    def visit(self, n: ScanfStmt, level: int):
+        args = ', '.join('&' + arg.accept(self, 0) for arg in n.args)
+        return f'scanf({self._string(n.string)}, {args});'
+
+    def visit(self, n: SprintfStmt, level: int):
+        return f'sprintf({n.ident}, {self._string(n.string)}, {self._args(n.args)});'
+
+    # Expresiones
+
+    def visit(self, n: ConstExpr, level: int):
+        if isinstance(n.value, bool):
+            return 'True' if n.value else 'False'
+        if isinstance(n.value, str):
+            return self._string(n.value)
+        return repr(n.value)
+
+    def visit(self, n: VarExpr, level: int):
+        return n.ident
+
+    def visit(self, n: ArrayLoockupExpr, level: int):
+        return f'{n.ident}[{n.expr.accept(self, 0)}]'
+
+    def visit(self, n: CallExpr, level: int):
+        return f'{n.ident}({self._args(n.args)})'
+
+    def visit(self, n: VarAssignmentExpr, level: int):
+        return f'{n.var} = {n.expr.accept(self, 0)}'
+
+    def visit(self, n: ArrayAssignmentExpr, level: int):
+        return f'{n.ident}[{n.ndx.accept(self, 0)}] = {n.expr.accept(self, 0)}'
+
+    def visit(self, n: BinaryOpExpr, level: int):
+        return f'{self._operand(n.left)} {n.opr} {self._operand(n.right)}'
+
+    def visit(self, n: LogicalOpExpr, level: int):
+        return f'{self._operand(n.left)} {n.opr} {self._operand(n.right)}'
+
+    def visit(self, n: UnaryOpExpr, level: int):
+        return f'{n.opr}{self._operand(n.expr)}'
+
+    def visit(self, n: Grouping, level: int):
+        return f'({n.expr.accept(self, 0)})'
+
+    def visit(self, n: IntToFloatExpr, level: int):
+        return f'IntToFloat({n.expr.accept(self, 0)})'
+
+    def visit(self, n: CastExpr, level: int):
+        return f'cast {n._type}({n.expr.accept(self, 0)})'
+
+    def visit(self, n: NewArrayExpr, level: int):
+        return f'new {n._type}[{n.expr.accept(self, 0)}]'
+
+    def visit(self, n: ArraySizeExpr, level: int):
+        return f'ArraySize({n.ident})'
+
+    def visit(self, n: SizeOfExpr, level: int):
+        return f'size({n.ident})'
+
+    def visit(self, n: PreInc, level: int):
+        return f'++{n.expr.accept(self, 0)}'
+
+    def visit(self, n: PreDec, level: int):
+        return f'--{n.expr.accept(self, 0)}'
+
+    def visit(self, n: PostInc, level: int):
+        return f'{n.expr.accept(self, 0)}++'
+
+    def visit(self, n: PostDec, level: int):
+        return f'{n.expr.accept(self, 0)}--'
+
+    def visit(self, n: OperatorAssign, level: int):
+        return f'{n.expr0.accept(self, 0)} {n.op} {n.expr1.accept(self, 0)}'
+
+    def visit(self, n: Get, level: int):
+        return f'{n.obj.accept(self, 0)}.{n.name}'
+
+    def visit(self, n: Set, level: int):
+        return f'{n.obj.accept(self, 0)}.{n.name} = {n.expr.accept(self, 0)}'
+
+    def visit(self, n: This, level: int):
+        return 'this'
+
+    def visit(self, n: Super, level: int):
+        return f'super.{n.name}'
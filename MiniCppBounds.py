@@ -0,0 +1,365 @@
+# mcbounds.py
+'''
+Eliminacion de revisiones de limites
+====================================
+Cada lectura a[e] y escritura a[e] = x revisa que el indice este dentro
+del arreglo. En ciclos como
+
+    for (i = 0; i < ArraySize(a); i++) { s += a[i]; }
+
+la revision sobra: el analisis de rangos de este modulo lo demuestra y
+marca el nodo ArrayLoockupExpr/ArrayAssignmentExpr con n.safe = True,
+de modo que el Interpreter accede al buffer sin revisar.
+
+Rangos
+------
+Los limites se representan como (base, desplazamiento): base es None
+(una constante), ('var', n) o ('size', a) para ArraySize(a)/size(a).
+Un indice i + c es seguro en a si el rango de i desplazado por c cae en
+[0, size(a) - 1]. Los rangos de las variables salen de:
+
+  * ciclos for contados (ver MiniCppLoops): i recorre [inicio, N - 1]
+    (o [N + 1, inicio] si el paso es negativo) y el cuerpo no lo cambia;
+
+  * ciclos while(i < N) o while(i + c < N) cuyo cuerpo solo incrementa i
+    con sentencias de primer nivel (i++, i += k...). Antes de la primera
+    sentencia i <= N - 1 - c; despues de cada incremento el limite
+    superior sube en el paso. El limite inferior es el valor que tiene i
+    al entrar al ciclo (ver _entry). Los ciclos while(i >= N) que solo
+    decrementan i son el caso simetrico. Esto cubre tambien los ciclos
+    que genera LoopUnroller.
+
+size(a) tambien se conoce como una constante o una variable n cuando a
+es un arreglo local asignado una sola vez con 'a = new T[n]' fuera de
+ciclos y n no cambia en la funcion (ver _sizes).
+
+Con --checked el Interpreter ignora las marcas y revisa todos los
+accesos.
+'''
+from MiniCppAST   import *
+from MiniCppLoops import (match_counted, declared_types, assigned_names,
+                          calls_user_functions, _invariant, _step, _int_const, _var)
+
+
+def _norm(expr):
+  '''
+  Limite (base, desplazamiento) de una expresion entera, o None
+  '''
+  if _int_const(expr):
+    return (None, expr.value)
+  if isinstance(expr, VarExpr):
+    return (('var', expr.ident), 0)
+  if isinstance(expr, (ArraySizeExpr, SizeOfExpr)):
+    return (('size', expr.ident), 0)
+  if isinstance(expr, Grouping):
+    return _norm(expr.expr)
+  if isinstance(expr, BinaryOpExpr) and expr.opr in ('+', '-'):
+    sign = 1 if expr.opr == '+' else -1
+    left, right = _norm(expr.left), _norm(expr.right)
+    if left is not None and right is not None and right[0] is None:
+      return (left[0], left[1] + sign * right[1])
+    if left is not None and right is not None and left[0] is None and sign > 0:
+      return (right[0], right[1] + left[1])
+  return None
+
+
+def _shift(bound, delta):
+  return (bound[0], bound[1] + delta)
+
+
+def _writes(n, var):
+  '''
+  True si el nodo n (no sus hijos) escribe la variable var
+  '''
+  if isinstance(n, VarAssignmentExpr):
+    return n.var == var
+  if isinstance(n, OperatorAssign):
+    return _var(n.expr0, var)
+  if isinstance(n, (PreInc, PreDec, PostInc, PostDec)):
+    return _var(n.expr, var)
+  if isinstance(n, VarDeclStmt):
+    return n.ident == var
+  if isinstance(n, ScanfStmt):
+    return any(_var(a, var) for a in n.args)
+  if isinstance(n, SprintfStmt):
+    return n.ident == var
+  return False
+
+
+def _top_step(stmt, var):
+  '''
+  Paso si stmt es una sentencia 'i++', 'i -= k', 'i = i + k'...
+  '''
+  if isinstance(stmt, ExprStmt):
+    return _step(stmt.expr, var)
+  return None
+
+
+def _monotone(node, var, sign):
+  '''
+  True si todas las escrituras de var dentro de node son pasos con el
+  signo de sign (incrementos si sign > 0, decrementos si sign < 0)
+  '''
+  for n in walk(node):
+    if _writes(n, var):
+      if isinstance(n, (VarDeclStmt, ScanfStmt, SprintfStmt)):
+        return False
+      step = _step(n, var)
+      if not step or (step > 0) != (sign > 0):
+        return False
+  return True
+
+
+def _count_writes(node, var):
+  return sum(1 for n in walk(node) if _writes(n, var))
+
+
+def _in_loops(node):
+  '''
+  ids de los nodos que estan dentro de algun ciclo
+  '''
+  inside = set()
+  for n in walk(node):
+    if isinstance(n, (WhileStmt, ForStmt)):
+      inside.update(id(m) for m in walk(n) if m is not n)
+  return inside
+
+
+def _sizes(func: FuncDeclStmt, program: Program):
+  '''
+  Tamanos conocidos (base, desplazamiento) de los arreglos locales de
+  func que se asignan una sola vez con 'a = new T[n]'
+  '''
+  top = { d.ident for d in func.stmts.decls if isinstance(d, (VarDeclStmt, ArrayDeclStmt)) }
+  declared = { }
+  for n in walk(func.stmts):
+    if isinstance(n, (VarDeclStmt, ArrayDeclStmt)):
+      declared[n.ident] = declared.get(n.ident, 0) + 1
+  params = { p.ident for p in func.params or [] }
+  globals = { d.ident: d for d in program.decls if isinstance(d, VarDeclStmt) }
+  funcs = [ d for d in program.decls if isinstance(d, FuncDeclStmt) ]
+  loops = _in_loops(func.stmts)
+
+  def fixed(name):
+    # n no cambia mientras se ejecuta la funcion
+    if name in params:
+      return name not in declared and _count_writes(func.stmts, name) == 0
+    if name in declared:
+      return name in top and declared[name] == 1 and _count_writes(func.stmts, name) == 1 \
+             and not any(_writes(n, name) and id(n) in loops for n in walk(func.stmts))
+    return name in globals and \
+           all(_count_writes(f, name) == 0 for f in funcs)
+
+  consts = { name: d.expr.value for name, d in globals.items()
+             if _int_const(d.expr) and name not in declared and name not in params and fixed(name) }
+  sizes = { }
+  for name, count in declared.items():
+    if count != 1 or name not in top or name in params:
+      continue
+    decl = next(d for d in func.stmts.decls if d.ident == name)
+    if not isinstance(decl, ArrayDeclStmt):
+      continue
+    allocs = [ n for n in walk(func.stmts) if _writes(n, name) ]
+    if len(allocs) != 1:
+      continue
+    alloc = allocs[0]
+    if not (isinstance(alloc, VarAssignmentExpr) and isinstance(alloc.expr, NewArrayExpr)) \
+       or id(alloc) in loops:
+      continue
+    size = _norm(alloc.expr.expr)
+    if size is None or size[0] is not None and (size[0][0] != 'var' or not fixed(size[0][1])):
+      continue
+    sizes[name] = [ size ]
+    if size[0] is not None and size[0][1] in consts:
+      # Global que nadie modifica: la evaluacion parcial puede haberla
+      # reemplazado por su valor en las condiciones de los ciclos
+      sizes[name].append((None, consts[size[0][1]] + size[1]))
+  return sizes
+
+
+class BoundsAnalyzer(Visitor):
+  '''
+  Marca con n.safe = True los accesos a arreglos con indice en rango
+  '''
+  def __init__(self):
+    self.types  = { }
+    self.locals = set()
+    self.sizes  = { }
+    self.marked = [ ]
+
+  @classmethod
+  def mark(cls, program: Program):
+    analyzer = cls()
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        analyzer.types, analyzer.locals = declared_types(decl, program)
+        analyzer.sizes = _sizes(decl, program)
+        decl.stmts.accept(analyzer, { })
+    return analyzer.marked
+
+  # Rangos
+
+  def _safe(self, ident, ndx, ranges):
+    index = _norm(ndx)
+    if index is None or index[0] is None or index[0][0] != 'var':
+      return False
+    var = index[0][1]
+    if var not in ranges:
+      return False
+    lo, hi = ranges[var]
+    lo, hi = _shift(lo, index[1]), _shift(hi, index[1])
+    if lo[0] is not None or lo[1] < 0:
+      return False
+    # hi < size(a)
+    if hi[0] == ('size', ident) and hi[1] < 0:
+      return True
+    return any(hi[0] == size[0] and hi[1] < size[1] for size in self.sizes.get(ident, ()))
+
+  def _without(self, ranges, names):
+    return { var: r for var, r in ranges.items() if var not in names }
+
+  # Sentencias
+
+  def visit(self, n: CompoundStmt, ranges):
+    for decl in n.decls:
+      decl.accept(self, ranges)
+    for k, stmt in enumerate(n.stmts):
+      if isinstance(stmt, WhileStmt):
+        self._while(stmt, ranges, n, k)
+      else:
+        stmt.accept(self, ranges)
+
+  def visit(self, n: ForStmt, ranges):
+    for child in (n.init, n.cond, n.iter):
+      if child is not None:
+        child.accept(self, ranges)
+    body = self._without(ranges, assigned_names(n))
+    loop = match_counted(n, self.types, self.locals, exits=True)
+    if loop is not None:
+      start, bound = _norm(loop.start), _norm(loop.bound)
+      if start is not None and bound is not None:
+        if loop.step > 0:
+          body[loop.var] = (start, _shift(bound, -1 if loop.opr == '<' else 0))
+        elif _invariant(loop.start, loop.var, assigned_names(n.stmt), self.locals,
+                        calls_user_functions(n.stmt)):
+          # El inicio es el limite superior: el cuerpo no lo puede cambiar
+          body[loop.var] = (_shift(bound, 1 if loop.opr == '>' else 0), start)
+    n.stmt.accept(self, body)
+
+  def visit(self, n: WhileStmt, ranges):
+    self._while(n, ranges, None, None)
+
+  def _while(self, n, ranges, block, k):
+    n.expr.accept(self, ranges)
+    outer = self._without(ranges, assigned_names(n.stmt))
+    match = self._match_while(n)
+    entry = match and block is not None and self._entry(block, k, n, *match[:2])
+    if not entry:
+      n.stmt.accept(self, outer)
+      return
+
+    # El limite de la condicion acota el lado hacia el que avanza i; el
+    # valor de entrada acota el otro
+    var, sign, bound = match
+    lo, hi = (entry, bound) if sign > 0 else (bound, entry)
+    body = n.stmt
+    inner = dict(outer, **{ var: (lo, hi) })
+    for decl in body.decls:
+      decl.accept(self, inner)
+    for stmt in body.stmts:
+      step = _top_step(stmt, var) if var in inner else None
+      if step:
+        lo, hi = inner[var]
+        inner[var] = (lo, _shift(hi, step)) if sign > 0 else (_shift(lo, step), hi)
+      elif var in inner and any(_writes(m, var) for m in walk(stmt)):
+        # Paso anidado: ya no se conoce el limite
+        del inner[var]
+        stmt.accept(self, inner)
+      else:
+        stmt.accept(self, inner)
+
+  def _match_while(self, n):
+    '''
+    (var, sentido, limite) de while(i + c < N) o while(i + c >= N): el
+    limite de i al inicio del cuerpo hacia donde avanza
+    '''
+    cond = n.expr
+    if not (isinstance(n.stmt, CompoundStmt) and isinstance(cond, BinaryOpExpr)):
+      return None
+    if cond.opr not in ('<', '<=', '>', '>='):
+      return None
+    left, bound = _norm(cond.left), _norm(cond.right)
+    if left is None or bound is None or left[0] is None or left[0][0] != 'var':
+      return None
+    var = left[0][1]
+    sign = 1 if cond.opr in ('<', '<=') else -1
+    if self.types.get(var) != 'int' or not _monotone(n.stmt, var, sign):
+      return None
+    written = assigned_names(n.stmt)
+    user_calls = calls_user_functions(n.stmt)
+    if var not in self.locals and user_calls:
+      return None
+    if not _invariant(cond.right, var, written, self.locals, user_calls):
+      return None
+    strict = 1 if cond.opr in ('<', '>') else 0
+    return var, sign, _shift(bound, -left[1] - sign * strict)
+
+  def _entry(self, block, k, loop, var, sign):
+    '''
+    Limite de var al entrar al while block.stmts[k]: el valor de la
+    ultima asignacion 'i = e' antes del ciclo en el mismo bloque (o de
+    la declaracion 'int i = e' del bloque), saltando ciclos while que
+    mueven i en el mismo sentido. e tiene que seguir valiendo lo mismo
+    dentro del ciclo.
+    '''
+    skipped, calls = set(), False
+    expr = None
+    for stmt in reversed(block.stmts[:k]):
+      if var not in assigned_names(stmt):
+        skipped |= assigned_names(stmt)
+        calls = calls or calls_user_functions(stmt)
+        continue
+      if isinstance(stmt, ExprStmt) and isinstance(stmt.expr, VarAssignmentExpr) \
+         and stmt.expr.var == var:
+        expr = stmt.expr.expr
+        break
+      if isinstance(stmt, WhileStmt) and _monotone(stmt, var, sign):
+        skipped |= assigned_names(stmt) - { var }
+        calls = calls or calls_user_functions(stmt)
+        continue
+      return None
+    else:
+      for decl in block.decls:
+        if isinstance(decl, VarDeclStmt) and decl.ident == var:
+          expr = decl.expr
+    if var not in self.locals and calls:
+      return None
+
+    entry = _norm(expr) if expr is not None else None
+    if entry is None or entry[0] is None:
+      return entry
+    ident = entry[0][1]
+    written = skipped | assigned_names(loop.stmt)
+    calls = calls or calls_user_functions(loop.stmt)
+    if ident == var or ident in written or (ident not in self.locals and calls):
+      return None
+    return entry
+
+  # Accesos
+
+  def visit(self, n: ArrayLoockupExpr, ranges):
+    n.expr.accept(self, ranges)
+    if self._safe(n.ident, n.expr, ranges):
+      n.safe = True
+      self.marked.append(n)
+
+  def visit(self, n: ArrayAssignmentExpr, ranges):
+    n.ndx.accept(self, ranges)
+    n.expr.accept(self, ranges)
+    if self._safe(n.ident, n.ndx, ranges):
+      n.safe = True
+      self.marked.append(n)
+
+  def visit(self, n: Node, ranges):
+    for child in children(n):
+      child.accept(self, ranges)
@@ -2,10 +2,21 @@
 from abc     import ABC, abstractmethod
 from pathlib import Path
 
+from collections import Counter
+
+import array as pyarray
+import heapq
 import math
+import random
+import re
 import statistics
+import struct
+import sys
 import time
 
+from MiniCpptypes import np, LRUCache, File, ListView, Array, Matrix, Container, Dict, Heap, Deque, StrBuf, StrView, array_dtypes, mapped_typecodes
+from MiniCpptypesys import record_fields, record_field_types
+
 
 # ----------------------------------------
 # clases abstractas
@@ -20,6 +31,10 @@ class BuiltinFunction(ABC):  # pragma: no cover
   '''
   _shortname: str
 
+  # Sin efectos secundarios ni dependencia de estado externo. Las
+  # funciones de usuario que solo llaman builtins puros son memoizables
+  pure = False
+
   @property
   @abstractmethod
   def arity(self) -> int:
@@ -37,6 +52,7 @@ class BuiltinFunction(ABC):  # pragma: no cover
 #
 class Chr(BuiltinFunction):
   _shortname = "chr"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -67,6 +83,7 @@ class Clock(BuiltinFunction):
 
 class Format(BuiltinFunction):
   _shortname = "format"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -96,19 +113,195 @@ class Input(BuiltinFunction):
   def __call__(self, _, *args):
     '''
     Prompt the user for a line of input using the provided prompt.
+    The line comes from the same buffer as scanf; at the end of the
+    input return "" and set eof().
     '''
     if len(args) == 0:
-      return input()
+      return stdin.read_line()
     elif len(args) == 1:
       if not isinstance(args[0], str):
         raise CallError(f"Argumento de '{self._shortname}' debe ser String")
-      return input(args[0])
+      print(args[0], end='', flush=True)
+      return stdin.read_line()
 
     raise CallError(f"Error en argumentos de '{self._shortname}'")
 
 
+class ScanArray(BuiltinFunction):
+  _shortname = "scan_array"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Read the next n values of the standard input (all the array by
+    default) into an int, float or str array and return how many were
+    read. The tokens are converted in bulk, without a scanf per value.
+    '''
+    if len(args) not in (1, 2):
+      raise CallError(f"'{self._shortname}' recibe el arreglo y opcionalmente la cantidad")
+    array = args[0]
+    if not isinstance(array, Array) or array._type not in Scanner.conversions:
+      raise CallError(f"El 1er argumento de '{self._shortname}' debe ser un arreglo int, float o str")
+    size = args[1] if len(args) == 2 else len(array)
+    if not isinstance(size, int) or not 0 <= size <= len(array):
+      raise CallError(f"Cantidad {size} incorrecta en '{self._shortname}' (tamano {len(array)})")
+    if not array.writable:
+      raise CallError(f"El arreglo de '{self._shortname}' es de solo lectura")
+    try:
+      values = stdin.values(array._type, size)
+    except ValueError as err:
+      raise CallError(f"{self._shortname}: {err}")
+    _fill_array(array, values)
+    return len(values)
+
+
+class Scanner:
+  '''
+  Lector de la entrada estandar para scanf, scan_array e input. Lee
+  sys.stdin.buffer en bloques de BUFSIZE bytes y separa los tokens
+  directamente de los bytes del bloque: un token (o una linea) que
+  cruza el borde del bloque se completa con el siguiente
+  '''
+  BUFSIZE = 1 << 20
+
+  _token = re.compile(rb'\s*(\S+)')
+  _space = re.compile(rb'\s')
+  _specifier = re.compile(r'%([dfs])')
+
+  conversions = {
+    'int'   : int,
+    'float' : float,
+    'str'   : bytes.decode,
+  }
+  specifiers = {
+    'd' : 'int',
+    'f' : 'float',
+    's' : 'str',
+  }
+
+  def __init__(self, stream=None):
+    self.stream = stream
+    self.buffer = b''
+    self.pos    = 0
+    self.eof    = False
+
+  def _fill(self) -> bool:
+    '''
+    Agrega el siguiente bloque a lo que queda sin leer del buffer.
+    Retorna False al final de la entrada
+    '''
+    if self.stream is None:
+      self.stream = sys.stdin.buffer
+    # read1 no espera a llenar el bloque: en una terminal llega una linea
+    chunk = self.stream.read1(self.BUFSIZE)
+    if not chunk:
+      return False
+    self.buffer = self.buffer[self.pos:] + chunk
+    self.pos = 0
+    return True
+
+  def token(self):
+    '''
+    Siguiente token (bytes) o None al final de la entrada
+    '''
+    while True:
+      match = self._token.match(self.buffer, self.pos)
+      # Un token que llega al borde del buffer puede seguir en el proximo bloque
+      if match and match.end() < len(self.buffer):
+        self.pos = match.end()
+        return match.group(1)
+      if not self._fill():
+        self.pos = len(self.buffer)
+        if match:
+          return match.group(1)
+        self.eof = True
+        return None
+
+  def tokens(self, count: int) -> list:
+    '''
+    Hasta count tokens seguidos, partiendo cada bloque con bytes.split
+    '''
+    tokens = []
+    while len(tokens) < count:
+      # Solo la parte del buffer que termina en un espacio tiene tokens completos
+      end = len(self.buffer)
+      while end > self.pos and not self._space.match(self.buffer, end - 1):
+        end -= 1
+      if end > self.pos:
+        left = count - len(tokens)
+        parts = self.buffer[self.pos:end].split(None, left)
+        if len(parts) > left:
+          rest = parts.pop()
+          self.pos = end - len(rest)
+        else:
+          self.pos = end
+        tokens.extend(parts)
+        if len(tokens) == count:
+          # Como en scanf, el espacio que sigue al ultimo token no se consume
+          while self.pos > 0 and self._space.match(self.buffer, self.pos - 1):
+            self.pos -= 1
+          break
+      if not self._fill():
+        tokens.extend(self.buffer[self.pos:].split()[:count - len(tokens)])
+        self.pos = len(self.buffer)
+        if len(tokens) < count:
+          self.eof = True
+        break
+    return tokens
+
+  def values(self, _type: str, count: int) -> list:
+    convert = self.conversions[_type]
+    try:
+      return list(map(convert, self.tokens(count)))
+    except (ValueError, UnicodeDecodeError):
+      raise ValueError(f"la entrada no es una secuencia de valores {_type}")
+
+  def scanf(self, string: str) -> list:
+    '''
+    Valores de los %d, %f y %s del formato, en orden. El resto del
+    formato no se compara con la entrada: los valores se separan por
+    espacios. Al final de la entrada la lista queda incompleta
+    '''
+    values = []
+    for spec in self._specifier.findall(string):
+      token = self.token()
+      if token is None:
+        break
+      try:
+        values.append(self.conversions[self.specifiers[spec]](token))
+      except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"'%{spec}' no acepta '{token.decode(errors='replace')}'")
+    return values
+
+  def read_line(self) -> str:
+    '''
+    Resto de la linea actual, sin el '\\n'. Al final de la entrada
+    retorna ''
+    '''
+    while True:
+      end = self.buffer.find(b'\n', self.pos)
+      if end >= 0:
+        line = self.buffer[self.pos:end]
+        self.pos = end + 1
+        return line.decode()
+      if not self._fill():
+        line = self.buffer[self.pos:]
+        self.pos = len(self.buffer)
+        if not line:
+          self.eof = True
+        return line.decode()
+
+
+# Entrada estandar compartida por scanf, scan_array e input
+stdin = Scanner()
+
+
 class Integer(BuiltinFunction):
   _shortname = 'int'
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -125,6 +318,7 @@ class Integer(BuiltinFunction):
 
 class Ord(BuiltinFunction):
   _shortname = "ord"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -136,9 +330,9 @@ class Ord(BuiltinFunction):
     Unicode code point of the input
     character.
     '''
-    if not isinstance(args[0], str):
+    if not isinstance(args[0], (str, StrView)):
       raise CallError(f"El argumento de '{self._shortname}' es incorrecto")
-    return ord(args[0])
+    return ord(str(args[0]))
 
 
 class ReadText(BuiltinFunction):
@@ -156,8 +350,83 @@ class ReadText(BuiltinFunction):
     return Path(args[0]).read_text()
 
 
+class WriteText(BuiltinFunction):
+  _shortname = "write_text"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Write a string (or a view) to the specified file, replacing its
+    contents.
+    '''
+    path, text = args
+    if not isinstance(path, (str, StrView)) or not isinstance(text, (str, StrView)):
+      raise CallError(f"Los argumentos de '{self._shortname}' deben ser cadenas")
+    try:
+      Path(str(path)).write_text(str(text))
+    except OSError as err:
+      raise CallError(f"No se pudo escribir '{path}': {err.strerror}")
+
+
+class MapArray(BuiltinFunction):
+  _shortname = "map_array"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Map a binary file of native int, float or bool values as an
+    array, without reading it upfront. Mode "r" (the default) is
+    read-only; with "rw" writes go to the file and are flushed when
+    the program ends.
+    '''
+    if len(args) not in (2, 3):
+      raise CallError(f"'{self._shortname}' recibe la ruta, el tipo y opcionalmente el modo")
+    path, _type, mode = (*args, 'r')[:3]
+    if mode not in ('r', 'rw'):
+      raise CallError(f"Modo '{mode}' incorrecto en '{self._shortname}': debe ser \"r\" o \"rw\"")
+    return _map(self._shortname, path, _type, mode, 0)
+
+
+class MapCreate(BuiltinFunction):
+  _shortname = "map_create"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Create (or truncate) a binary file with room for n zeroed values
+    and map it read-write as an array.
+    '''
+    path, _type, size = args
+    if not isinstance(size, int) or size < 0:
+      raise CallError(f"El tamano de '{self._shortname}' debe ser un entero no negativo")
+    return _map(self._shortname, path, _type, 'w', size)
+
+
+def _map(name, path, _type, mode, size):
+  if not isinstance(path, str):
+    raise CallError(f"La ruta de '{name}' debe ser una cadena")
+  if _type not in mapped_typecodes:
+    raise CallError(f"Tipo '{_type}' no soportado en '{name}': debe ser int, float o bool")
+  try:
+    return Array.map(_type, path, mode, size)
+  except OSError as err:
+    raise CallError(f"No se pudo abrir '{path}': {err.strerror}")
+  except ValueError as err:
+    raise CallError(str(err))
+
+
 class String(BuiltinFunction):
   _shortname = 'str'
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -171,11 +440,299 @@ class String(BuiltinFunction):
     return str(args[0])
 
 
+# ----------------------------------------
+# Files
+#
+class Open(BuiltinFunction):
+  _shortname = "open"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Open a file and return its handle. Mode "r" (the default) reads,
+    "w" creates or truncates, "a" appends and "m" maps the file in
+    memory for read-only access. Reads and writes are buffered.
+    '''
+    if len(args) not in (1, 2):
+      raise CallError(f"'{self._shortname}' recibe la ruta y opcionalmente el modo")
+    path, mode = (*args, 'r')[:2]
+    if not isinstance(path, (str, StrView)):
+      raise CallError(f"La ruta de '{self._shortname}' debe ser una cadena")
+    if mode not in File.modes:
+      raise CallError(f"Modo '{mode}' incorrecto en '{self._shortname}': debe ser \"r\", \"w\", \"a\" o \"m\"")
+    try:
+      return File(str(path), mode)
+    except OSError as err:
+      raise CallError(f"No se pudo abrir '{path}': {err.strerror}")
+
+
+class Close(BuiltinFunction):
+  _shortname = "close"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Flush and close a file. Closing it twice does nothing.
+    '''
+    if not isinstance(args[0], File):
+      raise CallError(f"El argumento de '{self._shortname}' debe ser un archivo")
+    args[0].close()
+
+
+class Eof(BuiltinFunction):
+  _shortname = "eof"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Return true once a read found no more data in the file or, with
+    no arguments, in the standard input.
+    '''
+    if len(args) == 0:
+      return stdin.eof
+    if len(args) != 1:
+      raise CallError(f"'{self._shortname}' recibe un archivo o ningun argumento")
+    return _file_arg(self._shortname, args[0]).eof
+
+
+class ReadLine(BuiltinFunction):
+  _shortname = "read_line"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the next line of the file without its newline. At the end
+    of the file return "" and set eof.
+    '''
+    file = _file_arg(self._shortname, args[0], reading=True)
+    try:
+      return file.read_line()
+    except UnicodeDecodeError:
+      raise CallError(f"'{file.path}' no es un archivo de texto UTF-8")
+
+
+class ReadBytes(BuiltinFunction):
+  _shortname = "read_bytes"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Fill an int, float or bool array with the next native values of
+    the file (as written by write_bytes or map_create) and return how
+    many were read. Reusing the array streams a file of any size in
+    constant memory.
+    '''
+    file = _file_arg(self._shortname, args[0], reading=True)
+    array = _native_array(self._shortname, args[1])
+    if not array.writable:
+      raise CallError(f"El arreglo de '{self._shortname}' es de solo lectura")
+    return file.read_into(array.data)
+
+
+class Write(BuiltinFunction):
+  _shortname = "write"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Write a string (or a view) to the file.
+    '''
+    file = _file_arg(self._shortname, args[0], reading=False)
+    file.write(_file_text(self._shortname, args[1]))
+
+
+class WriteLine(BuiltinFunction):
+  _shortname = "write_line"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Write a string (or a view) and a newline to the file.
+    '''
+    file = _file_arg(self._shortname, args[0], reading=False)
+    file.write(_file_text(self._shortname, args[1]) + '\n')
+
+
+class WriteBytes(BuiltinFunction):
+  _shortname = "write_bytes"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Write the values of an int, float or bool array to the file in
+    native binary format.
+    '''
+    file = _file_arg(self._shortname, args[0], reading=False)
+    file.write_from(_native_array(self._shortname, args[1]).data)
+
+
+class ReadCsv(BuiltinFunction):
+  _shortname = "read_csv"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Read the next rows of a CSV file into one array per selected
+    column and return how many rows were read. spec declares the type
+    of each column in order, "int,-,float,str", with the separator of
+    the file; "-" skips a column and the columns after the last one
+    declared are ignored. Each call reads at most as many rows as the
+    smallest array holds, so reusing the arrays streams a file of any
+    size in bounded memory. Fields are not quoted.
+    '''
+    file, delim, fields, arrays = _record_args(self._shortname, args, binary=False)
+    lines = file.read_lines(min(len(array) for array in arrays))
+    if not lines:
+      return 0
+    # Las lineas unidas por el separador dejan todas las celdas en una
+    # sola lista: la columna j es cells[j::width]
+    cells = delim.join(lines).split(delim)
+    width = lines[0].count(delim) + 1
+    if width < len(fields) or len(cells) != width * len(lines):
+      raise CallError(f"Las filas de '{file.path}' en '{self._shortname}' no tienen todas {max(width, len(fields))} columnas")
+    arrays = iter(arrays)
+    for j, (_type, keep) in enumerate(fields):
+      if not keep:
+        continue
+      column = cells[j::width]
+      try:
+        if _type == 'str':
+          column = [ cell.decode() for cell in column ]
+          if j == width - 1:
+            column = [ cell.rstrip('\r\n') for cell in column ]
+        else:
+          column = list(map(_scalar_types[_type], column))
+      except (ValueError, UnicodeDecodeError):
+        raise CallError(f"Valor incorrecto en la columna {j+1} de '{file.path}' en '{self._shortname}': se esperaba {_type}")
+      _fill_array(next(arrays), column)
+    return len(lines)
+
+
+class ReadRecords(BuiltinFunction):
+  _shortname = "read_records"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Read the next fixed-width binary records of a file into one array
+    per selected field and return how many records were read. spec
+    declares the native fields of a record in order, "int,-float,bool"
+    (8, 8 and 1 bytes, without padding); "-" before a type skips the
+    field. Each call reads at most as many records as the smallest
+    array holds.
+    '''
+    file, _, fields, arrays = _record_args(self._shortname, args, binary=True)
+    recsize = sum(record_field_types[_type] for _type, _ in fields)
+    buffer = bytearray(recsize * min(len(array) for array in arrays))
+    count = file.read_into(buffer, recsize)
+    if np is not None:
+      dtype = np.dtype([ (f'f{j}', array_dtypes[_type]) for j, (_type, _) in enumerate(fields) ])
+      records = np.frombuffer(buffer, dtype, count)
+      columns = [ records[f'f{j}'] for j, (_, keep) in enumerate(fields) if keep ]
+    else:
+      layout = struct.Struct('=' + ''.join(mapped_typecodes[_type] for _type, _ in fields))
+      records = list(zip(*layout.iter_unpack(memoryview(buffer)[:count * recsize]))) or [ () ] * len(fields)
+      columns = [ list(records[j]) for j, (_, keep) in enumerate(fields) if keep ]
+    for array, column in zip(arrays, columns):
+      _fill_array(array, column)
+    return count
+
+
+def _file_arg(name, value, reading=None):
+  if not isinstance(value, File):
+    raise CallError(f"El 1er argumento de '{name}' debe ser un archivo")
+  if value.closed:
+    raise CallError(f"El archivo '{value.path}' de '{name}' esta cerrado")
+  if reading is not None and value.readable != reading:
+    action = 'lectura' if reading else 'escritura'
+    raise CallError(f"El archivo '{value.path}' no esta abierto para {action} en '{name}'")
+  return value
+
+def _file_text(name, value):
+  if not isinstance(value, (str, StrView)):
+    raise CallError(f"El 2do argumento de '{name}' debe ser una cadena")
+  return str(value)
+
+def _record_args(name, args, binary):
+  '''
+  Archivo, separador (en bytes), campos y arreglos de read_csv y
+  read_records. Hay un arreglo del tipo de cada campo seleccionado
+  '''
+  if len(args) < 3:
+    raise CallError(f"'{name}' recibe el archivo, la descripcion de los campos y un arreglo por campo")
+  file = _file_arg(name, args[0], reading=True)
+  if not isinstance(args[1], (str, StrView)):
+    raise CallError(f"La descripcion de los campos de '{name}' debe ser una cadena")
+  try:
+    delim, fields = record_fields(str(args[1]), binary)
+  except ValueError as err:
+    raise CallError(f"{name}: {err}")
+  types = [ _type for _type, keep in fields if keep ]
+  arrays = args[2:]
+  if len(arrays) != len(types):
+    raise CallError(f"'{name}' selecciona {len(types)} campos pero recibe {len(arrays)} arreglos")
+  for k, (_type, array) in enumerate(zip(types, arrays)):
+    if not isinstance(array, Array) or array._type != _type:
+      raise CallError(f"El arreglo {k+1} de '{name}' debe ser de tipo {_type}")
+    if not array.writable:
+      raise CallError(f"El arreglo {k+1} de '{name}' es de solo lectura")
+  return file, delim.encode(), fields, arrays
+
+def _fill_array(array, values):
+  '''
+  Copia values en los primeros len(values) elementos de array
+  '''
+  data = array.data
+  if isinstance(data, pyarray.array):
+    data[:len(values)] = pyarray.array(data.typecode, values)
+  elif isinstance(data, (ListView, memoryview)):
+    for k, value in enumerate(values):
+      data[k] = value
+  else:
+    data[:len(values)] = values
+
+def _native_array(name, value):
+  if not isinstance(value, Array) or value._type not in mapped_typecodes:
+    raise CallError(f"El 2do argumento de '{name}' debe ser un arreglo int, float o bool")
+  return value
+
+
 # ----------------------------------------
 # math
 #
 class Abs(BuiltinFunction):
   _shortname = "abs"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -192,6 +749,7 @@ class Abs(BuiltinFunction):
 
 class Ceil(BuiltinFunction):
   _shortname = "ceil"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -209,6 +767,7 @@ class Ceil(BuiltinFunction):
 
 class Cos(BuiltinFunction):
   _shortname = "cos"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -225,6 +784,7 @@ class Cos(BuiltinFunction):
 
 class Exp(BuiltinFunction):
   _shortname = "exp"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -238,6 +798,7 @@ class Exp(BuiltinFunction):
 
 class Floor(BuiltinFunction):
   _shortname = "floor"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -255,6 +816,7 @@ class Floor(BuiltinFunction):
 
 class Log(BuiltinFunction):
   _shortname = "log"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -271,6 +833,7 @@ class Log(BuiltinFunction):
 
 class Log10(BuiltinFunction):
   _shortname = "log10"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -287,6 +850,7 @@ class Log10(BuiltinFunction):
 
 class Power(BuiltinFunction):
   _shortname = "pow"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -303,6 +867,7 @@ class Power(BuiltinFunction):
 
 class Sin(BuiltinFunction):
   _shortname = "sin"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -319,6 +884,7 @@ class Sin(BuiltinFunction):
 
 class Sqrt(BuiltinFunction):
   _shortname = "sqrt"
+  pure = True
 
   @property
   def arity(self) -> int:
@@ -334,140 +900,1462 @@ class Sqrt(BuiltinFunction):
 
 
 
-consts = {
-  'PI':    3.14159265358979323846,
-  'E':     2.71828182845904523536,
-  'GAMMA': 0.57721566490153286060,  # Euler
-  'DEG':  57.29577951308232087680,  # deg/radian
-  'PHI':   1.61803398874989484820,  # golden ratio
-  'True' : True,
-  'False': False,
-  'printf' : True,
-}
+# ----------------------------------------
+# Strings
+#
+class Substr(BuiltinFunction):
+  _shortname = "substr"
 
-builtins = {
-  # general
-  'chr'   : Chr(),
-  'clock' : Clock(),
-  'format': Format(),
-  'input' : Input(),
-  'int'   : Integer(),
-  'ord'   : Ord(),
-  'read_text': ReadText(),
-  'str'   : String(),
+  @property
+  def arity(self) -> int:
+    return 3
 
-  # math
-  'abs'   : Abs(),
-  'ceil'  : Ceil(),
-  'cos'   : Cos(),
-  'exp'   : Exp(),
-  'floor' : Floor(),
-  'log'   : Log(),
-  'log10' : Log10(),
-  'pow'   : Power(),
-  'sin'   : Sin(),
-  'sqrt'  : Sqrt(),
+  def __call__(self, _, *args):
+    '''
+    Return a view of length characters of a string starting at start.
+    The view shares the text of the string: nothing is copied.
+    '''
+    view = _text(self._shortname, args[0])
+    start, length = args[1], args[2]
+    if not (isinstance(start, int) and isinstance(length, int)) or \
+       start < 0 or length < 0 or start + length > len(view):
+      raise CallError(f"Subcadena ({start}, {length}) fuera de una cadena de {len(view)} caracteres en '{self._shortname}'")
+    return StrView(view.base, view.start + start, view.start + start + length)
 
-  # regexp
-  # stats
-}
 
-'''
-builtins = {
-        'atan':  math.atan,
-        'asin':  math.asin,
-        'acos':  math.acos,
-        'sinh':  math.sinh,
-        'cosh':  math.cosh,
-        'tanh':  math.tanh,
-}
+class Find(BuiltinFunction):
+  _shortname = "find"
+  pure = True
 
-class Max(BuiltinFunction):
-    _shortname = "max"
+  @property
+  def arity(self) -> int:
+    return -1
 
-    @property
-    def arity(self) -> int:
-        return 2
+  def __call__(self, _, *args):
+    '''
+    Return the index of the first occurrence of sub in a string, at
+    or after the optional position start, or -1 if it is not found.
+    '''
+    if len(args) not in (2, 3):
+      raise CallError(f"'{self._shortname}' recibe una cadena, la subcadena y opcionalmente el inicio")
+    view, sub = _text(self._shortname, args[0]), str(_text(self._shortname, args[1]))
+    start = args[2] if len(args) == 3 else 0
+    if not isinstance(start, int) or start < 0:
+      raise CallError(f"Inicio {start} incorrecto en '{self._shortname}'")
+    ndx = view.base.find(sub, view.start + start, view.end)
+    return ndx - view.start if ndx >= 0 else -1
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[NUMERIC]) -> NUMERIC:
-        """Return the maximum of the two values."""
-        return max(arguments)
 
+class Split(BuiltinFunction):
+  _shortname = "split"
 
-class Mean(BuiltinFunction):
-    _shortname = "mean"
+  @property
+  def arity(self) -> int:
+    return 2
 
-    @property
-    def arity(self) -> int:
-        return 1
+  def __call__(self, _, *args):
+    '''
+    Return an array with the pieces of a string separated by sep.
+    With an empty sep the pieces are the runs of non-whitespace
+    characters (the words). The pieces are copied: for short pieces
+    str.split is several times faster than building one view each.
+    '''
+    text, sep = str(_text(self._shortname, args[0])), str(_text(self._shortname, args[1]))
+    return _to_array(self._shortname, 'str', text.split(sep or None))
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[LoxArray]) -> float:
-        """Return the sample arithmetic mean of the data in the input `LoxArray`."""
-        return statistics.mean(arguments[0].fields)
 
+class Strip(BuiltinFunction):
+  _shortname = "strip"
 
-class Median(BuiltinFunction):
-    _shortname = "median"
+  @property
+  def arity(self) -> int:
+    return 1
 
-    @property
-    def arity(self) -> int:
-        return 1
+  def __call__(self, _, *args):
+    '''
+    Return a view of a string without its leading and trailing
+    whitespace.
+    '''
+    view = _text(self._shortname, args[0])
+    base, start, end = view.base, view.start, view.end
+    m = _word.search(base, start, end)
+    if m is None:
+      return StrView(base, start, start)
+    start = m.start()
+    while base[end - 1].isspace():
+      end -= 1
+    return StrView(base, start, end)
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[LoxArray]) -> float:
-        """
-        Return the median (middle value) of the input `LoxArray`.
-        If the input array contains an even number of data points, the median is interpolated by
-        taking the average of the two middle values.
-        """
-        return statistics.median(arguments[0].fields)
 
+class Join(BuiltinFunction):
+  _shortname = "join"
 
-class Min(BuiltinFunction):
-    _shortname = "min"
+  @property
+  def arity(self) -> int:
+    return 2
 
-    @property
-    def arity(self) -> int:
-        return 2
+  def __call__(self, _, *args):
+    '''
+    Return the strings (or views) of an array joined by sep.
+    '''
+    array = _array_arg(self._shortname, args[0], numeric=False)
+    if array._type != 'str':
+      raise CallError(f"El 1er argumento de '{self._shortname}' debe ser un arreglo de str")
+    sep = str(_text(self._shortname, args[1]))
+    return sep.join([ str(item) for item in array.data ])
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[NUMERIC]) -> NUMERIC:
-        """Return the minimum of the two values."""
-        return min(arguments)
 
+class CharAt(BuiltinFunction):
+  _shortname = "char_at"
 
-class Mode(BuiltinFunction):
-    _shortname = "mode"
+  @property
+  def arity(self) -> int:
+    return 2
 
-    @property
-    def arity(self) -> int:
-        return 1
+  def __call__(self, _, *args):
+    '''
+    Return the code of the character at index i of a string, without
+    building a one-character string.
+    '''
+    view, i = _text(self._shortname, args[0]), args[1]
+    if not isinstance(i, int) or not 0 <= i < len(view):
+      raise CallError(f"Indice {i} fuera de una cadena de {len(view)} caracteres en '{self._shortname}'")
+    return ord(view.base[view.start + i])
+
+
+# Palabras: secuencias de caracteres que no son espacios
+_word = re.compile(r'\S+')
+
+def _text(name, value):
+  if value.__class__ is str or value.__class__ is StrView:
+    return StrView.of(value)
+  raise CallError(f"Los argumentos de texto de '{name}' deben ser cadenas")
+
+
+# ----------------------------------------
+# Arrays
+#
+class Slice(BuiltinFunction):
+  _shortname = "slice"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Return a view of the elements [start, end) of an array. The view
+    shares storage with the array: no element is copied, and writes
+    through either one are seen by both.
+    '''
+    array, start, end = args
+    if not isinstance(array, Array):
+      raise CallError(f"El 1er argumento de '{self._shortname}' debe ser un arreglo")
+    if not (isinstance(start, int) and isinstance(end, int)) or \
+       not 0 <= start <= end <= len(array):
+      raise CallError(f"Rango [{start}, {end}) incorrecto en '{self._shortname}' (tamano {len(array)})")
+    return array.view(start, end)
+
+
+class Vectorize(BuiltinFunction):
+  _shortname = "vectorize"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, interp, *args):
+    '''
+    Apply a scalar user function to every element of the argument
+    arrays and return the array of results. Scalars are broadcast.
+    '''
+    from MiniCppVector import lift
+
+    if len(args) < 2 or not hasattr(args[0], 'node'):
+      raise CallError(f"El 1er argumento de '{self._shortname}' debe ser una funcion")
+    func, args = args[0], args[1:]
+    if func.node._type == 'void':
+      raise CallError(f"La funcion de '{self._shortname}' debe devolver un valor")
+    if len(args) != func.arity:
+      raise CallError(f"'{self._shortname}': se esperaban {func.arity} argumentos para '{func.node.ident}'")
+    sizes = { len(arg) for arg in args if isinstance(arg, Array) }
+    if len(sizes) != 1:
+      raise CallError(f"Los arreglos de '{self._shortname}' deben tener el mismo tamano")
+    return lift(interp, func, args)
+
+
+class Fill(BuiltinFunction):
+  _shortname = "fill"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Set every element of the array to the given value.
+    '''
+    array, value = _array_arg(self._shortname, args[0], numeric=False), args[1]
+    if not array.writable:
+      raise CallError(f"El arreglo de '{self._shortname}' es de solo lectura")
+    if value.__class__ is str and array._type == 'bool':
+      value = value == 'true'
+    elif value.__class__ is StrView:
+      value = str(value)
+    try:
+      if _is_ndarray(array):
+        array.data[:] = value
+      else:
+        for k in range(len(array)):
+          array.data[k] = value
+    except (TypeError, ValueError, OverflowError):
+      raise CallError(f"Valor {value!r} incompatible con un arreglo de {array._type} en '{self._shortname}'")
+
+
+class Copy(BuiltinFunction):
+  _shortname = "copy"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Copy all the elements of src to the start of dst. The arrays may
+    be overlapping views of the same storage (memmove semantics).
+    '''
+    dst = _array_arg(self._shortname, args[0], numeric=False)
+    src = _array_arg(self._shortname, args[1], numeric=False)
+    if dst._type != src._type:
+      raise CallError(f"Los arreglos de '{self._shortname}' deben ser del mismo tipo ({dst._type} != {src._type})")
+    n = len(src)
+    if n > len(dst):
+      raise CallError(f"El destino de '{self._shortname}' ({len(dst)}) es mas corto que el origen ({n})")
+    if not dst.writable:
+      raise CallError(f"El destino de '{self._shortname}' es de solo lectura")
+    if _is_ndarray(dst) and _is_ndarray(src):
+      np.copyto(dst.data[:n], src.data)
+    else:
+      # Se leen todos los valores antes de escribir el primero
+      for k, value in enumerate(list(src.data[0:n] if n else [])):
+        dst.data[k] = value
+
+
+class Sum(BuiltinFunction):
+  _shortname = "sum"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the sum of the elements of a numeric array.
+    '''
+    data = _numbers(self._shortname, args[0])
+    if _is_ndarray(args[0]):
+      return data.sum().item()
+    return sum(data)
+
+
+class Dot(BuiltinFunction):
+  _shortname = "dot"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return the dot product of two numeric arrays of the same size.
+    '''
+    a, b = _numbers(self._shortname, args[0]), _numbers(self._shortname, args[1])
+    if len(a) != len(b):
+      raise CallError(f"Los arreglos de '{self._shortname}' deben tener el mismo tamano")
+    if _is_ndarray(args[0]) and _is_ndarray(args[1]):
+      return np.dot(a, b).item()
+    return sum(x * y for x, y in zip(a, b))
+
+
+class Max(BuiltinFunction):
+  _shortname = "max"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Return the largest element of an array, or the largest of
+    two or more numbers.
+    '''
+    return _extreme(self._shortname, args, max, 'max')
+
+
+class Min(BuiltinFunction):
+  _shortname = "min"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Return the smallest element of an array, or the smallest of
+    two or more numbers.
+    '''
+    return _extreme(self._shortname, args, min, 'min')
+
+
+class ArgMax(BuiltinFunction):
+  _shortname = "argmax"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the index of the first largest element of an array.
+    '''
+    data = _nonempty(self._shortname, args[0])
+    if _is_ndarray(args[0]):
+      return int(data.argmax())
+    return max(range(len(data)), key=data.__getitem__)
+
+
+class ArgMin(BuiltinFunction):
+  _shortname = "argmin"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the index of the first smallest element of an array.
+    '''
+    data = _nonempty(self._shortname, args[0])
+    if _is_ndarray(args[0]):
+      return int(data.argmin())
+    return min(range(len(data)), key=data.__getitem__)
+
+
+class Sort(BuiltinFunction):
+  _shortname = "sort"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Sort the elements of an array (or view) in place, in ascending order.
+    '''
+    array = _array_arg(self._shortname, args[0], numeric=False)
+    if not array.writable:
+      raise CallError(f"El arreglo de '{self._shortname}' es de solo lectura")
+    if _is_ndarray(array) or isinstance(array.data, list):
+      array.data.sort()
+    else:
+      for k, value in enumerate(sorted(array.data[0:len(array)] if len(array) else [])):
+        array.data[k] = value
+
+
+def _is_ndarray(array):
+  return np is not None and isinstance(array.data, np.ndarray)
+
+
+def _array_arg(name, value, numeric=True):
+  if not isinstance(value, Array) or (numeric and value._type not in ('int', 'float', 'bool')):
+    kind = 'un arreglo numerico' if numeric else 'un arreglo'
+    raise CallError(f"Los argumentos de '{name}' deben ser {kind}")
+  return value
+
+
+def _numbers(name, value):
+  return _array_arg(name, value).data
+
+
+def _nonempty(name, value):
+  data = _numbers(name, value)
+  if len(data) == 0:
+    raise CallError(f"'{name}' de un arreglo vacio")
+  return data
+
+
+def _extreme(name, args, func, method):
+  if len(args) == 1:
+    data = _nonempty(name, args[0])
+    if _is_ndarray(args[0]):
+      return getattr(data, method)().item()
+    return func(data)
+  if len(args) < 2 or not all(isinstance(arg, (int, float)) for arg in args):
+    raise CallError(f"'{name}' recibe un arreglo o dos o mas numeros")
+  return func(args)
+
+
+# ----------------------------------------
+# Matrices
+#
+class Zeros(BuiltinFunction):
+  _shortname = "zeros"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return a new rows x cols float matrix filled with zeros.
+    '''
+    rows, cols = _shape_args(self._shortname, *args)
+    return Matrix.zeros(rows, cols)
+
+
+class Identity(BuiltinFunction):
+  _shortname = "identity"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the n x n identity matrix.
+    '''
+    n, _ = _shape_args(self._shortname, args[0], args[0])
+    return Matrix(np.identity(n))
+
+
+class Reshape(BuiltinFunction):
+  _shortname = "reshape"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Return the elements of a numeric array as a rows x cols matrix, in
+    row-major order. A writable float array backed by NumPy shares its
+    storage with the matrix; any other array (including a read-only
+    map_array) is copied.
+    '''
+    data = _numbers(self._shortname, args[0])
+    rows, cols = _shape_args(self._shortname, args[1], args[2])
+    if rows * cols != len(data):
+      raise CallError(f"'{self._shortname}': un arreglo de {len(data)} elementos no cabe en {rows}x{cols}")
+    if not _is_ndarray(args[0]):
+      data = list(data)
+    elif not args[0].writable:
+      # La matriz se puede modificar con mset: no comparte un mapeo de solo lectura
+      data = np.array(data, dtype='float64')
+    return Matrix(np.ascontiguousarray(data, dtype='float64').reshape(rows, cols))
+
+
+class Flatten(BuiltinFunction):
+  _shortname = "flatten"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the elements of a matrix as a float array in row-major order.
+    The array shares storage with the matrix.
+    '''
+    matrix = _matrix_arg(self._shortname, args[0])
+    return Array('float', matrix.data.reshape(-1))
+
+
+class MGet(BuiltinFunction):
+  _shortname = "mget"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Return the element (i, j) of a matrix.
+    '''
+    matrix, i, j = _matrix_arg(self._shortname, args[0]), args[1], args[2]
+    return matrix[_element_args(self._shortname, matrix, i, j)]
+
+
+class MSet(BuiltinFunction):
+  _shortname = "mset"
+
+  @property
+  def arity(self) -> int:
+    return 4
+
+  def __call__(self, _, *args):
+    '''
+    Set the element (i, j) of a matrix to a number.
+    '''
+    matrix, i, j, value = _matrix_arg(self._shortname, args[0]), args[1], args[2], args[3]
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+      raise CallError(f"El valor de '{self._shortname}' debe ser un numero")
+    matrix[_element_args(self._shortname, matrix, i, j)] = value
+
+
+class Rows(BuiltinFunction):
+  _shortname = "rows"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the number of rows of a matrix.
+    '''
+    return _matrix_arg(self._shortname, args[0]).rows
+
+
+class Cols(BuiltinFunction):
+  _shortname = "cols"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the number of columns of a matrix.
+    '''
+    return _matrix_arg(self._shortname, args[0]).cols
+
+
+class MatMul(BuiltinFunction):
+  _shortname = "matmul"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return the matrix product a b. The columns of a must match the
+    rows of b.
+    '''
+    a = _matrix_arg(self._shortname, args[0])
+    b = _matrix_arg(self._shortname, args[1], '2o')
+    if a.cols != b.rows:
+      raise CallError(f"Dimensiones incompatibles en '{self._shortname}': {a.shape} por {b.shape}")
+    return Matrix(a.data @ b.data)
+
+
+class Transpose(BuiltinFunction):
+  _shortname = "transpose"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return a new matrix with the rows and columns of m exchanged.
+    '''
+    matrix = _matrix_arg(self._shortname, args[0])
+    return Matrix(np.ascontiguousarray(matrix.data.T))
+
+
+class Solve(BuiltinFunction):
+  _shortname = "solve"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Solve the linear system a x = b and return x. a must be square and
+    non-singular; b has one column per right-hand side.
+    '''
+    a = _matrix_arg(self._shortname, args[0])
+    b = _matrix_arg(self._shortname, args[1], '2o')
+    if a.rows != a.cols:
+      raise CallError(f"La matriz de '{self._shortname}' debe ser cuadrada ({a.shape})")
+    if a.rows != b.rows:
+      raise CallError(f"Dimensiones incompatibles en '{self._shortname}': {a.shape} y {b.shape}")
+    try:
+      return Matrix(np.linalg.solve(a.data, b.data))
+    except np.linalg.LinAlgError:
+      raise CallError(f"La matriz de '{self._shortname}' es singular")
+
+
+def _matrix_arg(name, value, which='1er'):
+  if not isinstance(value, Matrix):
+    raise CallError(f"El {which} argumento de '{name}' debe ser una matriz")
+  return value
+
+
+def _shape_args(name, rows, cols):
+  if np is None:
+    raise CallError(f"'{name}' requiere NumPy")
+  if not (isinstance(rows, int) and isinstance(cols, int)) or rows < 1 or cols < 1:
+    raise CallError(f"Dimensiones {rows}x{cols} incorrectas en '{name}'")
+  return rows, cols
+
+
+def _element_args(name, matrix, i, j):
+  if not (isinstance(i, int) and isinstance(j, int)) or \
+     not (0 <= i < matrix.rows and 0 <= j < matrix.cols):
+    raise CallError(f"Indice ({i}, {j}) fuera de los limites de la matriz ({matrix.shape}) en '{name}'")
+  return i, j
+
+
+# ----------------------------------------
+# Containers
+#
+class DictPut(BuiltinFunction):
+  _shortname = "dict_put"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Insert key with the given value, replacing the previous value.
+    '''
+    d = _container_arg(self._shortname, args[0], Dict)
+    key = _element(self._shortname, d.params[0], args[1])
+    d.data[key] = _element(self._shortname, d.params[1], args[2])
+
+
+class DictGet(BuiltinFunction):
+  _shortname = "dict_get"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Return the value of key. If the key is missing, return the default
+    given as 3rd argument; without a default it is an error.
+    '''
+    if len(args) not in (2, 3):
+      raise CallError(f"'{self._shortname}' recibe un dict, una clave y opcionalmente un valor por omision")
+    d = _container_arg(self._shortname, args[0], Dict)
+    try:
+      return d.data[args[1]]
+    except KeyError:
+      if len(args) == 3:
+        return _element(self._shortname, d.params[1], args[2])
+      raise CallError(f"Clave {args[1]!r} no encontrada en '{self._shortname}'")
+    except TypeError:
+      _element(self._shortname, d.params[0], args[1])
+      raise
+
+
+class DictHas(BuiltinFunction):
+  _shortname = "dict_has"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return true if the dict contains key.
+    '''
+    d = _container_arg(self._shortname, args[0], Dict)
+    return _element(self._shortname, d.params[0], args[1]) in d.data
+
+
+class DictDel(BuiltinFunction):
+  _shortname = "dict_del"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Remove key from the dict. Return true if it was present.
+    '''
+    d = _container_arg(self._shortname, args[0], Dict)
+    return d.data.pop(_element(self._shortname, d.params[0], args[1]), _missing) is not _missing
+
+
+class DictKeys(BuiltinFunction):
+  _shortname = "dict_keys"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return a new array with the keys of the dict, in insertion order.
+    '''
+    d = _container_arg(self._shortname, args[0], Dict)
+    return _to_array(self._shortname, d.params[0], list(d.data))
+
+
+class DictValues(BuiltinFunction):
+  _shortname = "dict_values"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return a new array with the values of the dict, in the order of
+    dict_keys.
+    '''
+    d = _container_arg(self._shortname, args[0], Dict)
+    return _to_array(self._shortname, d.params[1], list(d.data.values()))
+
+
+class HeapPush(BuiltinFunction):
+  _shortname = "heap_push"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Insert item with the given priority in O(log n). Items with the
+    same priority leave the heap in insertion order.
+    '''
+    h = _container_arg(self._shortname, args[0], Heap)
+    prio = args[1]
+    if prio.__class__ is not float and prio.__class__ is not int:
+      raise CallError(f"La prioridad de '{self._shortname}' debe ser un numero")
+    heapq.heappush(h.data, (prio, h.count, _element(self._shortname, h.params[0], args[2])))
+    h.count += 1
+
+
+class HeapPop(BuiltinFunction):
+  _shortname = "heap_pop"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Remove and return the item with the lowest priority in O(log n).
+    '''
+    h = _nonempty_container(self._shortname, args[0], Heap)
+    return heapq.heappop(h.data)[2]
+
+
+class HeapPeek(BuiltinFunction):
+  _shortname = "heap_peek"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the item with the lowest priority without removing it.
+    '''
+    return _nonempty_container(self._shortname, args[0], Heap).data[0][2]
+
+
+class HeapPrio(BuiltinFunction):
+  _shortname = "heap_prio"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the lowest priority in the heap (that of heap_peek).
+    '''
+    return float(_nonempty_container(self._shortname, args[0], Heap).data[0][0])
+
+
+class DequePushBack(BuiltinFunction):
+  _shortname = "deque_push_back"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Append item at the back of the deque.
+    '''
+    q = _container_arg(self._shortname, args[0], Deque)
+    q.data.append(_element(self._shortname, q.params[0], args[1]))
+
+
+class DequePushFront(BuiltinFunction):
+  _shortname = "deque_push_front"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Insert item at the front of the deque.
+    '''
+    q = _container_arg(self._shortname, args[0], Deque)
+    q.data.appendleft(_element(self._shortname, q.params[0], args[1]))
+
+
+class DequePopBack(BuiltinFunction):
+  _shortname = "deque_pop_back"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Remove and return the item at the back of the deque.
+    '''
+    return _nonempty_container(self._shortname, args[0], Deque).data.pop()
+
+
+class DequePopFront(BuiltinFunction):
+  _shortname = "deque_pop_front"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Remove and return the item at the front of the deque.
+    '''
+    return _nonempty_container(self._shortname, args[0], Deque).data.popleft()
+
+
+class DequeBack(BuiltinFunction):
+  _shortname = "deque_back"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the item at the back of the deque without removing it.
+    '''
+    return _nonempty_container(self._shortname, args[0], Deque).data[-1]
+
+
+class DequeFront(BuiltinFunction):
+  _shortname = "deque_front"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the item at the front of the deque without removing it.
+    '''
+    return _nonempty_container(self._shortname, args[0], Deque).data[0]
+
+
+class SbAppend(BuiltinFunction):
+  _shortname = "sb_append"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Append a string to the builder in amortized O(1), without copying
+    the text accumulated so far.
+    '''
+    b = _container_arg(self._shortname, args[0], StrBuf)
+    if args[1].__class__ is not str:
+      raise CallError(f"El 2o argumento de '{self._shortname}' debe ser una cadena")
+    b.append(args[1])
+
+
+class SbStr(BuiltinFunction):
+  _shortname = "sb_str"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the accumulated text. The fragments are joined once; the
+    builder keeps the result, so asking again does not join them again.
+    '''
+    return _container_arg(self._shortname, args[0], StrBuf).value()
+
+
+class SbClear(BuiltinFunction):
+  _shortname = "sb_clear"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Empty the builder.
+    '''
+    _container_arg(self._shortname, args[0], StrBuf).clear()
+
+
+_missing = object()
+
+_scalar_types = {
+  'int'   : int,
+  'float' : float,
+  'bool'  : bool,
+  'str'   : str,
+}
+
+def _container_arg(name, value, cls):
+  if not isinstance(value, cls):
+    raise CallError(f"El 1er argumento de '{name}' debe ser un {cls.__name__.lower()}")
+  return value
+
+
+def _nonempty_container(name, value, cls):
+  container = _container_arg(name, value, cls)
+  if not container.data:
+    raise CallError(f"'{name}' de un {cls.__name__.lower()} vacio")
+  return container
+
+
+def _element(name, _type, value):
+  '''
+  Valor guardado en un contenedor de elementos _type. Los int se
+  aceptan como float
+  '''
+  cls = value.__class__
+  if cls is _scalar_types.get(_type):
+    return value
+  if _type == 'float' and cls is int:
+    return float(value)
+  if _type == 'str' and cls is StrView:
+    # Se guarda una copia: la vista mantendria viva toda la cadena base
+    return str(value)
+  if _type == 'bool' and value in ('true', 'false'):
+    # Las constantes booleanas llegan como 'true'/'false'
+    return value == 'true'
+  if (_type == 'matrix' and cls is Matrix) or (isinstance(value, Container) and value._type == _type):
+    return value
+  raise CallError(f"Valor {value!r} incompatible con {_type} en '{name}'")
+
+
+def _to_array(name, _type, values):
+  if _type not in _scalar_types:
+    raise CallError(f"'{name}' requiere elementos int, float, bool o str, no {_type}")
+  array = Array.new(_type, len(values))
+  if _is_ndarray(array) or isinstance(array.data, list):
+    array.data[:] = values
+  else:
+    for k, value in enumerate(values):
+      array.data[k] = value
+  return array
+
+
+# ----------------------------------------
+# Regexp
+#
+class ReMatch(BuiltinFunction):
+  _shortname = "re_match"
+  pure = True
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return true if the pattern matches at the start of the string.
+    '''
+    pattern, text = _regex_args(self._shortname, args)
+    return pattern.match(text) is not None
+
+
+class ReSearch(BuiltinFunction):
+  _shortname = "re_search"
+  pure = True
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return the index of the first match of the pattern in the string,
+    or -1 if there is none.
+    '''
+    pattern, text = _regex_args(self._shortname, args)
+    m = pattern.search(text)
+    return m.start() if m else -1
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[LoxArray]) -> float:
-        """Return the single most common data point from the input `LoxArray`."""
-        return statistics.mode(arguments[0].fields)
 
 class ReSub(BuiltinFunction):
-    _shortname = "re_sub"
+  _shortname = "re_sub"
+  pure = True
 
-    @property
-    def arity(self) -> int:
-        return 3
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Replace the leftmost non-overlapping matches of the pattern in the
+    string (3rd argument) with repl (2nd argument), which may refer to
+    groups as \\1.
+    '''
+    pattern, text = _regex_args(self._shortname, (args[0], args[2]))
+    repl = _regex_text(self._shortname, args[1])
+    try:
+      return pattern.sub(repl, text)
+    except re.error as err:
+      raise CallError(f"Reemplazo {repl!r} incorrecto en '{self._shortname}': {err}")
+
+
+class ReFindAll(BuiltinFunction):
+  _shortname = "re_findall"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return an array with all the non-overlapping matches of the
+    pattern in the string. If the pattern has exactly one group, the
+    array holds the text of that group.
+    '''
+    pattern, text = _regex_args(self._shortname, args)
+    if pattern.groups == 1:
+      found = [ m.group(1) or '' for m in pattern.finditer(text) ]
+    else:
+      found = [ m.group(0) for m in pattern.finditer(text) ]
+    return _to_array(self._shortname, 'str', found)
+
+
+# Patrones compilados por cadena. Los programas llaman a las re_* en
+# ciclos con el mismo patron: se compila una vez por patron distinto
+patterns = LRUCache(128)
+
+def _regex_args(name, args):
+  source, text = _regex_text(name, args[0]), _regex_text(name, args[1])
+  pattern = patterns.get(source)
+  if pattern is LRUCache._missing:
+    try:
+      pattern = re.compile(source)
+    except re.error as err:
+      raise CallError(f"Expresion regular {source!r} incorrecta en '{name}': {err}")
+    patterns.put(source, pattern)
+  return pattern, text
+
+
+def _regex_text(name, value):
+  if value.__class__ is str:
+    return value
+  if value.__class__ is StrView:
+    return str(value)
+  raise CallError(f"Los argumentos de '{name}' deben ser cadenas")
+
+
+# ----------------------------------------
+# Stats
+#
+class Mean(BuiltinFunction):
+  _shortname = "mean"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the arithmetic mean of the elements of an array.
+    '''
+    data = _nonempty(self._shortname, args[0])
+    if _is_ndarray(args[0]):
+      return float(data.mean())
+    return statistics.fmean(data)
+
+
+class Median(BuiltinFunction):
+  _shortname = "median"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the median (middle value) of the elements of an array.
+    With an even number of elements it is the average of the two
+    middle values.
+    '''
+    data = _nonempty(self._shortname, args[0])
+    if _is_ndarray(args[0]):
+      return float(np.median(data))
+    return float(statistics.median(data))
+
+
+class Mode(BuiltinFunction):
+  _shortname = "mode"
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[str]) -> str:
-        """Replace the leftmost non-overlapping occurrences of the pattern in the given string."""
-        return re.sub(arguments[0], arguments[1], arguments[2])
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the most common element of an array (the smallest one
+    if there are ties).
+    '''
+    data = _nonempty(self._shortname, args[0])
+    if _is_ndarray(args[0]):
+      values, counts = np.unique(data, return_counts=True)
+      return values[counts.argmax()].item()
+    counts = Counter(data)
+    top = max(counts.values())
+    return min(value for value, count in counts.items() if count == top)
 
 
 class Std(BuiltinFunction):
-    _shortname = "std"
+  _shortname = "std"
 
-    @property
-    def arity(self) -> int:
-        return 1
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Return the sample standard deviation of the elements of an array.
+    '''
+    data = _numbers(self._shortname, args[0])
+    if len(data) < 2:
+      raise CallError(f"'{self._shortname}' requiere al menos dos elementos")
+    if _is_ndarray(args[0]):
+      return float(data.std(ddof=1))
+    return statistics.stdev(data)
+
+
+# ----------------------------------------
+# Random
+#
+class RandSeed(BuiltinFunction):
+  _shortname = "rand_seed"
+
+  @property
+  def arity(self) -> int:
+    return 1
+
+  def __call__(self, _, *args):
+    '''
+    Restart the random generators from a non-negative integer seed.
+    '''
+    if not isinstance(args[0], int) or isinstance(args[0], bool) or args[0] < 0:
+      raise CallError(f"La semilla de '{self._shortname}' debe ser un entero no negativo")
+    rng.seed(args[0])
+
+
+class RandInt(BuiltinFunction):
+  _shortname = "rand_int"
+
+  @property
+  def arity(self) -> int:
+    return 2
+
+  def __call__(self, _, *args):
+    '''
+    Return a random integer in [lo, hi].
+    '''
+    lo, hi = _int_range(self._shortname, *args)
+    return rng.scalar.randint(lo, hi)
+
+
+class RandFloat(BuiltinFunction):
+  _shortname = "rand_float"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Return a random float in [0, 1) or, given lo and hi, in [lo, hi).
+    '''
+    lo, hi = _float_params(self._shortname, args, (0.0, 1.0))
+    return lo + (hi - lo) * rng.scalar.random()
+
+
+class RandNormal(BuiltinFunction):
+  _shortname = "rand_normal"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Return a normally distributed float, with mean 0 and standard
+    deviation 1 or the given mu and sigma.
+    '''
+    mu, sigma = _float_params(self._shortname, args, (0.0, 1.0))
+    return rng.scalar.gauss(mu, sigma)
+
+
+class RandInts(BuiltinFunction):
+  _shortname = "rand_ints"
+
+  @property
+  def arity(self) -> int:
+    return 3
+
+  def __call__(self, _, *args):
+    '''
+    Fill an int array with random integers in [lo, hi], in one call.
+    '''
+    array = _random_array(self._shortname, args[0], 'int')
+    lo, hi = _int_range(self._shortname, *args[1:])
+    if _is_ndarray(array):
+      array.data[:] = rng.bulk.integers(lo, hi, len(array), endpoint=True)
+    else:
+      _fill_array(array, [ rng.scalar.randint(lo, hi) for _ in range(len(array)) ])
+
+
+class RandFloats(BuiltinFunction):
+  _shortname = "rand_floats"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Fill a float array with random floats in [0, 1) or in [lo, hi),
+    in one call.
+    '''
+    if not args:
+      raise CallError(f"'{self._shortname}' recibe el arreglo y opcionalmente lo y hi")
+    array = _random_array(self._shortname, args[0], 'float')
+    lo, hi = _float_params(self._shortname, args[1:], (0.0, 1.0))
+    if _is_ndarray(array):
+      rng.bulk.random(out=array.data)
+      if (lo, hi) != (0.0, 1.0):
+        array.data *= hi - lo
+        array.data += lo
+    else:
+      _fill_array(array, [ lo + (hi - lo) * rng.scalar.random() for _ in range(len(array)) ])
+
+
+class RandNormals(BuiltinFunction):
+  _shortname = "rand_normals"
+
+  @property
+  def arity(self) -> int:
+    return -1
+
+  def __call__(self, _, *args):
+    '''
+    Fill a float array with normally distributed floats (mean 0 and
+    standard deviation 1 or the given mu and sigma), in one call.
+    '''
+    if not args:
+      raise CallError(f"'{self._shortname}' recibe el arreglo y opcionalmente mu y sigma")
+    array = _random_array(self._shortname, args[0], 'float')
+    mu, sigma = _float_params(self._shortname, args[1:], (0.0, 1.0))
+    if _is_ndarray(array):
+      rng.bulk.standard_normal(out=array.data)
+      if (mu, sigma) != (0.0, 1.0):
+        array.data *= sigma
+        array.data += mu
+    else:
+      _fill_array(array, [ rng.scalar.gauss(mu, sigma) for _ in range(len(array)) ])
+
+
+class Rng:
+  '''
+  Generadores de las rand_*: random.Random para los valores sueltos,
+  que cuesta menos por llamada, y un Generator de NumPy (PCG64) que
+  llena los arreglos sin iterar en Python. seed reinicia los dos desde
+  la misma semilla (--seed); sin ella salen de la entropia del sistema
+  '''
+  def __init__(self, seed=None):
+    self.seed(seed)
+
+  def seed(self, seed=None):
+    self.scalar = random.Random(seed)
+    self.bulk = np.random.default_rng(seed) if np is not None else None
+
+
+rng = Rng()
+
+def _int_range(name, lo, hi):
+  if not (isinstance(lo, int) and isinstance(hi, int)) or lo > hi:
+    raise CallError(f"Rango [{lo}, {hi}] incorrecto en '{name}'")
+  return lo, hi
+
+def _float_params(name, args, default):
+  if not args:
+    return default
+  if len(args) != 2 or not all(isinstance(arg, (int, float)) for arg in args):
+    raise CallError(f"'{name}' recibe dos numeros o ninguno")
+  return float(args[0]), float(args[1])
+
+def _random_array(name, value, _type):
+  if not isinstance(value, Array) or value._type != _type:
+    raise CallError(f"El 1er argumento de '{name}' debe ser un arreglo {_type}")
+  if not value.writable:
+    raise CallError(f"El arreglo de '{name}' es de solo lectura")
+  return value
+
+
+consts = {
+  'PI':    3.14159265358979323846,
+  'E':     2.71828182845904523536,
+  'GAMMA': 0.57721566490153286060,  # Euler
+  'DEG':  57.29577951308232087680,  # deg/radian
+  'PHI':   1.61803398874989484820,  # golden ratio
+  'True' : True,
+  'False': False,
+  'printf' : True,
+}
+
+builtins = {
+  # general
+  'chr'   : Chr(),
+  'clock' : Clock(),
+  'format': Format(),
+  'input' : Input(),
+  'int'   : Integer(),
+  'ord'   : Ord(),
+  'map_array': MapArray(),
+  'map_create': MapCreate(),
+  'read_text': ReadText(),
+  'scan_array': ScanArray(),
+  'write_text': WriteText(),
+  'str'   : String(),
+
+  # files
+  'close'      : Close(),
+  'eof'        : Eof(),
+  'open'       : Open(),
+  'read_bytes' : ReadBytes(),
+  'read_csv'   : ReadCsv(),
+  'read_line'  : ReadLine(),
+  'read_records': ReadRecords(),
+  'write'      : Write(),
+  'write_bytes': WriteBytes(),
+  'write_line' : WriteLine(),
+
+  # math
+  'abs'   : Abs(),
+  'ceil'  : Ceil(),
+  'cos'   : Cos(),
+  'exp'   : Exp(),
+  'floor' : Floor(),
+  'log'   : Log(),
+  'log10' : Log10(),
+  'pow'   : Power(),
+  'sin'   : Sin(),
+  'sqrt'  : Sqrt(),
+
+  # strings
+  'char_at': CharAt(),
+  'find'   : Find(),
+  'join'   : Join(),
+  'split'  : Split(),
+  'strip'  : Strip(),
+  'substr' : Substr(),
+
+  # arrays
+  'argmax': ArgMax(),
+  'argmin': ArgMin(),
+  'copy'  : Copy(),
+  'dot'   : Dot(),
+  'fill'  : Fill(),
+  'max'   : Max(),
+  'min'   : Min(),
+  'slice' : Slice(),
+  'sort'  : Sort(),
+  'sum'   : Sum(),
+  'vectorize': Vectorize(),
+
+  # matrices
+  'cols'     : Cols(),
+  'flatten'  : Flatten(),
+  'identity' : Identity(),
+  'matmul'   : MatMul(),
+  'mget'     : MGet(),
+  'mset'     : MSet(),
+  'reshape'  : Reshape(),
+  'rows'     : Rows(),
+  'solve'    : Solve(),
+  'transpose': Transpose(),
+  'zeros'    : Zeros(),
+
+  # containers
+  'dict_del'   : DictDel(),
+  'dict_get'   : DictGet(),
+  'dict_has'   : DictHas(),
+  'dict_keys'  : DictKeys(),
+  'dict_put'   : DictPut(),
+  'dict_values': DictValues(),
+  'heap_peek'  : HeapPeek(),
+  'heap_pop'   : HeapPop(),
+  'heap_prio'  : HeapPrio(),
+  'heap_push'  : HeapPush(),
+  'deque_back'      : DequeBack(),
+  'deque_front'     : DequeFront(),
+  'deque_pop_back'  : DequePopBack(),
+  'deque_pop_front' : DequePopFront(),
+  'deque_push_back' : DequePushBack(),
+  'deque_push_front': DequePushFront(),
+  'sb_append'  : SbAppend(),
+  'sb_clear'   : SbClear(),
+  'sb_str'     : SbStr(),
+
+  # regexp
+  're_findall': ReFindAll(),
+  're_match'  : ReMatch(),
+  're_search' : ReSearch(),
+  're_sub'    : ReSub(),
 
-    def call(self, interpreter: SourceInterpreterProtocol, arguments: list[LoxArray]) -> float:
-        """Return the sample standard deviation of the input `LoxArray`."""
-        return statistics.stdev(arguments[0].fields)
+  # stats
+  'mean'  : Mean(),
+  'median': Median(),
+  'mode'  : Mode(),
+  'std'   : Std(),
+
+  # random
+  'rand_float'  : RandFloat(),
+  'rand_floats' : RandFloats(),
+  'rand_int'    : RandInt(),
+  'rand_ints'   : RandInts(),
+  'rand_normal' : RandNormal(),
+  'rand_normals': RandNormals(),
+  'rand_seed'   : RandSeed(),
+}
 
+'''
+builtins = {
+        'atan':  math.atan,
+        'asin':  math.asin,
+        'acos':  math.acos,
+        'sinh':  math.sinh,
+        'cosh':  math.cosh,
+        'tanh':  math.tanh,
+}
 
 class Str2Num(BuiltinFunction):
     _shortname = "str2num"
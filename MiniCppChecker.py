@@ -2,6 +2,7 @@ from collections import ChainMap  # Tabla de Simbolos
 from typing import Union
 from MiniCppAST import *
 from MiniCpptypesys import *
+from MiniCppBuiltins import builtins, consts
 from rich import print
 from rich.console import Console
 from rich.table   import Table
@@ -70,12 +71,21 @@ class SymbolTable:
         
 class Checker(Visitor):
 
+    def __init__(self):
+        self.errors = 0
+
     @classmethod
     def check(cls, n: Node, env: SymbolTable):
         checker = cls()
         n.accept(checker,SymbolTable())
         return checker
 
+    def report(self, err: CheckError):
+        # Los errores se muestran sin detener la revision; errors cuenta
+        # cuantos hubo para que el contexto no ejecute el programa
+        Console().print(err.message)
+        self.errors += 1
+
     #==================================================================================================================
     
     def visit(self, n: Program, env: SymbolTable):
@@ -87,8 +97,7 @@ class Checker(Visitor):
             try:
                 raise CheckError("No se encontró la función 'main'.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
     
     #==================================================================================================================
 
@@ -103,8 +112,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Función '{n.ident}' ya definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         env.define(n.ident, n)
         env.push_scope()
         env.define('fun', True)
@@ -117,15 +125,13 @@ class Checker(Visitor):
             try:
                 raise CheckError("Función sin retorno.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         if n._type == 'void' and env.lookup('return'):
             try:
                 raise CheckError('Función con retorno en tipo void.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         env.pop_scope()
     
     #==================================================================================================================
@@ -135,8 +141,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('return usado fuera de una función.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if n.expr == 'True' or n.expr == 'False':
             n.expr = bool
         if self.type_func != 'void':
@@ -145,8 +150,7 @@ class Checker(Visitor):
                 try:
                     raise CheckError(f"Tipo de retorno incorrecto: se esperaba '{self.type_func}' pero se obtuvo '{return_type}'.")
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
     
     #==================================================================================================================
     
@@ -156,15 +160,13 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Clase '{n.ident}' ya definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if n.sclass != None:
             if not env.lookup_class(n.sclass):
                 try:
                     raise CheckError(f"Clase base '{n.sclass}' no definida.")
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         env.define(n.ident, n)
         env.push_scope()
         for atribmethods in n.class_body:
@@ -181,8 +183,21 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' ya definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
+        container = container_type(n._type)
+        if container is not None and container[0] == 'dict' and container[1][0] not in ('int', 'str'):
+            try:
+                raise CheckError(f"Las claves de '{n.ident}' deben ser int o str, no {container[1][0]}.")
+            except CheckError as err:
+                self.report(err)
+        if n.expr is not None and (is_reference_type(n._type) or is_reference_type(self.resolve_type(n.expr, env))):
+            n.expr.accept(self, env)
+            expr_type = self.resolve_type(n.expr, env)
+            if expr_type != n._type:
+                try:
+                    raise CheckError(f"Asignación de tipos incompatibles: {n._type} = {expr_type}.")
+                except CheckError as err:
+                    self.report(err)
         env.define(n.ident, n)
 
     #==================================================================================================================
@@ -217,16 +232,14 @@ class Checker(Visitor):
                 try:
                     raise CheckError('La condición del if debe ser una comparación.')
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         else:
             typecond = self.resolve_type(n.expr, env)
             if typecond != 'bool':
                 try:
                     raise CheckError(f'La condición del if debe ser una expresión booleana.')
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
             
         n.expr.accept(self, env)
         n.then.accept(self, env)
@@ -245,16 +258,14 @@ class Checker(Visitor):
                 try:
                     raise CheckError('La condición del ciclo while debe ser una comparación.')
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         else:
             typecond = self.resolve_type(n.expr, env)
             if typecond != 'bool': 
                 try:
                     raise CheckError('La condición del ciclo while debe ser una expresión binaria.')
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
             
         env.define('while', True)
         n.expr.accept(self, env)
@@ -271,29 +282,25 @@ class Checker(Visitor):
             try:
                 raise CheckError('La inicialización del ciclo for debe ser una asignación.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         if isinstance(n.cond, BinaryOpExpr):
             if n.cond.opr != '<' and n.cond.opr != '>' and n.cond.opr != '<=' and n.cond.opr != '>=' and n.cond.opr != '==' and n.cond.opr != '!=':
                 try:
                     raise CheckError('La condición del ciclo for debe ser una comparación.') 
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         else:
             try:
                 raise CheckError('La condición del ciclo for debe ser una expresión binaria.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
-        if not isinstance(n.iter, (PostDec, PreDec, PostInc, PreInc, VarAssignmentExpr)):
+        if not isinstance(n.iter, (PostDec, PreDec, PostInc, PreInc, VarAssignmentExpr, OperatorAssign)):
             try:
                 raise CheckError('Debe ser un incremento/decremento.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         env.define('for', True)
         n.init.accept(self, env)
         n.cond.accept(self, env)
@@ -311,8 +318,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('break usado fuera de un while/for.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
             
     #==================================================================================================================
 
@@ -324,8 +330,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('continue usado fuera de un while/for.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
     
     #==================================================================================================================
 
@@ -350,12 +355,12 @@ class Checker(Visitor):
             expr_type_left = 'float'
         if expr_type_left == 'float' and expr_type_right == 'int':
             expr_type_right = 'float'
-        if expr_type_left != expr_type_right:
+        # Las matrices se escalan por un numero (ver _binary_ops)
+        if expr_type_left != expr_type_right and check_binary_op(n.opr, expr_type_left, expr_type_right) is None:
             try:
                 raise CheckError(f"tipos incompatibles: {n.left} {expr_type_left} = {expr_type_right} {n.right}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         if expr_type_left == 'int' and expr_type_right == 'float':
             expr_type_left = 'float'
@@ -367,8 +372,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Operación binaria no soportada: {n.opr} entre {expr_type_left} y {expr_type_right}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = result_type
         
     #==================================================================================================================
@@ -381,8 +385,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Operación unaria no soportada: {n.opr} para {expr_type}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = result_type
     
     #==================================================================================================================
@@ -393,8 +396,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = var._type if hasattr(var, '_type') else type(var).__name__
     
     #==================================================================================================================
@@ -406,8 +408,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.var}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         var_type = var._type if hasattr(var, '_type') else type(var).__name__
         expr_type = self.resolve_type(n.expr, env)
         
@@ -415,8 +416,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Asignación de tipos incompatibles: {var_type} = {expr_type}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = var_type
     
     #==================================================================================================================
@@ -427,8 +427,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' ya definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         env.define(n.ident, n)
     
     #==================================================================================================================
@@ -440,20 +439,17 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if self.resolve_type(n.ndx, env) != 'int':
             try:
                 raise CheckError(f"Índice de arreglo debe ser un entero.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if array._type != self.resolve_type(n.expr, env):
             try:
                 raise CheckError(f"Tipo de arreglo incompatible: {array._type} = {self.resolve_type(n.expr, env)}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = array._type
     
     #==================================================================================================================
@@ -464,20 +460,17 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Cast no soportado: {n.expr}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if n.expr.type == n._type:
             try:
                 raise CheckError(f"Cast innecesario: {n.expr.type} a {n._type}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if n._type not in typenames:
             try:
                 raise CheckError(f"Tipo de cast no soportado: {n._type}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = n._type
     
     #==================================================================================================================
@@ -487,19 +480,24 @@ class Checker(Visitor):
         1. Verificar que la función llamada está definida
         2. Verificar los tipos de los argumentos
         '''
+        if n.args is None:
+            n.args = []
+
+        if n.ident in builtins and not env.lookup(n.ident):
+            self.check_builtin_call(n, env)
+            return
+
         func = env.lookup(n.ident)
         if not func:
             try:
                 raise CheckError(f"Función '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if not isinstance(func, FuncDeclStmt):
             try:
                 raise CheckError(f"{n.ident} no es una función")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         if n.args is None:
             n.args = []
@@ -511,8 +509,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Número incorrecto de argumentos para la función {n.ident}: se esperaban {len(func.params)} pero se obtuvieron {len(n.args)}")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         for arg, param in zip(n.args, func.params):
             arg.accept(self, env)
@@ -522,11 +519,64 @@ class Checker(Visitor):
                 try:
                     raise CheckError(f"Tipo incorrecto para el argumento {arg}: se esperaba {param_type} pero se obtuvo {arg_type}")
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         
         n.type = func._type
-    
+
+    def check_builtin_call(self, n: CallExpr, env: SymbolTable):
+        arity = builtins[n.ident].arity
+        if arity != -1 and len(n.args) != arity:
+            try:
+                raise CheckError(f"Número incorrecto de argumentos para la función {n.ident}: se esperaban {arity} pero se obtuvieron {len(n.args)}")
+            except CheckError as err:
+                self.report(err)
+        for arg in n.args:
+            arg.accept(self, env)
+        params = check_builtin_params(n.ident)
+        if params is not None:
+            container = container_type(self.resolve_type(n.args[0], env)) if n.args else None
+            for k, (arg, param_type) in enumerate(zip(n.args, params)):
+                if isinstance(param_type, int):
+                    # Tipo de los elementos del contenedor
+                    if container is None:
+                        continue
+                    param_type = container[1][param_type]
+                arg_type = self.resolve_type(arg, env)
+                if not check_param_type(param_type, arg_type):
+                    try:
+                        raise CheckError(f"Tipo incorrecto para el argumento {k+1} de '{n.ident}': se esperaba {param_type} pero se obtuvo {arg_type}")
+                    except CheckError as err:
+                        self.report(err)
+        if n.ident in ('read_csv', 'read_records') and len(n.args) > 1 \
+           and isinstance(n.args[1], ConstExpr):
+            self.check_record_spec(n, env)
+        if n.ident == 'vectorize':
+            func = env.lookup(n.args[0].ident) if n.args and isinstance(n.args[0], VarExpr) else None
+            if not isinstance(func, FuncDeclStmt):
+                try:
+                    raise CheckError(f"El primer argumento de 'vectorize' debe ser una función")
+                except CheckError as err:
+                    self.report(err)
+        n.type = self.resolve_type(n, env)
+    
+    def check_record_spec(self, n: CallExpr, env: SymbolTable):
+        # Un arreglo por campo seleccionado, del tipo declarado en la descripcion
+        try:
+            try:
+                _, fields = record_fields(n.args[1].value, n.ident == 'read_records')
+            except ValueError as err:
+                raise CheckError(f"Descripción de campos incorrecta en '{n.ident}': {err}")
+            types = [_type for _type, keep in fields if keep]
+            arrays = n.args[2:]
+            if len(arrays) != len(types):
+                raise CheckError(f"'{n.ident}' selecciona {len(types)} campos pero recibe {len(arrays)} arreglos")
+            for k, (_type, array) in enumerate(zip(types, arrays)):
+                array_type = self.resolve_type(array, env)
+                if array_type != _type:
+                    raise CheckError(f"Tipo incorrecto para el arreglo {k+1} de '{n.ident}': se esperaba {_type} pero se obtuvo {array_type}")
+        except CheckError as err:
+            self.report(err)
+
     #==================================================================================================================
     
     def visit(self, n: Grouping, env: SymbolTable):
@@ -542,8 +592,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"El atributo '{n.name}' no esta definido.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
             
     #==================================================================================================================
     
@@ -554,8 +603,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"El atributo '{n.name}' no esta definido.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr.accept(self, env)
             
     #==================================================================================================================
@@ -565,16 +613,14 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr.accept(self, env)
         if self.resolve_type(n.expr, env) != 'int':
             try:
                 raise CheckError(f"Índice de arreglo debe ser un entero.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
-        n.type = n.ident
+                self.report(err)
+        n.type = self.resolve_type(n, env)
     
     #==================================================================================================================
     
@@ -584,11 +630,8 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
-        else:
-            size = self.resolve_type(size, env)
-            n.type = size
+                self.report(err)
+        n.type = 'int'
             
     #==================================================================================================================
         
@@ -598,8 +641,7 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"IntToFloat solo acepta enteros.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = 'float'
         
     #==================================================================================================================
@@ -610,14 +652,13 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         if not isinstance(Array, ArrayDeclStmt):
             try:
                 raise CheckError(f"Variable '{n.ident}' no es un arreglo.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
+        n.type = 'int'
         
     #==================================================================================================================
         
@@ -636,15 +677,13 @@ class Checker(Visitor):
             try:
                 raise CheckError('La cadena de formato debe ser una cadena.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         format_specifiers = self.get_format_specifiers(n.string)
         if len(format_specifiers) != len(n.args):
             try:
                 raise CheckError('Número incorrecto de argumentos para la función printf.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
                 
         for arg, specifier in zip(n.args, format_specifiers):
             arg_type = self.resolve_type(arg, env)
@@ -652,8 +691,7 @@ class Checker(Visitor):
                 try:
                     raise CheckError(f"Tipo incorrecto para el argumento {arg}: se esperaba {specifier} pero se obtuvo {arg_type}")
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
                     
         for arg in n.args:
             arg.accept(self, env)
@@ -665,8 +703,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('La cadena de formato debe ser una cadena.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
                 
         format_specifiers = self.get_format_specifiers(n.string)
         
@@ -674,8 +711,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('Número incorrecto de argumentos para la función scanf.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
                 
         for arg, specifier in zip(n.args, format_specifiers):
             arg_type = self.resolve_type(arg, env)
@@ -683,8 +719,7 @@ class Checker(Visitor):
                 try:
                     raise CheckError(f"Tipo incorrecto para el argumento {arg}: se esperaba {specifier} pero se obtuvo {arg_type}")
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         
         for arg in n.args:
             arg.accept(self, env)
@@ -693,12 +728,12 @@ class Checker(Visitor):
     #==================================================================================================================
     
     def visit(self, n: NewArrayExpr, env: SymbolTable):
-        if n._type not in typenames:
+        # Los arreglos de cadenas se guardan como listas
+        if n._type not in typenames and n._type != 'str':
             try:
                 raise CheckError(f"Tipo de arreglo no soportado: {n._type}")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
     
     #==================================================================================================================
     
@@ -707,8 +742,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('Incremento solo acepta variables.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr.accept(self, env)
     
     #==================================================================================================================
@@ -718,8 +752,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('Decremento solo acepta variables.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr.accept(self, env)
         
     #==================================================================================================================
@@ -729,8 +762,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('Incremento solo acepta variables.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr.accept(self, env)
     
     #==================================================================================================================
@@ -740,8 +772,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('Decremento solo acepta variables.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr.accept(self, env)
         
     #==================================================================================================================
@@ -751,8 +782,7 @@ class Checker(Visitor):
             try:
                 raise CheckError('Operador de asignación solo acepta variables.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.expr0.accept(self, env)
         n.expr1.accept(self, env)
         
@@ -770,15 +800,13 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Operación lógica no soportada: {n.left.type} {n.opr} {n.right.type}.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
 
         if n.opr != '&&' and n.opr != '||':
             try:
                 raise CheckError(f"Operador lógico no soportado: {n.opr}")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         n.type = 'bool'
 
     #==================================================================================================================
@@ -789,29 +817,26 @@ class Checker(Visitor):
             try:
                 raise CheckError(f"Variable '{n.ident}' no definida.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
                 
-        if string._type != 'str':
+        # sprintf sobre un strbuf agrega al final en vez de reemplazar
+        if string._type not in ('str', 'strbuf'):
             try:
                 raise CheckError(f"Variable '{n.ident}' no es un string.")
             except CheckError as err:
-                console = Console()
-                console.print(err.message) 
+                self.report(err) 
                 
         if not isinstance(n.string, str):
             try:
                 raise CheckError('La cadena de formato debe ser una cadena.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         if len(n.args) != len(self.get_format_specifiers(n.string)):
             try:
                 raise CheckError('Número incorrecto de argumentos para la función sprintf.')
             except CheckError as err:
-                console = Console()
-                console.print(err.message)
+                self.report(err)
         
         format_specifiers = self.get_format_specifiers(n.string)
         for arg, specifier in zip(n.args, format_specifiers):
@@ -820,19 +845,25 @@ class Checker(Visitor):
                 try:
                     raise CheckError(f"Tipo incorrecto para el argumento {arg}: se esperaba {specifier} pero se obtuvo {arg_type}")
                 except CheckError as err:
-                    console = Console()
-                    console.print(err.message)
+                    self.report(err)
         
     #==================================================================================================================
     #Metodos auxiliares
 
     def resolve_type(self, expr, env):
         if isinstance(expr, BinaryOpExpr):
-            return self.resolve_type(expr.left, env)
+            left = self.resolve_type(expr.left, env)
+            if left != 'matrix' and self.resolve_type(expr.right, env) == 'matrix':
+                # escalar * matriz
+                return 'matrix'
+            return left
         if isinstance(expr, VarExpr):
             var = env.lookup(expr.ident)
             return var._type if hasattr(var, '_type') else type(var).__name__
         if isinstance(expr, ConstExpr):
+            # BOOL_LIT llega como la cadena 'true'/'false'
+            if expr.value in ('true', 'false'):
+                return 'bool'
             return type(expr.value).__name__
         if isinstance(expr, VarDeclStmt):
             return expr._type
@@ -842,11 +873,37 @@ class Checker(Visitor):
             return self.resolve_type(expr.expr, env)
         if isinstance(expr, CallExpr):
             func = env.lookup(expr.ident)
+            if not func and expr.ident in builtins:
+                if expr.ident == 'vectorize' and expr.args and isinstance(expr.args[0], VarExpr):
+                    # Arreglo del tipo de la funcion vectorizada
+                    return getattr(env.lookup(expr.args[0].ident), '_type', None)
+                if expr.ident in ('slice', 'max', 'min', 'mode') and expr.args:
+                    # Vista o elemento del arreglo: el tipo de sus elementos
+                    return self.resolve_type(expr.args[0], env)
+                if expr.ident in ('sum', 'dot') and expr.args:
+                    _type = self.resolve_type(expr.args[0], env)
+                    return 'int' if _type == 'bool' else _type
+                element = check_builtin_element(expr.ident)
+                if element is not None and expr.args:
+                    container = container_type(self.resolve_type(expr.args[0], env))
+                    return container[1][element] if container else None
+                if expr.ident in ('map_array', 'map_create') and len(expr.args) > 1 \
+                   and isinstance(expr.args[1], ConstExpr):
+                    # Arreglo del tipo que se pasa como cadena: "float"
+                    return expr.args[1].value
+                return check_builtin_call(expr.ident)
             return func._type
         if isinstance(expr, LogicalOpExpr):
             return 'bool'
         if isinstance(expr, UnaryOpExpr):
             return self.resolve_type(expr.expr, env)
+        if isinstance(expr, NewArrayExpr):
+            return expr._type
+        if isinstance(expr, ArrayLoockupExpr):
+            array = env.lookup(expr.ident)
+            return array._type if hasattr(array, '_type') else None
+        if isinstance(expr, (ArraySizeExpr, SizeOfExpr)):
+            return 'int'
     
     def get_format_specifiers(self, string):
         specifiers = []
@@ -865,3 +922,62 @@ class Checker(Visitor):
         self.visit(ast, env)
         console = Console()
         console.print(env.get_symbol_table())
+
+    #==================================================================================================================
+    # Pureza de funciones
+
+    def classify_purity(self, program: Program):
+        '''
+        Marca cada FuncDeclStmt con n.pure. Una funcion es pura si no lee
+        ni escribe globales, no usa arreglos ni objetos, no hace E/S
+        (printf, scanf, builtins impuros) y solo llama funciones puras.
+        '''
+        funcs = [ d for d in program.decls if isinstance(d, FuncDeclStmt) ]
+        calls = { }
+        for func in funcs:
+            func.pure, calls[func.ident] = self._local_purity(func)
+
+        # Punto fijo: una llamada a una funcion impura contamina al llamador
+        byname = { func.ident: func for func in funcs }
+        changed = True
+        while changed:
+            changed = False
+            for func in funcs:
+                if func.pure and any(name not in byname or not byname[name].pure
+                                     for name in calls[func.ident]):
+                    func.pure = False
+                    changed = True
+
+    def _local_purity(self, func: FuncDeclStmt):
+        params = func.params or []
+        if any(not isinstance(p, VarDeclStmt) for p in params):
+            return False, set()
+
+        local = { p.ident for p in params }
+        for node in walk(func.stmts):
+            if isinstance(node, (VarDeclStmt, ArrayDeclStmt)):
+                local.add(node.ident)
+        # Las matrices y los contenedores son objetos mutables, como los arreglos
+        if is_reference_type(func._type) or any(isinstance(node, VarDeclStmt) and is_reference_type(node._type)
+                                                for node in walk(func.stmts)) \
+           or any(is_reference_type(p._type) for p in params):
+            return False, set()
+
+        calls = set()
+        for node in walk(func.stmts):
+            if isinstance(node, (PrintfStmt, ScanfStmt, SprintfStmt, ArrayDeclStmt, NewArrayExpr,
+                                 ArrayLoockupExpr, ArrayAssignmentExpr, ArraySizeExpr,
+                                 Get, Set, This, Super)):
+                return False, calls
+            if isinstance(node, VarExpr) and node.ident not in local and node.ident not in consts:
+                return False, calls
+            if isinstance(node, VarAssignmentExpr) and node.var not in local:
+                return False, calls
+            if isinstance(node, CallExpr):
+                builtin = builtins.get(node.ident)
+                if builtin is not None:
+                    if not builtin.pure:
+                        return False, calls
+                else:
+                    calls.add(node.ident)
+        return True, calls
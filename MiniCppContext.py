@@ -7,13 +7,18 @@ Sirve como repositorio de información sobre el programa,
 inluido el codigo fuente, informe de errores, etc.
 '''
 from rich     import print
+from rich.console import Console
+import copy
 
-from MiniCppAST    import Node
+from MiniCppAST    import Node, SourceVisitor, walk
 from MiniCppLex    import Lexer
 from MiniCppParser import Parser
 from collections   import ChainMap
 from MiniCppInterp import Interpreter
-from MiniCppChecker import Checker
+from MiniCppChecker import Checker, SymbolTable
+from MiniCppPartialEval import PartialEvaluator
+from MiniCppIR import IRBuilder, IRError, print_ir
+from MiniCppPasses import PassManager
 
 class Context:
     def __init__(self):
@@ -25,24 +30,104 @@ class Context:
         self.ast    = None
         self.have_errors = False
         self.env = ChainMap()
+        self.report_tailcalls = False
+        self.time_passes = False
+        self.peval_budget = 20000
+        self.unroll_factor = 4
+        self.unroll_full = 8
+        self.tailcalls = []
+        self.passes = PassManager(self)
 
     def parse(self, source):
         self.have_errors = False
         self.source = source
         self.ast = self.parser.parse(self.lexer.tokenize(self.source))
     
-    def run(self):
+    def check(self):
+        '''
+        Revisa el AST con el Checker antes de transformarlo o ejecutarlo.
+        Devuelve False si hubo errores
+        '''
         if not self.have_errors:
-            return self.interprete.interpret(self.ast)
+            self.checker = Checker.check(self.ast, SymbolTable())
+            if self.checker.errors:
+                self.have_errors = True
+        return not self.have_errors
+
+    def run(self):
+        if self.check():
+            self.ast = self.passes.run(self.ast)
+            if self.time_passes:
+                self.passes.print_timings()
+            if self.report_tailcalls:
+                self.print_tailcalls(self.tailcalls)
+            if not self.have_errors:
+                return self.interprete.interpret(self.ast)
+
+    def partial_eval(self, budget):
+        if not self.check():
+            return
+        residual, report = PartialEvaluator.specialize(self.ast, budget)
+        console = Console()
+        for line in report:
+            console.print(f"// {line}", markup=False, highlight=False)
+        console.print(SourceVisitor.unparse(residual), markup=False, highlight=False, soft_wrap=True)
+
+    def lower(self):
+        '''
+        Baja el AST revisado a IR en forma SSA y lo valida
+        '''
+        if not self.check():
+            return None
+        try:
+            module = IRBuilder.lower(self.ast)
+        except IRError as err:
+            self.error(err.node, str(err))
+            return None
+        for message in module.verify():
+            self.error('IR', message)
+        return module
+
+    def dump_ir(self):
+        module = self.lower()
+        if module is not None:
+            print_ir(module)
+
+    def print_tailcalls(self, converted):
+        if not converted:
+            print("No se encontraron llamadas de cola")
+        for func, stmt in converted:
+            lineno = self.parser.line_position(stmt) if self.has_position(stmt) else '?'
+            print(f"{lineno}: llamada de cola en '{func.ident}' convertida a ciclo: {self.find_source(stmt.tailcall)}")
     
+    def clone(self, node):
+        '''
+        Copia profunda de node que conserva la posicion en el fuente de
+        cada nodo (para los mensajes de error sobre codigo transformado)
+        '''
+        result = copy.deepcopy(node)
+        lines = getattr(self.parser, '_line_positions', {})
+        indices = getattr(self.parser, '_index_positions', {})
+        for orig, new in zip(walk(node), walk(result)):
+            if id(orig) in lines:
+                lines[id(new)] = lines[id(orig)]
+            if id(orig) in indices:
+                indices[id(new)] = indices[id(orig)]
+        return result
+
+    def has_position(self, node):
+        return id(node) in getattr(self.parser, '_index_positions', {})
+
     def find_source(self, node):
-        indices = self.parser.index_position(node)
+        indices = self.has_position(node) and self.parser.index_position(node)
         if indices:
             return self.source[indices[0]:indices[1]]
         else:
             return f"{type(node).__name__} (fuente no disponible)"
     
     def error(self, position, message):
+        if isinstance(position, Node) and not self.has_position(position):
+            position = type(position).__name__
         if isinstance(position, Node):
             lineno = self.parser.line_position(position)
             (start, end) = (part_start, part_end) = self.parser.index_position(position)
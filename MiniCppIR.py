@@ -0,0 +1,987 @@
+# mcir.py
+'''
+Representacion intermedia (IR)
+==============================
+El AST deja el flujo de control implicito: ForStmt.init puede ser una
+declaracion o una expresion, los '&&'/'||' evaluan en cortocircuito y
+'break'/'continue' saltan a destinos que hay que deducir. Este modulo
+baja el AST a un grafo de flujo de control (CFG) de bloques basicos con
+saltos explicitos y luego lo convierte a forma SSA con nodos phi, de modo
+que las optimizaciones y generadores de codigo tengan una sola entrada
+bien definida.
+
+Instrucciones (codigo de tres direcciones):
+
+    %t = a + b              bin     (operadores de BinaryOpExpr)
+    %t = -a  /  %t = !a     un
+    %x = a                  copy
+    %t = load @g            lectura de una global
+    store @g, a             escritura de una global
+    %t = call f(a, b)       llamada a funcion o builtin
+    %t = aload a, i         a[i]
+    astore a, i, v          a[i] = v
+    %t = newarray int, n    new int[n]
+    %t = asize a            ArraySize(a)
+    %t = sizeof a           size(a)
+    %t = itof a             IntToFloat(a)
+    %t = cast int a         cast int(a)
+    printf "fmt", a, b
+    %x, %y = scanf "fmt"
+    %s = sprintf "fmt", a
+    %x = phi [B1: a], [B2: b]
+
+Terminadores: 'jmp L', 'br c, Lv, Lf', 'ret' y 'ret a'.
+
+Las variables locales y parametros se renombran en SSA (%x.0, %x.1...);
+los temporales (%t1) ya tienen una sola definicion. Las globales (@g) se
+tratan como memoria y solo se acceden con load/store.
+'''
+from collections import defaultdict
+from rich.console import Console
+
+from MiniCppAST import *
+
+
+class IRError(Exception):
+  '''
+  Construccion del AST que no tiene traduccion al IR
+  '''
+  def __init__(self, node, message):
+    super().__init__(message)
+    self.node = node
+
+
+# =====================================================================
+# Operandos
+# =====================================================================
+
+class Operand:
+  pass
+
+class Const(Operand):
+
+  def __init__(self, value):
+    self.value = value
+
+  def __eq__(self, other):
+    return (isinstance(other, Const) and type(self.value) is type(other.value)
+            and self.value == other.value)
+
+  def __hash__(self):
+    return hash((type(self.value), self.value))
+
+  def __str__(self):
+    if self.value is None:
+      return 'undef'
+    if isinstance(self.value, bool):
+      return 'true' if self.value else 'false'
+    if isinstance(self.value, str):
+      return _quote(self.value)
+    return repr(self.value)
+
+class Var(Operand):
+  '''
+  Variable local, parametro o temporal (%nombre)
+  '''
+  def __init__(self, name):
+    self.name = name
+
+  def __eq__(self, other):
+    return isinstance(other, Var) and self.name == other.name
+
+  def __hash__(self):
+    return hash(self.name)
+
+  def __str__(self):
+    return f'%{self.name}'
+
+class Global(Operand):
+  '''
+  Global o funcion del programa (@nombre)
+  '''
+  def __init__(self, name):
+    self.name = name
+
+  def __eq__(self, other):
+    return isinstance(other, Global) and self.name == other.name
+
+  def __hash__(self):
+    return hash(self.name)
+
+  def __str__(self):
+    return f'@{self.name}'
+
+
+UNDEF = Const(None)
+
+
+def _quote(value):
+  value = value.replace('\\', '\\\\').replace('"', '\\"')
+  value = value.replace('\n', '\\n').replace('\t', '\\t')
+  return f'"{value}"'
+
+
+# =====================================================================
+# Instrucciones, bloques y funciones
+# =====================================================================
+
+TERMINATORS = { 'jmp', 'br', 'ret' }
+
+class Instr:
+  '''
+  Instruccion del IR. 'dests' son las variables definidas, 'args' los
+  operandos usados y 'attr' el dato propio de la operacion (operador,
+  formato, tipo o nombre de funcion). Los terminadores guardan en
+  'targets' las etiquetas de sus bloques sucesores; los phi guardan en
+  'targets' el bloque predecesor de cada operando.
+  '''
+  def __init__(self, op, dests=(), args=(), attr=None, targets=()):
+    self.op      = op
+    self.dests   = list(dests)
+    self.args    = list(args)
+    self.attr    = attr
+    self.targets = list(targets)
+
+  @property
+  def is_terminator(self):
+    return self.op in TERMINATORS
+
+  def __str__(self):
+    op, args = self.op, [ str(a) for a in self.args ]
+    if op == 'phi':
+      text = 'phi ' + ', '.join(f'[{l}: {a}]' for l, a in zip(self.targets, args))
+    elif op == 'copy':
+      text = args[0]
+    elif op == 'bin':
+      text = f'{args[0]} {self.attr} {args[1]}'
+    elif op == 'un':
+      text = f'{self.attr}{args[0]}'
+    elif op == 'call':
+      text = f'call @{self.attr}({", ".join(args)})'
+    elif op in ('jmp', 'br'):
+      text = f'{op} ' + ', '.join(args + self.targets)
+    elif op in ('printf', 'scanf', 'sprintf'):
+      text = f'{op} ' + ', '.join([ _quote(self.attr) ] + args)
+    elif op in ('newarray', 'cast'):
+      text = f'{op} {self.attr} ' + ', '.join(args)
+    elif op in ('load', 'store'):
+      text = f'{op} ' + ', '.join([ f'@{self.attr}' ] + args)
+    else:
+      text = f'{op} ' + ', '.join(args) if args else op
+    if self.dests:
+      return ', '.join(str(d) for d in self.dests) + ' = ' + text
+    return text
+
+
+class Block:
+
+  def __init__(self, label):
+    self.label  = label
+    self.phis   = [ ]
+    self.instrs = [ ]
+    self.preds  = [ ]
+
+  @property
+  def terminator(self):
+    if self.instrs and self.instrs[-1].is_terminator:
+      return self.instrs[-1]
+    return None
+
+  @property
+  def succs(self):
+    term = self.terminator
+    return list(term.targets) if term else [ ]
+
+  def __str__(self):
+    header = f'{self.label}:'
+    if self.preds:
+      header = f'{header:<32}; preds: {", ".join(self.preds)}'
+    lines = [ header ]
+    lines += [ f'  {i}' for i in self.phis + self.instrs ]
+    return '\n'.join(lines)
+
+
+class IRFunction:
+
+  def __init__(self, name, rtype, params):
+    self.name   = name
+    self.rtype  = rtype
+    self.params = params          # [(tipo, Var)]
+    self.blocks = [ ]
+    self.variables = { }          # nombre -> tipo de las variables locales
+    self.ssa = False
+    self.ntemps  = 0
+    self.nlabels = 0
+
+  @property
+  def entry(self):
+    return self.blocks[0]
+
+  def block_map(self):
+    return { b.label: b for b in self.blocks }
+
+  def compute_preds(self):
+    blocks = self.block_map()
+    for block in self.blocks:
+      block.preds = [ ]
+    for block in self.blocks:
+      for succ in block.succs:
+        if block.label not in blocks[succ].preds:
+          blocks[succ].preds.append(block.label)
+
+  def __str__(self):
+    params = ', '.join(f'{t} {v}' for t, v in self.params)
+    body = '\n'.join(str(b) for b in self.blocks)
+    return f'function {self.rtype} @{self.name}({params}) {{\n{body}\n}}'
+
+
+class IRModule:
+
+  def __init__(self):
+    self.globals   = { }          # nombre -> (tipo, valor inicial constante)
+    self.functions = [ ]
+
+  def function(self, name):
+    for func in self.functions:
+      if func.name == name:
+        return func
+    return None
+
+  def verify(self):
+    errors = [ ]
+    for func in self.functions:
+      errors += verify(func)
+    return errors
+
+  def __str__(self):
+    lines = [ ]
+    for name, (_type, init) in self.globals.items():
+      if init is None:
+        lines.append(f'global {_type} @{name}')
+      else:
+        lines.append(f'global {_type} @{name} = {init}')
+    parts = [ '\n'.join(lines) ] if lines else [ ]
+    parts += [ str(f) for f in self.functions ]
+    return '\n\n'.join(parts) + '\n'
+
+
+# =====================================================================
+# Construccion del CFG a partir del AST
+# =====================================================================
+
+class IRBuilder(Visitor):
+  '''
+  Baja el AST a bloques basicos. Las variables locales se renombran solo
+  para distinguir declaraciones que se ocultan entre si (x, x#1...); la
+  forma SSA se obtiene despues con SSABuilder.
+  '''
+  def __init__(self):
+    self.module  = IRModule()
+    self.func    = None
+    self.block   = None
+    self.scopes  = [ ]
+    self.loops   = [ ]        # (destino de continue, destino de break)
+    self.init    = None       # funcion con los inicializadores de globales
+
+  @classmethod
+  def lower(cls, program: Program, ssa=True):
+    builder = cls()
+    program.accept(builder)
+    module = builder.module
+    for func in module.functions:
+      func.compute_preds()
+      remove_unreachable(func)
+      if ssa:
+        SSABuilder(func).run()
+    return module
+
+  # Utilidades
+
+  def temp(self):
+    self.func.ntemps += 1
+    return Var(f't{self.func.ntemps}')
+
+  def new_block(self, hint):
+    self.func.nlabels += 1
+    block = Block(f'{hint}{self.func.nlabels}')
+    self.func.blocks.append(block)
+    return block
+
+  def emit(self, op, dests=(), args=(), attr=None, targets=()):
+    instr = Instr(op, dests, args, attr, targets)
+    self.block.instrs.append(instr)
+    return instr
+
+  def value(self, op, args=(), attr=None):
+    dest = self.temp()
+    self.emit(op, [ dest ], args, attr)
+    return dest
+
+  def jump(self, label):
+    if self.block.terminator is None:
+      self.emit('jmp', targets=[ label ])
+
+  def branch(self, cond, then, else_):
+    self.emit('br', args=[ cond ], targets=[ then, else_ ])
+
+  def start(self, block):
+    self.block = block
+
+  def declare(self, ident, _type):
+    name = ident
+    count = 0
+    while name in self.func.variables:
+      count += 1
+      name = f'{ident}#{count}'
+    self.func.variables[name] = _type
+    self.scopes[-1][ident] = name
+    return Var(name)
+
+  def lookup(self, ident):
+    for scope in reversed(self.scopes):
+      if ident in scope:
+        return Var(scope[ident])
+    return None
+
+  def read(self, node, ident):
+    var = self.lookup(ident)
+    if var is not None:
+      return var
+    if ident in self.module.globals:
+      return self.value('load', attr=ident)
+    if ident in ('True', 'False'):
+      return Const(ident == 'True')
+    return Global(ident)
+
+  def write(self, ident, value):
+    var = self.lookup(ident)
+    if var is not None:
+      self.emit('copy', [ var ], [ value ])
+    else:
+      self.emit('store', args=[ value ], attr=ident)
+
+  def begin_function(self, name, rtype, params):
+    self.func = IRFunction(name, rtype, [ ])
+    self.module.functions.append(self.func)
+    self.scopes = [ { } ]
+    self.func.blocks.append(Block('entry'))
+    self.start(self.func.entry)
+    for param in params or [ ]:
+      var = self.declare(param.ident, param._type)
+      self.func.params.append((param._type, var))
+
+  # Declaraciones
+
+  def visit(self, n: Program):
+    for decl in n.decls:
+      decl.accept(self)
+    if self.init is not None:
+      self.func = self.init
+      self.block = self.init.blocks[-1]
+      self.emit('ret')
+
+  def visit(self, n: ClassDeclStmt):
+    raise IRError(n, f"Las clases no tienen traduccion al IR ('{n.ident}')")
+
+  def visit(self, n: FuncDeclStmt):
+    self.begin_function(n.ident, n._type, n.params)
+    n.stmts.accept(self)
+    if self.block.terminator is None:
+      # Al caer del final la funcion no devuelve valor, como 'return;'
+      # (Function._call devuelve None)
+      self.emit('ret')
+    self.func = None
+
+  def global_decl(self, n):
+    if isinstance(n, ArrayDeclStmt) or n.expr is None:
+      self.module.globals[n.ident] = (n._type, None)
+      return
+    if isinstance(n.expr, ConstExpr):
+      self.module.globals[n.ident] = (n._type, self.const(n.expr))
+      return
+    # Inicializador no constante: se evalua en '.init', en orden
+    self.module.globals[n.ident] = (n._type, None)
+    if self.init is None:
+      self.begin_function('.init', 'void', [ ])
+      self.init = self.func
+    self.func, self.scopes = self.init, [ { } ]
+    self.block = self.init.blocks[-1]
+    self.emit('store', args=[ n.expr.accept(self) ], attr=n.ident)
+    self.func = None
+
+  def visit(self, n: VarDeclStmt):
+    if self.func is None:
+      return self.global_decl(n)
+    value = n.expr.accept(self) if n.expr else UNDEF
+    var = self.declare(n.ident, n._type)
+    self.emit('copy', [ var ], [ value ])
+
+  def visit(self, n: ArrayDeclStmt):
+    if self.func is None:
+      return self.global_decl(n)
+    var = self.declare(n.ident, f'{n._type}[]')
+    self.emit('copy', [ var ], [ UNDEF ])
+
+  # Statements
+
+  def visit(self, n: CompoundStmt):
+    self.scopes.append({ })
+    for decl in n.decls:
+      decl.accept(self)
+    for stmt in n.stmts:
+      stmt.accept(self)
+    self.scopes.pop()
+
+  def visit(self, n: NullStmt):
+    pass
+
+  def visit(self, n: ExprStmt):
+    n.expr.accept(self)
+
+  def visit(self, n: IfStmt):
+    cond = n.expr.accept(self)
+    then = self.new_block('if.then')
+    join = self.new_block('if.end')
+    else_ = self.new_block('if.else') if n.else_ else join
+    self.branch(cond, then.label, else_.label)
+    self.start(then)
+    n.then.accept(self)
+    self.jump(join.label)
+    if n.else_:
+      self.start(else_)
+      n.else_.accept(self)
+      self.jump(join.label)
+    self.start(join)
+    self.func.blocks.remove(join)
+    self.func.blocks.append(join)
+
+  def visit(self, n: WhileStmt):
+    header = self.new_block('while.cond')
+    self.jump(header.label)
+    self.start(header)
+    cond = n.expr.accept(self)
+    body = self.new_block('while.body')
+    exit = self.new_block('while.end')
+    self.branch(cond, body.label, exit.label)
+    self.start(body)
+    self.loops.append((header.label, exit.label))
+    n.stmt.accept(self)
+    self.loops.pop()
+    self.jump(header.label)
+    self.func.blocks.remove(exit)
+    self.func.blocks.append(exit)
+    self.start(exit)
+
+  def visit(self, n: ForStmt):
+    self.scopes.append({ })
+    n.init.accept(self)
+    header = self.new_block('for.cond')
+    self.jump(header.label)
+    self.start(header)
+    cond = n.cond.accept(self)
+    body = self.new_block('for.body')
+    latch = self.new_block('for.inc')
+    exit = self.new_block('for.end')
+    self.branch(cond, body.label, exit.label)
+    self.start(body)
+    self.loops.append((latch.label, exit.label))
+    n.stmt.accept(self)
+    self.loops.pop()
+    self.jump(latch.label)
+    self.func.blocks.remove(latch)
+    self.func.blocks.append(latch)
+    self.start(latch)
+    n.iter.accept(self)
+    self.jump(header.label)
+    self.func.blocks.remove(exit)
+    self.func.blocks.append(exit)
+    self.start(exit)
+    self.scopes.pop()
+
+  def visit(self, n: ReturnStmt):
+    args = [ n.expr.accept(self) ] if n.expr else [ ]
+    self.emit('ret', args=args)
+    self.start(self.new_block('dead'))
+
+  def visit(self, n: BreakStmt):
+    if not self.loops:
+      raise IRError(n, "'break' fuera de un ciclo")
+    self.jump(self.loops[-1][1])
+    self.start(self.new_block('dead'))
+
+  def visit(self, n: ContinueStmt):
+    if not self.loops:
+      raise IRError(n, "'continue' fuera de un ciclo")
+    self.jump(self.loops[-1][0])
+    self.start(self.new_block('dead'))
+
+  def visit(self, n: PrintfStmt):
+    args = [ arg.accept(self) for arg in n.args or [] ]
+    self.emit('printf', args=args, attr=n.string)
+
+  def visit(self, n: ScanfStmt):
+    # Las locales reciben el valor directamente; las globales y los
+    # elementos a[i] (con a e i evaluados antes de leer, como en el
+    # Interpreter) lo reciben en un temporal que luego se guarda
+    dests, stores = [ ], [ ]
+    for arg in n.args:
+      if isinstance(arg, VarExpr) and self.lookup(arg.ident) is not None:
+        dests.append(self.lookup(arg.ident))
+      elif isinstance(arg, VarExpr) and arg.ident in self.module.globals:
+        dests.append(self.temp())
+        stores.append((dests[-1], arg.ident, None))
+      elif isinstance(arg, ArrayLoockupExpr):
+        array = self.read(arg, arg.ident)
+        dests.append(self.temp())
+        stores.append((dests[-1], array, arg.expr.accept(self)))
+      else:
+        raise IRError(n, 'scanf solo puede leer variables y elementos de arreglos')
+    self.emit('scanf', dests, attr=n.string)
+    for value, target, ndx in stores:
+      if ndx is None:
+        self.emit('store', args=[ value ], attr=target)
+      else:
+        self.emit('astore', args=[ target, ndx, value ])
+
+  def visit(self, n: SprintfStmt):
+    args = [ arg.accept(self) for arg in n.args or [] ]
+    self.write(n.ident, self.value('sprintf', args, n.string))
+
+  # Expresiones
+
+  def const(self, n):
+    if n.value in ('true', 'false'):
+      return Const(n.value == 'true')
+    return Const(n.value)
+
+  def visit(self, n: ConstExpr):
+    return self.const(n)
+
+  def visit(self, n: VarExpr):
+    return self.read(n, n.ident)
+
+  def visit(self, n: Grouping):
+    return n.expr.accept(self)
+
+  def visit(self, n: BinaryOpExpr):
+    left = n.left.accept(self)
+    right = n.right.accept(self)
+    return self.value('bin', [ left, right ], n.opr)
+
+  def visit(self, n: UnaryOpExpr):
+    expr = n.expr.accept(self)
+    if n.opr == '+':
+      return expr
+    return self.value('un', [ expr ], n.opr)
+
+  def visit(self, n: LogicalOpExpr):
+    # El resultado es una variable (no un temporal): recibe un valor en
+    # cada camino y la forma SSA la une con un phi
+    self.func.ntemps += 1
+    result = Var(f'sc{self.func.ntemps}')
+    self.func.variables[result.name] = 'bool'
+    left = n.left.accept(self)
+    self.emit('copy', [ result ], [ left ])
+    right = self.new_block('sc.rhs')
+    join = self.new_block('sc.end')
+    if n.opr == '||':
+      self.branch(left, join.label, right.label)
+    else:
+      self.branch(left, right.label, join.label)
+    self.start(right)
+    self.emit('copy', [ result ], [ n.right.accept(self) ])
+    self.jump(join.label)
+    self.func.blocks.remove(join)
+    self.func.blocks.append(join)
+    self.start(join)
+    return result
+
+  def visit(self, n: VarAssignmentExpr):
+    value = n.expr.accept(self)
+    self.write(n.var, value)
+    return value
+
+  def visit(self, n: OperatorAssign):
+    ident = self.target(n, n.expr0)
+    value = n.expr1.accept(self)
+    result = self.value('bin', [ self.read(n, ident), value ], n.op[0])
+    self.write(ident, result)
+    return result
+
+  def target(self, n, expr):
+    if not isinstance(expr, VarExpr):
+      raise IRError(n, f"Se esperaba una variable en '{n.op}'")
+    return expr.ident
+
+  def step(self, n, opr, post):
+    ident = self.target(n, n.expr)
+    old = self.read(n, ident)
+    if isinstance(old, Var) and old == self.lookup(ident):
+      # El valor anterior debe sobrevivir a la escritura
+      old = self.value('copy', [ old ])
+    new = self.value('bin', [ old, Const(1) ], opr)
+    self.write(ident, new)
+    return old if post else new
+
+  def visit(self, n: PreInc):
+    return self.step(n, '+', False)
+
+  def visit(self, n: PreDec):
+    return self.step(n, '-', False)
+
+  def visit(self, n: PostInc):
+    return self.step(n, '+', True)
+
+  def visit(self, n: PostDec):
+    return self.step(n, '-', True)
+
+  def visit(self, n: CallExpr):
+    args = [ arg.accept(self) for arg in n.args or [] ]
+    return self.value('call', args, n.ident)
+
+  def visit(self, n: ArrayLoockupExpr):
+    array = self.read(n, n.ident)
+    return self.value('aload', [ array, n.expr.accept(self) ])
+
+  def visit(self, n: ArrayAssignmentExpr):
+    array = self.read(n, n.ident)
+    ndx = n.ndx.accept(self)
+    value = n.expr.accept(self)
+    self.emit('astore', args=[ array, ndx, value ])
+    return value
+
+  def visit(self, n: NewArrayExpr):
+    return self.value('newarray', [ n.expr.accept(self) ], n._type)
+
+  def visit(self, n: ArraySizeExpr):
+    return self.value('asize', [ self.read(n, n.ident) ])
+
+  def visit(self, n: SizeOfExpr):
+    return self.value('sizeof', [ self.read(n, n.ident) ])
+
+  def visit(self, n: IntToFloatExpr):
+    return self.value('itof', [ n.expr.accept(self) ])
+
+  def visit(self, n: CastExpr):
+    return self.value('cast', [ n.expr.accept(self) ], n._type)
+
+  def visit(self, n: Node):
+    raise IRError(n, f'{type(n).__name__} no tiene traduccion al IR')
+
+
+# =====================================================================
+# Analisis del CFG
+# =====================================================================
+
+def remove_unreachable(func: IRFunction):
+  blocks = func.block_map()
+  seen = { func.entry.label }
+  stack = [ func.entry.label ]
+  while stack:
+    for succ in blocks[stack.pop()].succs:
+      if succ not in seen:
+        seen.add(succ)
+        stack.append(succ)
+  func.blocks = [ b for b in func.blocks if b.label in seen ]
+  func.compute_preds()
+
+
+def reverse_postorder(func: IRFunction):
+  blocks = func.block_map()
+  order, seen = [ ], { func.entry.label }
+  stack = [ (func.entry.label, iter(func.entry.succs)) ]
+  while stack:
+    label, succs = stack[-1]
+    for succ in succs:
+      if succ not in seen:
+        seen.add(succ)
+        stack.append((succ, iter(blocks[succ].succs)))
+        break
+    else:
+      stack.pop()
+      order.append(label)
+  return order[::-1]
+
+
+def dominators(func: IRFunction):
+  '''
+  Dominador inmediato de cada bloque alcanzable (Cooper, Harvey y
+  Kennedy, "A Simple, Fast Dominance Algorithm")
+  '''
+  blocks = func.block_map()
+  order = reverse_postorder(func)
+  index = { label: i for i, label in enumerate(order) }
+  entry = func.entry.label
+  idom = { entry: entry }
+
+  def intersect(a, b):
+    while a != b:
+      while index[a] > index[b]:
+        a = idom[a]
+      while index[b] > index[a]:
+        b = idom[b]
+    return a
+
+  changed = True
+  while changed:
+    changed = False
+    for label in order[1:]:
+      preds = [ p for p in blocks[label].preds if p in idom ]
+      new = preds[0]
+      for pred in preds[1:]:
+        new = intersect(pred, new)
+      if idom.get(label) != new:
+        idom[label] = new
+        changed = True
+  return idom
+
+
+def dominates(idom, a, b):
+  while True:
+    if a == b:
+      return True
+    if idom[b] == b:
+      return False
+    b = idom[b]
+
+
+def dominance_frontiers(func: IRFunction, idom):
+  frontier = defaultdict(set)
+  for block in func.blocks:
+    if len(block.preds) < 2:
+      continue
+    for pred in block.preds:
+      runner = pred
+      while runner != idom[block.label]:
+        frontier[runner].add(block.label)
+        runner = idom[runner]
+  return frontier
+
+
+def liveness(func: IRFunction):
+  '''
+  Variables locales vivas a la entrada de cada bloque (antes de SSA)
+  '''
+  blocks = func.block_map()
+  uses, defs = { }, { }
+  for block in func.blocks:
+    used, defined = set(), set()
+    for instr in block.instrs:
+      for arg in instr.args:
+        if isinstance(arg, Var) and arg.name in func.variables and arg.name not in defined:
+          used.add(arg.name)
+      for dest in instr.dests:
+        defined.add(dest.name)
+    uses[block.label], defs[block.label] = used, defined
+
+  live_in = { label: set(used) for label, used in uses.items() }
+  changed = True
+  while changed:
+    changed = False
+    for block in reversed(func.blocks):
+      live_out = set()
+      for succ in block.succs:
+        live_out |= live_in[succ]
+      new = uses[block.label] | (live_out - defs[block.label])
+      if new != live_in[block.label]:
+        live_in[block.label] = new
+        changed = True
+  return live_in
+
+
+# =====================================================================
+# Conversion a SSA
+# =====================================================================
+
+class SSABuilder:
+  '''
+  Conversion a SSA podada (Cytron et al.): un phi solo se coloca en la
+  frontera de dominancia de una definicion si la variable esta viva a
+  la entrada del bloque.
+  '''
+  def __init__(self, func: IRFunction):
+    self.func     = func
+    self.idom     = dominators(func)
+    self.counters = defaultdict(int)
+    self.stacks   = defaultdict(list)
+
+  def run(self):
+    self.insert_phis()
+    self.rename()
+    self.func.ssa = True
+
+  def insert_phis(self):
+    func = self.func
+    blocks = func.block_map()
+    live_in = liveness(func)
+    defsites = defaultdict(set)
+    for block in func.blocks:
+      for instr in block.instrs:
+        for dest in instr.dests:
+          if dest.name in func.variables:
+            defsites[dest.name].add(block.label)
+    for _, var in func.params:
+      defsites[var.name].add(func.entry.label)
+
+    frontier = dominance_frontiers(func, self.idom)
+    for name in sorted(defsites):
+      work = list(defsites[name])
+      placed = set()
+      while work:
+        label = work.pop()
+        for df in frontier[label]:
+          if df in placed or name not in live_in[df]:
+            continue
+          placed.add(df)
+          block = blocks[df]
+          block.phis.append(Instr('phi', [ Var(name) ], [ Var(name) ] * len(block.preds),
+                                  targets=list(block.preds)))
+          if df not in defsites[name]:
+            defsites[name].add(df)
+            work.append(df)
+
+  def new_name(self, name):
+    version = self.counters[name]
+    self.counters[name] += 1
+    var = Var(f'{name}.{version}')
+    self.stacks[name].append(var)
+    return var
+
+  def current(self, arg):
+    if isinstance(arg, Var) and arg.name in self.func.variables:
+      stack = self.stacks[arg.name]
+      return stack[-1] if stack else UNDEF
+    return arg
+
+  def rename(self):
+    func = self.func
+    blocks = func.block_map()
+    children = defaultdict(list)
+    for label, parent in self.idom.items():
+      if label != parent:
+        children[parent].append(label)
+
+    func.params = [ (t, self.new_name(v.name)) for t, v in func.params ]
+
+    # Recorrido del arbol de dominadores con pila explicita: al salir de
+    # un bloque se descartan las versiones que definio
+    stack = [ (func.entry.label, False) ]
+    pushed = { }
+    while stack:
+      label, leaving = stack.pop()
+      block = blocks[label]
+      if leaving:
+        for name in pushed.pop(label):
+          self.stacks[name].pop()
+        continue
+
+      defined = [ ]
+      for phi in block.phis:
+        name = phi.dests[0].name
+        phi.dests = [ self.new_name(name) ]
+        defined.append(name)
+      for instr in block.instrs:
+        instr.args = [ self.current(a) for a in instr.args ]
+        dests = [ ]
+        for dest in instr.dests:
+          if dest.name in func.variables:
+            dests.append(self.new_name(dest.name))
+            defined.append(dest.name)
+          else:
+            dests.append(dest)
+        instr.dests = dests
+      for succ in block.succs:
+        for phi in blocks[succ].phis:
+          for i, pred in enumerate(phi.targets):
+            if pred == label:
+              phi.args[i] = self.current(phi.args[i])
+      pushed[label] = defined
+
+      stack.append((label, True))
+      for child in reversed(children[label]):
+        stack.append((child, False))
+
+
+# =====================================================================
+# Validacion
+# =====================================================================
+
+def verify(func: IRFunction):
+  '''
+  Verifica la forma del CFG (y de SSA si ya se construyo). Devuelve la
+  lista de errores encontrados.
+  '''
+  errors = [ ]
+  def error(block, message):
+    errors.append(f"@{func.name}, {block}: {message}")
+
+  if not func.blocks:
+    return [ f'@{func.name}: la funcion no tiene bloques' ]
+
+  blocks = func.block_map()
+  if len(blocks) != len(func.blocks):
+    error('-', 'etiquetas de bloque repetidas')
+
+  preds = defaultdict(list)
+  for block in func.blocks:
+    if block.terminator is None:
+      error(block.label, 'el bloque no termina con jmp, br o ret')
+    for instr in block.instrs[:-1]:
+      if instr.is_terminator:
+        error(block.label, f"terminador '{instr}' en medio del bloque")
+    for instr in block.instrs:
+      if instr.op == 'phi':
+        error(block.label, 'phi despues de instrucciones ordinarias')
+    for succ in block.succs:
+      if succ not in blocks:
+        error(block.label, f"salto a un bloque inexistente '{succ}'")
+      elif block.label not in preds[succ]:
+        preds[succ].append(block.label)
+
+  for block in func.blocks:
+    if sorted(block.preds) != sorted(preds[block.label]):
+      error(block.label, f'predecesores {block.preds} no coinciden con el CFG {preds[block.label]}')
+    if block is func.entry and block.preds:
+      error(block.label, 'el bloque de entrada tiene predecesores')
+    for phi in block.phis:
+      if sorted(phi.targets) != sorted(block.preds) or len(phi.args) != len(phi.targets):
+        error(block.label, f"'{phi}' no tiene un operando por predecesor")
+
+  if errors or not func.ssa:
+    return errors
+
+  # Propiedades de SSA: una sola definicion por nombre y toda definicion
+  # domina sus usos
+  idom = dominators(func)
+  defs = { v.name: (func.entry.label, -1) for _, v in func.params }
+  for block in func.blocks:
+    for i, instr in enumerate(block.phis + block.instrs):
+      for dest in instr.dests:
+        if dest.name in defs:
+          error(block.label, f"'{dest}' se define mas de una vez")
+        defs[dest.name] = (block.label, i)
+
+  def check_use(block, position, arg, instr):
+    if not isinstance(arg, Var):
+      return
+    if arg.name not in defs:
+      error(block, f"'{arg}' se usa sin definirse en '{instr}'")
+      return
+    label, index = defs[arg.name]
+    if label == block and index >= position:
+      error(block, f"'{arg}' se usa antes de su definicion en '{instr}'")
+    elif label in idom and block in idom and not dominates(idom, label, block):
+      error(block, f"la definicion de '{arg}' no domina su uso en '{instr}'")
+
+  for block in func.blocks:
+    for phi in block.phis:
+      for pred, arg in zip(phi.targets, phi.args):
+        check_use(pred, len(blocks[pred].phis) + len(blocks[pred].instrs), arg, phi)
+    for i, instr in enumerate(block.instrs):
+      for arg in instr.args:
+        check_use(block.label, len(block.phis) + i, arg, instr)
+  return errors
+
+
+def print_ir(module: IRModule):
+  Console().print(str(module), markup=False, highlight=False, soft_wrap=True, end='')
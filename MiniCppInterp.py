@@ -3,11 +3,11 @@ Tree-walking interpreter
 '''
 from collections import ChainMap
 from rich        import print
+from rich.table  import Table
 
 from MiniCppAST       import *
-from MiniCppChecker   import Checker
-from MiniCppBuiltins  import builtins, consts, CallError
-from MiniCpptypes     import CObject, Number, String, Bool, Nil, Array
+from MiniCppBuiltins  import builtins, consts, patterns, stdin, CallError
+from MiniCpptypes     import CObject, Number, String, Bool, Nil, Array, Matrix, Container, StrBuf, StrView, File, LRUCache, new_array, new_container, boxed_itemsize
 
 
 # Veracidad en MiniC
@@ -19,10 +19,26 @@ def _is_truthy(value):
   else:
     return True
 
+# Nombre MiniC del tipo de un valor, para los mensajes de error
+def _typename(value):
+  if isinstance(value, Matrix):
+    return 'matrix'
+  if isinstance(value, Container):
+    return value._type
+  if isinstance(value, File):
+    return 'file'
+  if isinstance(value, Array):
+    return f'{value._type}[]'
+  return {bool: 'bool', int: 'int', float: 'float', str: 'str'}.get(type(value), type(value).__name__)
+
 class ReturnException(Exception):
   def __init__(self, value):
     self.value = value
 
+class TailCallException(Exception):
+  def __init__(self, values):
+    self.values = values
+
 class BreakException(Exception):
   pass
 
@@ -32,6 +48,9 @@ class ContinueException(Exception):
 class MiniCExit(BaseException):
   pass
 
+class BudgetExceeded(Exception):
+  pass
+
 class AttributeError(Exception):
   pass
 
@@ -41,6 +60,8 @@ class Function:
   def __init__(self, node, env):
     self.node = node
     self.env = env
+    # LRUCache de resultados si la funcion es pura y se pidio memoizar
+    self.memo = None
 
   @property
   def arity(self) -> int:
@@ -49,21 +70,53 @@ class Function:
     return len(self.node.params)
 
   def __call__(self, interp, *args):
-    newenv = self.env.new_child()
-    for name, arg in zip(self.node.params, args):
-      if isinstance(name, VarDeclStmt):
-        newenv[name.ident] = arg
-
+    if self.memo is not None:
+      key = self.memo_key(args)
+      result = self.memo.get(key)
+      if result is LRUCache._missing:
+        result = self._call(interp, args)
+        self.memo.put(key, result)
+      return result
+    return self._call(interp, args)
+
+  @staticmethod
+  def memo_key(args):
+    # 3 == 3.0 y True == 1 con el mismo hash: sin el tipo compartirian
+    # la entrada del cache
+    return tuple((type(arg), arg) for arg in args)
+
+  def _call(self, interp, args):
     oldenv = interp.env
-    interp.env = newenv
     try:
-      self.node.stmts.accept(interp)
-      result = None
-    except ReturnException as e:
-      result = e.value
+      # Las llamadas de cola marcadas (ver MiniCppTailCall) vuelven a
+      # este ciclo con los nuevos argumentos en vez de anidar el marco
+      while True:
+        if interp.budget is not None:
+          interp.tick()
+        interp.env = self.bind_args(self.env.new_child(), args)
+        try:
+          self.node.stmts.accept(interp)
+          result = None
+        except TailCallException as e:
+          args = e.values
+          continue
+        except ReturnException as e:
+          result = e.value
+        return result
     finally:
       interp.env = oldenv
-    return result
+
+  def bind_args(self, env, args):
+    '''
+    Asocia los argumentos a los parametros en env. Los arreglos (y las
+    vistas de slice) se pasan por referencia, sin copiar
+    '''
+    for param, arg in zip(self.node.params, args):
+      if isinstance(param, ArrayDeclStmt) and \
+         (not isinstance(arg, Array) or arg._type != param._type):
+        raise CallError(f"El argumento '{param.ident}' de '{self.node.ident}' debe ser un arreglo de {param._type}")
+      env[param.ident] = arg
+    return env
 
   def bind(self, instance):
     env = self.env.new_child()
@@ -123,17 +176,61 @@ class Interpreter(Visitor):
   def __init__(self, ctxt):
     self.ctxt      = ctxt
     self.env       = ChainMap()
-    self.check_env = ChainMap()
     self.localmap  = { }
+    # Presupuesto (bytes) del evaluador con pila explicita. None
+    # ejecuta con el interprete de arbol recursivo
+    self.stack_budget = None
+    # Tamano del cache LRU por funcion pura. None desactiva la memoizacion
+    self.memo_size = None
+    # Pasos restantes (iteraciones y llamadas) antes de abortar con
+    # BudgetExceeded. None no limita la ejecucion
+    self.budget = None
+    # Revisa los limites de todos los accesos a arreglos, aunque el
+    # pase 'bounds' los haya marcado como seguros
+    self.checked = False
+    # Reporte de memoria de los arreglos al terminar
+    self.mem_report = False
+    # Reporte del cache de expresiones regulares al terminar
+    self.re_report = False
     
   def _check_numeric_operands(self, node, left, right):
     if isinstance(left, (int, float)) and isinstance(right, (int, float)):
       return True
+    elif isinstance(left, Matrix) or isinstance(right, Matrix):
+      return self._check_matrix_operands(node, left, right)
+    elif node.opr == '+' and isinstance(left, (str, StrView)) and isinstance(right, (str, StrView)):
+      # Concatenar una vista la convierte a str
+      return True
     else:
       self.error(node, f"En '{node.opr}' los operandos deben ser numeros")
-      
+
+  def _check_matrix_operands(self, node, left, right):
+    # matriz (+ - * /) matriz de la misma forma, matriz (* /) escalar
+    # y escalar * matriz
+    scalar = (int, float)
+    if isinstance(left, Matrix) and isinstance(right, Matrix):
+      if node.opr in ('+', '-', '*', '/'):
+        if left.data.shape != right.data.shape:
+          self.error(node, f"En '{node.opr}' las matrices deben tener la misma forma ({left.shape} y {right.shape})")
+        if node.opr == '/' and not right.data.all():
+          self.error(node, "Division por cero en '/' entre matrices")
+        return True
+    elif (node.opr in ('*', '/') and isinstance(right, scalar)) or \
+         (node.opr == '*' and isinstance(left, scalar)):
+      if node.opr == '/' and right == 0:
+        self.error(node, "Division por cero en '/' de una matriz")
+      return True
+    self.error(node, f"Operacion '{node.opr}' no soportada entre {_typename(left)} y {_typename(right)}")
+
+  def _check_equality_operands(self, node, left, right):
+    # Arreglos, matrices, contenedores y archivos no se comparan: el
+    # __eq__ de dataclass de CObject haria iguales a dos cualesquiera
+    for value in (left, right):
+      if isinstance(value, CObject) and not isinstance(value, StrView):
+        self.error(node, f"Operacion '{node.opr}' no soportada entre {_typename(left)} y {_typename(right)}")
+
   def _check_numeric_operand(self, node, value):
-    if isinstance(value, (int, float)):
+    if isinstance(value, (int, float, Matrix)):
       return True
     else:
       self.error(node, f"En '{node.opr}' el operando debe ser un numero")
@@ -142,33 +239,95 @@ class Interpreter(Visitor):
     self.ctxt.error(position, message)
     raise MiniCExit()
 
+  def tick(self):
+    self.budget -= 1
+    if self.budget < 0:
+      raise BudgetExceeded()
+
   # Punto de entrada alto-nivel
   
   def interpret(self, node):
 
     for name, cval in consts.items():
-      self.check_env[name] = cval
       self.env[name] = cval
 
     for name, func in builtins.items():
-      self.check_env[name] = func
       self.env[name] = func
 
+    # El Context ya reviso el programa con el Checker antes de los pases
     try:
-      Checker.check(node, self.check_env)
-      if not self.ctxt.have_errors:
-        node.accept(self)
+      node.accept(self)
     except ReturnException as e:
       print("\nReturn: ", e.value)
     except MiniCExit as e:
       pass
     
+    if self.memo_size:
+      self._enable_memo()
+
     main = self.env.get('main')
     if main and isinstance(main, Function) and main.is_main():
-      main(self)
+      try:
+        if self.stack_budget:
+          from MiniCppStackEval import StackEvaluator
+          StackEvaluator(self, self.stack_budget).call(main)
+        else:
+          main(self)
+      except MiniCExit:
+        # Error en tiempo de ejecucion, ya reportado
+        pass
+      finally:
+        if self.memo_size:
+          self.print_memo_stats()
+        # Los arreglos mapeados con escritura se bajan a sus archivos
+        Array.flush_mapped()
+        # y los archivos abiertos se cierran, bajando lo que quede en sus buffers
+        File.close_all()
+        if self.mem_report:
+          self.print_array_memory()
+        if self.re_report:
+          self.print_re_stats()
     else:
       raise MiniCExit()
 
+  def _enable_memo(self):
+    for value in self.env.maps[-1].values():
+      if isinstance(value, Function) and getattr(value.node, 'pure', False):
+        if value.node._type != 'void' and value.arity > 0:
+          value.memo = LRUCache(self.memo_size)
+
+  def print_memo_stats(self):
+    funcs = [ value for value in self.env.maps[-1].values()
+              if isinstance(value, Function) and value.memo is not None ]
+    print("\nMemoizacion de funciones puras:")
+    if not funcs:
+      print("  (ninguna funcion pura memoizada)")
+    for func in funcs:
+      memo = func.memo
+      print(f"  {func.node.ident}: {memo.hits} aciertos, {memo.misses} fallos, "
+            f"{len(memo)}/{memo.maxsize} entradas ({memo.hit_rate:.1%})")
+
+  def print_re_stats(self):
+    print("\nCache de expresiones regulares:")
+    print(f"  {patterns.hits} aciertos, {patterns.misses} fallos, "
+          f"{len(patterns)}/{patterns.maxsize} patrones ({patterns.hit_rate:.1%})")
+
+  def print_array_memory(self):
+    table = Table(title='[bold blue] Memoria de arreglos [/bold blue]')
+    table.add_column('Tipo')
+    table.add_column('Arreglos', justify='right')
+    table.add_column('Elementos', justify='right')
+    table.add_column('Bytes', justify='right')
+    table.add_column('Bytes/elem', justify='right')
+    table.add_column('Lista de CObject', justify='right')
+    for _type, (arrays, elements, nbytes) in sorted(Array.allocations.items()):
+      table.add_row(_type, str(arrays), str(elements), str(nbytes),
+                    f'{nbytes / elements:.1f}' if elements else '-',
+                    str(boxed_itemsize(_type)))
+    if not Array.allocations:
+      table.add_row('(ninguno)', '', '', '', '', '')
+    print(table)
+
   # Declarations
   
   def visit(self, node: Program):
@@ -195,14 +354,20 @@ class Interpreter(Visitor):
     self.env[node.ident] = func
 
   def visit(self, node: VarDeclStmt):
-    expr = node.expr.accept(self) if node.expr else None
+    # Los contenedores (dict<K,V>...) se crean vacios al declararlos
+    expr = node.expr.accept(self) if node.expr else new_container(node._type)
+    self._declare(node, expr)
 
+  def _declare(self, node, expr):
     if id(node) not in self.localmap:
         # Registrar la variable en el entorno global
         self.localmap[id(node)] = len(self.env.maps) - 2
 
     self.env.maps[self.localmap[id(node)]][node.ident] = expr
 
+  def visit(self, node: ArrayDeclStmt):
+    # El arreglo se crea al asignarle 'new T[n]'
+    self._declare(node, None)
 
   # Statements
   def visit(self, node: CompoundStmt):
@@ -215,13 +380,22 @@ class Interpreter(Visitor):
       
   
   def visit(self, node: PrintfStmt):
+    self._printf(node, [ arg.accept(self) for arg in node.args ])
+
+  def _printf(self, node, args):
+    expr = self._format(node.string, args)
+    if expr is not None:
+      print(expr, end='')
+
+  def _format(self, string, args):
+    '''
+    Cadena de printf/sprintf con los argumentos sustituidos en orden.
+    None si algun argumento no se puede escribir
+    '''
     error = False
-    expr = node.string
-    for arg in node.args:
-      arg = arg.accept(self)
-      if arg is None:
-        error = True
-      if arg == int(arg):
+    expr = string
+    for arg in args:
+      if isinstance(arg, bool) or (isinstance(arg, float) and arg.is_integer()):
         arg = int(arg)
       if isinstance(arg, int):
         expr = expr.replace('%d', str(arg), 1)
@@ -229,24 +403,81 @@ class Interpreter(Visitor):
         expr = expr.replace('%s', arg, 1)
       elif isinstance(arg, float):
         expr = expr.replace('%f', str(arg), 1)
+      elif isinstance(arg, CObject):
+        # Matrices y contenedores (un strbuf escribe su texto)
+        expr = expr.replace('%s', str(arg), 1)
       else:
         error = True
-      
+
     if isinstance(expr, str):
       expr = expr.replace('\\n', '\n')
       expr = expr.replace('\\t', '\t')
-    if not error:
-      print(expr, end='')
+    return None if error else expr
+
+  def visit(self, node: SprintfStmt):
+    self._sprintf(node, [ arg.accept(self) for arg in node.args ])
+
+  def _sprintf(self, node, args):
+    text = self._format(node.string, args)
+    if text is None:
+      self.error(node, f"Argumentos de sprintf incompatibles con el formato {node.string!r}")
+    for scope in self.env.maps:
+      if node.ident in scope:
+        target = scope[node.ident]
+        # Sobre un strbuf agrega el texto; sobre un str lo reemplaza
+        if isinstance(target, StrBuf):
+          target.append(text)
+        else:
+          scope[node.ident] = text
+        return
+    self.error(node, f"Variable '{node.ident}' no definida")
+
+  def visit(self, node: ScanfStmt):
+    self._scanf(node, [ arg.expr.accept(self) if isinstance(arg, ArrayLoockupExpr) else None
+                        for arg in node.args ])
+
+  def _scanf(self, node, ndxs):
+    # ndxs trae evaluados los indices de los destinos a[i]
+    try:
+      values = stdin.scanf(node.string)
+    except ValueError as err:
+      self.error(node, f"scanf: {err}")
+    # Al final de la entrada los destinos que no recibieron valor no cambian
+    for arg, ndx, value in zip(node.args, ndxs, values):
+      if isinstance(arg, VarExpr):
+        for scope in self.env.maps:
+          if arg.ident in scope:
+            scope[arg.ident] = value
+            break
+        else:
+          self.error(node, f"Variable '{arg.ident}' no definida")
+      elif isinstance(arg, ArrayLoockupExpr):
+        array = self._array(arg, arg.ident)
+        try:
+          array[ndx] = value
+        except (IndexError, TypeError):
+          self._index_error(node, array, ndx)
+        except (ValueError, OverflowError):
+          self.error(node, f"Valor {value!r} incompatible con un arreglo de {array._type}")
+      else:
+        self.error(node, "scanf solo puede leer variables y elementos de arreglos")
 
   
   def visit(self, node: WhileStmt):
     self.env['incycle'] = True
+    env = self.env
     while _is_truthy(node.expr.accept(self)):
+      if self.budget is not None:
+        self.tick()
       try:
         node.stmt.accept(self)
       except BreakException:
+        # Los bloques del cuerpo no restauran su entorno al salir por
+        # una excepcion
+        self.env = env
         return
       except ContinueException:
+        self.env = env
         continue
     self.env['incycle'] = False
 
@@ -270,6 +501,10 @@ class Interpreter(Visitor):
 
   
   def visit(self, node: ReturnStmt):
+    call = getattr(node, 'tailcall', None)
+    if call is not None:
+      raise TailCallException([ arg.accept(self) for arg in call.args ])
+
     # Ojo: node.expr es opcional
     value = 0 if not node.expr else node.expr.accept(self)
     raise ReturnException(value)
@@ -286,16 +521,73 @@ class Interpreter(Visitor):
   def visit(self, node: ForStmt):
     self.env['incycle'] = True
     node.init.accept(self)
+    loop = getattr(node, 'counted', None)
+    if loop is not None and self._range_for(node, loop):
+      return
+    env = self.env
     while _is_truthy(node.cond.accept(self)):
+      if self.budget is not None:
+        self.tick()
       try:
         node.stmt.accept(self)
       except BreakException:
+        self.env = env
         return
       except ContinueException:
+        self.env = env
         node.iter.accept(self)
         continue
       node.iter.accept(self)
     self.env['incycle'] = False
+
+  def _range_for(self, node, loop):
+    '''
+    Ciclo contado (ver MiniCppLoops.RangeLoopMarker): la variable de
+    induccion se recorre con un range y se escribe directo en su entorno.
+    Los ciclos vectorizables (MiniCppVector) se intentan primero como
+    una expresion de NumPy. Devuelve False sin ejecutar nada si los
+    valores no son enteros.
+    '''
+    var = loop.var
+    for slot in self.env.maps:
+      if var in slot:
+        break
+    else:
+      return False
+    start = slot[var]
+    bound = node.cond.right.accept(self)
+    if type(start) is not int or type(bound) is not int:
+      return False
+
+    step = loop.step
+    if loop.opr == '<=':
+      bound += 1
+    elif loop.opr == '>=':
+      bound -= 1
+    values = range(start, bound, step)
+    vector = getattr(node, 'vector', None)
+    if vector is not None and self.budget is None and vector.run(self, values):
+      slot[var] = values[-1] + step if values else start
+      self.env['incycle'] = False
+      return True
+
+    body = node.stmt
+    env = self.env
+    for value in values:
+      slot[var] = value
+      if self.budget is not None:
+        self.tick()
+      try:
+        body.accept(self)
+      except BreakException:
+        self.env = env
+        return True
+      except ContinueException:
+        self.env = env
+    # Valor con el que falla la condicion, como en el ciclo original
+    slot[var] = values[-1] + step if values else start
+    self.env['incycle'] = False
+    return True
     
   # Expressions
   
@@ -306,6 +598,9 @@ class Interpreter(Visitor):
   def visit(self, node: BinaryOpExpr):
     left  = node.left.accept(self)
     right = node.right.accept(self)
+    return self._binary_op(node, left, right)
+
+  def _binary_op(self, node, left, right):
     if node.opr == '+':
       (isinstance(left, str) and isinstance(right, str)) or self._check_numeric_operands(node, left, right)
       return left + right
@@ -330,9 +625,11 @@ class Interpreter(Visitor):
       return left % right
 
     elif node.opr == '==':
+      self._check_equality_operands(node, left, right)
       return left == right
 
     elif node.opr == '!=':
+      self._check_equality_operands(node, left, right)
       return left != right
 
     elif node.opr == '<':
@@ -357,15 +654,17 @@ class Interpreter(Visitor):
   
   def visit(self, node: LogicalOpExpr):
     left = node.left.accept(self)
-    if node.op == '||':
+    if node.opr == '||':
       return left if _is_truthy(left) else node.right.accept(self)
-    if node.op == '&&':
+    if node.opr == '&&':
       return node.right.accept(self) if _is_truthy(left) else left
-    raise NotImplementedError(f"Mal operador {node.op}")
+    raise NotImplementedError(f"Mal operador {node.opr}")
 
   
   def visit(self, node: UnaryOpExpr):
-    expr = node.expr.accept(self)
+    return self._unary_op(node, node.expr.accept(self))
+
+  def _unary_op(self, node, expr):
     if node.opr == "-":
       self._check_numeric_operand(node, expr)
       return - expr
@@ -380,7 +679,9 @@ class Interpreter(Visitor):
 
   
   def visit(self, node: VarAssignmentExpr):
-    expr = node.expr.accept(self)
+    self._assign(node, node.expr.accept(self))
+
+  def _assign(self, node, expr):
     variable_name = node.var
 
     # Buscar la variable en los entornos existentes
@@ -394,7 +695,9 @@ class Interpreter(Visitor):
     
   
   def visit(self, node: OperatorAssign):
-    expr = node.expr1.accept(self)
+    return self._operator_assign(node, node.expr1.accept(self))
+
+  def _operator_assign(self, node, expr):
     if node.op == '+=':
       if id(node) not in self.localmap:
         self.localmap[id(node)] = len(self.env.maps) - 2
@@ -453,7 +756,9 @@ class Interpreter(Visitor):
       self.error(node.ident, f'{self.ctxt.find_source(node.ident)!r} no es invocable')
 
     args = [ arg.accept(self) for arg in node.args ]
+    return self._call(node, callee, args)
 
+  def _call(self, node, callee, args):
     if callee.arity != -1 and len(args) != callee.arity:
       self.error(node.ident, f"Experado {callee.arity} argumentos")
       
@@ -462,7 +767,80 @@ class Interpreter(Visitor):
     except CallError as err:
       self.error(node.ident, str(err))
 
-  
+
+  def visit(self, node: NewArrayExpr):
+    return self._new_array(node, node.expr.accept(self))
+
+  def _new_array(self, node, size):
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+      self.error(node, f"El tamano del arreglo debe ser un entero no negativo")
+    return new_array(node._type, size)
+
+  def visit(self, node: ArrayLoockupExpr):
+    array = self._array(node, node.ident)
+    return self._array_load(node, array, node.expr.accept(self))
+
+  def _array_load(self, node, array, ndx):
+    if node.safe and not self.checked:
+      # Indice en rango (ver MiniCppBounds)
+      return array._load(ndx)
+    try:
+      return array[ndx]
+    except (IndexError, TypeError):
+      self._index_error(node, array, ndx)
+
+  def visit(self, node: ArrayAssignmentExpr):
+    array = self._array(node, node.ident)
+    ndx = node.ndx.accept(self)
+    expr = node.expr.accept(self)
+    return self._array_store(node, array, ndx, expr)
+
+  def _array_store(self, node, array, ndx, expr):
+    try:
+      if node.safe and not self.checked and expr.__class__ is not str and expr.__class__ is not StrView:
+        array.data[ndx] = expr
+      else:
+        array[ndx] = expr
+    except (IndexError, TypeError):
+      if not array.writable:
+        self.error(node, f"El arreglo '{node.ident}' es de solo lectura")
+      self._index_error(node, array, ndx)
+    except (ValueError, OverflowError):
+      if not array.writable:
+        self.error(node, f"El arreglo '{node.ident}' es de solo lectura")
+      self.error(node, f"Valor {expr!r} incompatible con un arreglo de {array._type}")
+    return expr
+
+  def visit(self, node: ArraySizeExpr):
+    return len(self._array(node, node.ident))
+
+  def visit(self, node: SizeOfExpr):
+    if id(node) not in self.localmap:
+      self.localmap[id(node)] = len(self.env.maps) - 2
+    for env in self.env.maps[self.localmap[id(node)]:]:
+      if node.ident in env:
+        value = env[node.ident]
+        if isinstance(value, (Array, str, Container, StrView)):
+          return len(value)
+        break
+    self.error(node, f"size() requiere un arreglo, una cadena o un contenedor")
+
+  def _array(self, node, ident):
+    if id(node) not in self.localmap:
+      self.localmap[id(node)] = len(self.env.maps) - 2
+    for env in self.env.maps[self.localmap[id(node)]:]:
+      if ident in env:
+        array = env[ident]
+        break
+    else:
+      array = None
+    if not isinstance(array, Array):
+      self.error(node, f"Arreglo '{ident}' no inicializado")
+    return array
+
+  def _index_error(self, node, array, ndx):
+    self.error(node, f"Indice {ndx} fuera de los limites del arreglo (tamano {len(array)})")
+
   def visit(self, node: VarExpr):
     if id(node) not in self.localmap:
         self.localmap[id(node)] = len(self.env.maps) - 2
@@ -13,7 +13,7 @@ class Lexer(sly.Lexer):
         # palabras reservadas
         'VOID', 'BOOL', 'INT', 'FLOAT', 'IF', 'ELSE', 'WHILE', 'RETURN', 'SPRINTF', 'INTTOFLOAT', 'CAST',
         'BREAK', 'CONTINUE', 'SIZE', 'NEW', 'CLASS', 'FOR', 'PRINTF', 'SCANF', 'SUPER', 'THIS', 'POINT',
-        'ARRAYSIZE', 'AMPERSAND', 'STR',
+        'ARRAYSIZE', 'AMPERSAND', 'STR', 'MATRIX', 'DICT', 'HEAP', 'DEQUE', 'STRBUF', 'FILE',
 
         # Operadores de Relacion
         'AND', 'OR', 'EQ', 'NE', 'GE', 'LE',
@@ -94,6 +94,12 @@ class Lexer(sly.Lexer):
     IDENT['super']    = 'SUPER'
     IDENT['ArraySize'] = 'ARRAYSIZE'
     IDENT['str'] = 'STR'
+    IDENT['matrix'] = 'MATRIX'
+    IDENT['dict'] = 'DICT'
+    IDENT['heap'] = 'HEAP'
+    IDENT['deque'] = 'DEQUE'
+    IDENT['strbuf'] = 'STRBUF'
+    IDENT['file'] = 'FILE'
 
     @_(r'((0(?!\d))|([1-9]\d*))((\.\d+(e[-+]?\d+)?)|([eE][-+]?\d+))')
     def FLOAT_LIT(self, t):
@@ -0,0 +1,374 @@
+# mcloops.py
+'''
+Ciclos contados
+===============
+Un ciclo 'for' es contado cuando tiene la forma
+
+    for (int i = a; i < N; i++) { ... }
+
+con una variable de induccion entera que solo modifica la clausula
+'iter' (i++, i--, i += k, i = i + k...), un limite N invariante en el
+cuerpo (constantes, variables y ArraySize(a)/size(a) combinados con + - *) y
+una comparacion (<, <=, >, >=) en el mismo sentido que el paso. El
+cuerpo tampoco puede tener 'break' ni 'continue' propios.
+
+Para estos ciclos el numero de iteraciones no depende del cuerpo, lo
+que permite desenrollarlos (LoopUnroller): el cuerpo se copia 'factor'
+veces por vuelta y un ciclo residual completa las iteraciones que
+faltan. Si el numero de iteraciones es una constante pequena, el ciclo
+se reemplaza por las copias del cuerpo.
+
+Los ciclos contados que quedan (incluidos los que tienen 'break' o
+'continue') se marcan con el atributo 'counted' (RangeLoopMarker) y el
+Interpreter los ejecuta con un 'range' de Python en lugar de evaluar
+'cond' e 'iter' en cada vuelta.
+'''
+import copy
+
+from MiniCppAST      import *
+from MiniCppBuiltins import builtins
+
+
+class CountedLoop:
+  '''
+  Descripcion de un ciclo for contado
+  '''
+  def __init__(self, node, var, start, bound, opr, step):
+    self.node  = node       # ForStmt original
+    self.var   = var        # nombre de la variable de induccion
+    self.start = start      # expresion inicial
+    self.bound = bound      # limite invariante
+    self.opr   = opr        # <, <=, > o >=
+    self.step  = step       # paso constante, distinto de 0
+
+  @property
+  def trip_count(self):
+    '''
+    Numero de iteraciones si el inicio y el limite son constantes
+    '''
+    if not (_int_const(self.start) and _int_const(self.bound)):
+      return None
+    start, bound, step = self.start.value, self.bound.value, self.step
+    if step < 0:
+      start, bound, step = -start, -bound, -step
+    span = bound - start + (1 if self.opr in ('<=', '>=') else 0)
+    return max(0, -(-span // step))
+
+
+def _int_const(node):
+  return isinstance(node, ConstExpr) and type(node.value) is int
+
+
+def _var(node, ident):
+  return isinstance(node, VarExpr) and node.ident == ident
+
+
+def assigned_names(node):
+  '''
+  Nombres de variables escritas (o redeclaradas) dentro de node
+  '''
+  names = set()
+  for n in walk(node):
+    if isinstance(n, VarAssignmentExpr):
+      names.add(n.var)
+    elif isinstance(n, VarDeclStmt):
+      names.add(n.ident)
+    elif isinstance(n, OperatorAssign) and isinstance(n.expr0, VarExpr):
+      names.add(n.expr0.ident)
+    elif isinstance(n, (PreInc, PreDec, PostInc, PostDec)) and isinstance(n.expr, VarExpr):
+      names.add(n.expr.ident)
+    elif isinstance(n, ScanfStmt):
+      names.update(a.ident for a in n.args if isinstance(a, VarExpr))
+    elif isinstance(n, SprintfStmt):
+      names.add(n.ident)
+  return names
+
+
+def calls_user_functions(node):
+  return any(isinstance(n, CallExpr) and n.ident not in builtins for n in walk(node))
+
+
+def loop_exits(node):
+  '''
+  True si node tiene 'break' o 'continue' del ciclo que lo contiene
+  (no de ciclos anidados)
+  '''
+  stack = list(children(node))
+  while stack:
+    n = stack.pop()
+    if isinstance(n, (BreakStmt, ContinueStmt)):
+      return True
+    if not isinstance(n, (WhileStmt, ForStmt)):
+      stack.extend(children(n))
+  return False
+
+
+def declared_types(func: FuncDeclStmt, program: Program = None):
+  '''
+  Tipo de cada nombre visible en func. Un nombre declarado con tipos
+  distintos (variables que se ocultan) queda como None.
+  '''
+  types = { }
+  if program is not None:
+    for decl in program.decls:
+      if isinstance(decl, VarDeclStmt):
+        types[decl.ident] = decl._type
+  local = { }
+  for n in [ *(func.params or []), *walk(func.stmts) ]:
+    if isinstance(n, (VarDeclStmt, ArrayDeclStmt)):
+      local[n.ident] = n._type if local.get(n.ident, n._type) == n._type else None
+  types.update(local)
+  return types, set(local)
+
+
+def _step(iter, var):
+  if isinstance(iter, (PostInc, PreInc)) and _var(iter.expr, var):
+    return 1
+  if isinstance(iter, (PostDec, PreDec)) and _var(iter.expr, var):
+    return -1
+  if isinstance(iter, OperatorAssign) and _var(iter.expr0, var) and _int_const(iter.expr1):
+    if iter.op == '+=':
+      return iter.expr1.value
+    if iter.op == '-=':
+      return -iter.expr1.value
+  if isinstance(iter, VarAssignmentExpr) and iter.var == var:
+    expr = iter.expr
+    if isinstance(expr, BinaryOpExpr) and _var(expr.left, var) and _int_const(expr.right):
+      if expr.opr == '+':
+        return expr.right.value
+      if expr.opr == '-':
+        return -expr.right.value
+  return None
+
+
+def match_counted(node: ForStmt, types, locals, exits=False):
+  '''
+  Reconoce un ciclo contado. 'types' y 'locals' vienen de
+  declared_types() de la funcion que contiene el ciclo. Con exits=True
+  se aceptan cuerpos con 'break' y 'continue'.
+  '''
+  init = node.init
+  if isinstance(init, VarDeclStmt) and init.expr is not None:
+    var, start = init.ident, init.expr
+    if init._type != 'int':
+      return None
+  elif isinstance(init, VarAssignmentExpr):
+    var, start = init.var, init.expr
+    if types.get(var) != 'int':
+      return None
+  else:
+    return None
+
+  cond = node.cond
+  if not (isinstance(cond, BinaryOpExpr) and cond.opr in ('<', '<=', '>', '>=')
+          and _var(cond.left, var)):
+    return None
+
+  step = _step(node.iter, var)
+  if not step or (step > 0) != (cond.opr in ('<', '<=')):
+    return None
+
+  body = node.stmt
+  written = assigned_names(body)
+  user_calls = calls_user_functions(body)
+  if var in written or (not exits and loop_exits(body)):
+    return None
+  if var not in locals and user_calls:
+    return None
+
+  bound = cond.right
+  if not _invariant(bound, var, written, locals, user_calls):
+    return None
+
+  return CountedLoop(node, var, start, bound, cond.opr, step)
+
+
+def _invariant(expr, var, written, locals, user_calls):
+  '''
+  True si expr es un limite entero que el cuerpo del ciclo no modifica:
+  constantes, variables, ArraySize(a), size(a) y las operaciones + - * entre ellos
+  '''
+  if _int_const(expr):
+    return True
+  if isinstance(expr, (VarExpr, ArraySizeExpr, SizeOfExpr)):
+    if expr.ident == var or expr.ident in written:
+      return False
+    return expr.ident in locals or not user_calls
+  if isinstance(expr, Grouping):
+    return _invariant(expr.expr, var, written, locals, user_calls)
+  if isinstance(expr, BinaryOpExpr) and expr.opr in ('+', '-', '*'):
+    return _invariant(expr.left, var, written, locals, user_calls) and \
+           _invariant(expr.right, var, written, locals, user_calls)
+  return False
+
+
+class LoopUnroller(Visitor):
+  '''
+  Desenrolla los ciclos contados de cada funcion. Cada ciclo se
+  reemplaza por un bloque
+
+      {
+        int i = a;
+        while (i + (factor-1)*paso < N) { B; i += paso; B; i += paso; ... }
+        while (i < N) { B; i += paso; }
+      }
+
+  que deja en 'i' el mismo valor final que el ciclo original.
+  '''
+  # Tamano maximo (nodos) del codigo que genera un desenrollado completo
+  max_full_nodes = 1000
+
+  def __init__(self, factor=4, full=8, clone=copy.deepcopy):
+    self.factor = factor
+    self.full   = full
+    self.clone  = clone
+    self.types  = { }
+    self.locals = set()
+    self.func   = None
+    self.report = [ ]
+
+  @classmethod
+  def unroll(cls, program: Program, factor=4, full=8, clone=copy.deepcopy):
+    unroller = cls(factor, full, clone)
+    program.accept(unroller, program)
+    return unroller.report
+
+  def visit(self, n: Program, program: Program):
+    for decl in n.decls:
+      decl.accept(self, program)
+    return n
+
+  def visit(self, n: FuncDeclStmt, program: Program):
+    self.types, self.locals = declared_types(n, program)
+    self.func = n
+    n.stmts.accept(self, program)
+    return n
+
+  def visit(self, n: CompoundStmt, program: Program):
+    n.stmts = [ stmt.accept(self, program) for stmt in n.stmts ]
+    return n
+
+  def visit(self, n: IfStmt, program: Program):
+    n.then = n.then.accept(self, program)
+    if n.else_:
+      n.else_ = n.else_.accept(self, program)
+    return n
+
+  def visit(self, n: WhileStmt, program: Program):
+    n.stmt = n.stmt.accept(self, program)
+    return n
+
+  def visit(self, n: ForStmt, program: Program):
+    # Primero los ciclos internos
+    n.stmt = n.stmt.accept(self, program)
+    if getattr(n, 'vector', None) is not None:
+      # Se ejecuta vectorizado (MiniCppVector)
+      return n
+    loop = match_counted(n, self.types, self.locals)
+    if loop is None or not self._redeclarable(n.stmt):
+      return n
+
+    trip = loop.trip_count
+    if trip is not None and trip <= self.full and \
+       trip * sum(1 for _ in walk(n.stmt)) <= self.max_full_nodes:
+      self.report.append(f"'{self.func.ident}': ciclo en '{loop.var}' desenrollado por completo ({trip} iteraciones)")
+      return self._full(loop, trip)
+    if self.factor > 1 and (trip is None or trip >= self.factor):
+      self.report.append(f"'{self.func.ident}': ciclo en '{loop.var}' desenrollado x{self.factor}")
+      return self._partial(loop)
+    return n
+
+  def visit(self, n: Node, program: Program):
+    return n
+
+  # Generacion
+
+  def _redeclarable(self, body):
+    # Las declaraciones de las copias se vuelven asignaciones (el Checker
+    # no admite redeclarar un nombre en la misma funcion); solo se puede
+    # si todas tienen inicializador
+    return all(isinstance(d, VarDeclStmt) and d.expr is not None
+               for n in walk(body) if isinstance(n, CompoundStmt) for d in n.decls)
+
+  def _redeclare(self, body):
+    for n in walk(body):
+      if isinstance(n, CompoundStmt) and n.decls:
+        n.stmts = [ ExprStmt(VarAssignmentExpr(d.ident, d.expr)) for d in n.decls ] + n.stmts
+        n.decls = [ ]
+    return body
+
+  def _prologue(self, loop):
+    init = self.clone(loop.node.init)
+    if isinstance(init, VarDeclStmt):
+      return CompoundStmt([ init ], [ ])
+    return CompoundStmt([ ], [ ExprStmt(init) ])
+
+  def _step(self, loop):
+    # 'i += paso' evita la relectura de la variable que hace i++
+    op = '+=' if loop.step > 0 else '-='
+    return ExprStmt(OperatorAssign(op, VarExpr(loop.var), ConstExpr(abs(loop.step))))
+
+  def _copies(self, loop, count, declare=True):
+    '''
+    Bloque con 'count' copias del cuerpo, cada una seguida del paso. Las
+    sentencias de las copias se aplanan en un solo bloque para no crear
+    un entorno por copia; solo la primera conserva sus declaraciones.
+    '''
+    block = CompoundStmt([ ], [ ])
+    for k in range(count):
+      body = self.clone(loop.node.stmt)
+      if k == 0 and declare:
+        block.decls = body.decls
+      else:
+        self._redeclare(body)
+      block.stmts += body.stmts
+      block.stmts.append(self._step(loop))
+    return block
+
+  def _full(self, loop, trip):
+    block = self._prologue(loop)
+    if trip:
+      copies = self._copies(loop, trip)
+      block.decls += copies.decls
+      block.stmts += copies.stmts
+    return block
+
+  def _partial(self, loop):
+    ahead = (self.factor - 1) * loop.step
+    if _int_const(loop.bound):
+      cond = BinaryOpExpr(loop.opr, VarExpr(loop.var), ConstExpr(loop.bound.value - ahead))
+    else:
+      cond = BinaryOpExpr(loop.opr, BinaryOpExpr('+', VarExpr(loop.var), ConstExpr(ahead)),
+                          self.clone(loop.bound))
+    main = WhileStmt(cond, self._copies(loop, self.factor))
+    rest = WhileStmt(self.clone(loop.node.cond), self._copies(loop, 1, declare=False))
+    block = self._prologue(loop)
+    block.stmts += [ main, rest ]
+    return block
+
+
+class RangeLoopMarker(Visitor):
+  '''
+  Marca cada ForStmt contado con n.counted = CountedLoop
+  '''
+  def __init__(self):
+    self.types  = { }
+    self.locals = set()
+    self.marked = [ ]
+
+  @classmethod
+  def mark(cls, program: Program):
+    marker = cls()
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        marker.types, marker.locals = declared_types(decl, program)
+        for node in walk(decl.stmts):
+          if isinstance(node, ForStmt):
+            node.accept(marker)
+    return marker.marked
+
+  def visit(self, n: ForStmt):
+    loop = match_counted(n, self.types, self.locals, exits=True)
+    if loop is not None:
+      n.counted = loop
+      self.marked.append(loop)
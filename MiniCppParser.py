@@ -89,9 +89,18 @@ class Parser(sly.Parser):
     def var_decl(self, p):
         return ArrayDeclStmt(p.type_spec, p.IDENT)
     
-    @_("VOID", "BOOL", "INT", "FLOAT", "STR")
+    @_("VOID", "BOOL", "INT", "FLOAT", "STR", "MATRIX", "STRBUF", "FILE")
     def type_spec(self, p):
         return p[0]
+
+    # Contenedores genericos: el tipo es la cadena 'dict<str,int>'
+    @_("DICT '<' type_spec ',' type_spec '>'")
+    def type_spec(self, p):
+        return f'dict<{p.type_spec0},{p.type_spec1}>'
+
+    @_("HEAP '<' type_spec '>'", "DEQUE '<' type_spec '>'")
+    def type_spec(self, p):
+        return f'{p[0]}<{p.type_spec}>'
     
     @_("type_spec IDENT '(' [ params ] ')' compound_stmt")
     def func_decl(self, p):
@@ -119,7 +128,7 @@ class Parser(sly.Parser):
 
     @_("type_spec IDENT '[' ']'")
     def param(self, p):
-        return ArrayDeclStmt(p.type_spec, p.IDENT, True)
+        return ArrayDeclStmt(p.type_spec, p.IDENT)
 
     @_("'{' local_decls stmt_list '}'")
     def compound_stmt(self, p):
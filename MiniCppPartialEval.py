@@ -0,0 +1,503 @@
+# mcpeval.py
+'''
+Evaluacion parcial de programas sin entrada
+===========================================
+Programas como Pruebas/isqrt.mcc o Pruebas/mendel.mcc no leen nada:
+'main' y todo lo que invoca dependen solo de constantes y de globales
+asignadas al inicio de 'main'. El evaluador parcial aprovecha esto en
+tres niveles, cada uno limitado por un presupuesto de pasos (iteraciones
+de ciclos y llamadas, ver Interpreter.tick):
+
+1. Si el programa no tiene entrada, se ejecuta 'main' completo en tiempo
+   de compilacion. El programa residual solo imprime la salida obtenida.
+
+2. Si no alcanza el presupuesto, las globales que solo se escriben en
+   el prefijo de asignaciones constantes de 'main' (p.ej. threshold =
+   1000) se propagan como constantes a todas las funciones y se pliegan
+   las expresiones constantes.
+
+3. Las llamadas a funciones puras con argumentos constantes se
+   precalculan. Si solo algunos argumentos son constantes, se crea una
+   copia especializada de la funcion sobre esos valores.
+'''
+import copy
+import io
+import math
+from contextlib import redirect_stdout
+
+from MiniCppAST      import *
+from MiniCppBuiltins import builtins, consts
+from MiniCppChecker  import Checker
+from MiniCppInterp   import Interpreter, BudgetExceeded, MiniCExit
+from MiniCppTailCall import TailCallMarker
+
+
+class _QuietContext:
+  '''
+  Contexto del interprete de tiempo de compilacion: los errores solo
+  abortan la evaluacion, no se reportan al usuario.
+  '''
+  have_errors = False
+
+  def error(self, position, message):
+    pass
+
+  def find_source(self, node):
+    return type(node).__name__
+
+
+def _representable(value):
+  if isinstance(value, float):
+    return math.isfinite(value)
+  return isinstance(value, (bool, int, str))
+
+
+class PartialEvaluator(Visitor):
+
+  def __init__(self, budget=20000, max_specs=64):
+    self.budget    = budget
+    self.max_specs = max_specs
+    self.report    = []
+    self.known     = { }       # globales con valor conocido
+    self.params    = { }       # parametros constantes de una especializacion
+    self.locals    = set()     # nombres locales de la funcion en proceso
+    self.current   = None      # FuncDeclStmt en proceso
+    self.funcs     = { }       # FuncDeclStmt sin transformar, por nombre
+    self.results   = { }       # (ident, args) -> valor precalculado
+    self.specs     = { }       # (ident, args constantes) -> especializacion
+    self.exhausted = False
+    self.prefix    = [ ]       # asignaciones constantes al inicio de main
+    self.pending   = [ ]       # especializaciones por declarar
+
+  @classmethod
+  def specialize(cls, program: Program, budget=20000):
+    pe = cls(budget)
+    residual = pe.run(program)
+    return residual, pe.report
+
+  def run(self, program: Program):
+    program = copy.deepcopy(program)
+    if not any(hasattr(d, 'pure') for d in program.decls):
+      Checker().classify_purity(program)
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        self.funcs[decl.ident] = copy.deepcopy(decl)
+
+    self.interp = self._load(program)
+    if self.interp is None:
+      return program
+
+    if self._input_free(program):
+      residual = self._evaluate_main()
+      if residual is not None:
+        return residual
+      self.interp = self._load(program)
+
+    self._propagate_globals(program)
+
+    decls = []
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        mark = len(decls)
+        self._function(decl)
+        # Las especializaciones creadas al procesar esta funcion se
+        # declaran antes que ella para que el Checker las encuentre
+        for spec in self.pending:
+          decls.insert(mark, spec)
+        self.pending = []
+      elif isinstance(decl, VarDeclStmt) and decl.expr is not None:
+        self.locals = set()
+        decl.expr = decl.expr.accept(self)
+      decls.append(decl)
+    program.decls = decls
+
+    self._remove_dead_code(program)
+    return program
+
+  # Interprete de tiempo de compilacion
+
+  def _load(self, program):
+    original = copy.deepcopy(program)
+    TailCallMarker.mark(original)
+    # Normalizacion que en una ejecucion normal hace el Checker
+    for node in walk(original):
+      if isinstance(node, FuncDeclStmt) and node.params is None:
+        node.params = []
+      elif isinstance(node, CallExpr) and node.args is None:
+        node.args = []
+    interp = Interpreter(_QuietContext())
+    for name, cval in consts.items():
+      interp.env[name] = cval
+    for name, func in builtins.items():
+      interp.env[name] = func
+    try:
+      original.accept(interp)
+    except (Exception, MiniCExit):
+      return None
+    interp.budget = self.budget
+    return interp
+
+  def _input_free(self, program):
+    for node in walk(program):
+      if isinstance(node, (ScanfStmt, Get, Set, This, Super)):
+        return False
+      if isinstance(node, CallExpr) and node.ident in builtins and not builtins[node.ident].pure:
+        return False
+    return 'main' in self.funcs
+
+  def _evaluate_main(self):
+    main = self.interp.env.get('main')
+    if main is None or not main.is_main():
+      return None
+    output = io.StringIO()
+    try:
+      with redirect_stdout(output):
+        result = main(self.interp)
+    except BudgetExceeded:
+      self.report.append(f"'main' excede el presupuesto de {self.budget} pasos")
+      return None
+    except (Exception, MiniCExit):
+      return None
+
+    steps = self.budget - self.interp.budget
+    self.report.append(f"programa evaluado completamente en tiempo de compilacion ({steps} pasos)")
+    result = result if isinstance(result, int) else 0
+    body = CompoundStmt([], [ PrintfStmt(output.getvalue(), []), ReturnStmt(ConstExpr(result)) ])
+    return Program([ FuncDeclStmt('int', 'main', [], body) ])
+
+  def _call(self, ident, values):
+    key = (ident, tuple(values))
+    if key in self.results:
+      return self.results[key]
+    value = None
+    if not self.exhausted:
+      try:
+        with redirect_stdout(io.StringIO()):
+          value = self.interp.env[ident](self.interp, *values)
+      except BudgetExceeded:
+        self.exhausted = True
+        self.report.append(f"presupuesto de {self.budget} pasos agotado")
+        value = None
+      except (Exception, MiniCExit):
+        value = None
+    self.results[key] = value
+    return value
+
+  # Propagacion de globales
+
+  def _propagate_globals(self, program):
+    globals_ = { d.ident: d for d in program.decls if isinstance(d, VarDeclStmt) }
+    self.locals = set()
+    for name, decl in globals_.items():
+      if decl.expr is not None:
+        value = decl.expr.accept(self)
+        if isinstance(value, ConstExpr):
+          self.known[name] = value.value
+
+    main = next((d for d in program.decls if isinstance(d, FuncDeclStmt) and d.ident == 'main'), None)
+    prefix = []
+    if main is not None:
+      self.locals = self._locals(main)
+      # Los inicializadores locales de main se ejecutan antes del prefijo:
+      # ven el valor inicial de las globales que leen, no el del prefijo
+      read = { n.ident for d in main.stmts.decls for n in walk(d) if isinstance(n, VarExpr) }
+      if all(not isinstance(n, CallExpr) for d in main.stmts.decls for n in walk(d)):
+        for stmt in main.stmts.stmts:
+          expr = stmt.expr if isinstance(stmt, ExprStmt) else None
+          if not isinstance(expr, VarAssignmentExpr) or expr.var not in globals_ or expr.var in self.locals:
+            break
+          if expr.var in read:
+            break
+          if any(expr.var == stmt.expr.var for stmt in prefix):
+            break
+          expr.expr = expr.expr.accept(self)
+          if not isinstance(expr.expr, ConstExpr):
+            break
+          self.known[expr.var] = expr.expr.value
+          prefix.append(stmt)
+
+    # Solo son constantes las globales que no se escriben fuera del prefijo
+    written = set()
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        local = self._locals(decl)
+        for node in walk(decl.stmts):
+          if any(node is stmt.expr for stmt in prefix):
+            continue
+          names = self._targets(node)
+          written |= { name for name in names if name not in local }
+    for name in list(self.known):
+      if name in written or name not in globals_:
+        del self.known[name]
+      else:
+        self.report.append(f"global '{name}' = {self.known[name]!r} propagada como constante")
+    self.prefix = [ stmt for stmt in prefix if stmt.expr.var in self.known ]
+
+  def _targets(self, node):
+    '''
+    Nombres de variables que escribe el nodo
+    '''
+    if isinstance(node, VarAssignmentExpr):
+      return [ node.var ]
+    if isinstance(node, SprintfStmt):
+      return [ node.ident ]
+    if isinstance(node, ScanfStmt):
+      return [ arg.ident for arg in node.args if isinstance(arg, VarExpr) ]
+    if isinstance(node, (PreInc, PreDec, PostInc, PostDec)) and isinstance(node.expr, VarExpr):
+      return [ node.expr.ident ]
+    if isinstance(node, OperatorAssign) and isinstance(node.expr0, VarExpr):
+      return [ node.expr0.ident ]
+    return [ ]
+
+  def _locals(self, func):
+    local = { p.ident for p in func.params or [] }
+    for node in walk(func.stmts):
+      if isinstance(node, (VarDeclStmt, ArrayDeclStmt)):
+        local.add(node.ident)
+    return local
+
+  # Especializacion de funciones
+
+  def _function(self, func, params={}):
+    saved = (self.locals, self.params, self.current)
+    self.locals  = self._locals(func)
+    self.params  = params
+    self.current = func
+    func.stmts = func.stmts.accept(self)
+    self.locals, self.params, self.current = saved
+
+  def _specialize(self, func, args):
+    '''
+    Crea (o reutiliza) una copia de func con los argumentos constantes
+    fijados. Los parametros que el cuerpo no modifica se sustituyen por
+    su valor; el resto se declaran como variables locales inicializadas.
+    '''
+    fixed = tuple((i, arg.value) for i, arg in enumerate(args) if isinstance(arg, ConstExpr))
+    key = (func.ident, fixed)
+    if key in self.specs:
+      return self.specs[key]
+    if len(self.specs) >= self.max_specs:
+      return None
+
+    spec = copy.deepcopy(self.funcs[func.ident])
+    spec.ident = f'{func.ident}__{len(self.specs) + 1}'
+    self.specs[key] = spec
+
+    written = set()
+    for node in walk(spec.stmts):
+      written.update(self._targets(node))
+
+    params, inits, bound = [], [], { }
+    for i, param in enumerate(spec.params):
+      if isinstance(args[i], ConstExpr):
+        if param.ident in written:
+          inits.append(VarDeclStmt(param._type, param.ident, ConstExpr(args[i].value)))
+        else:
+          bound[param.ident] = args[i].value
+      else:
+        params.append(param)
+    spec.params = params
+    spec.stmts.decls = inits + spec.stmts.decls
+
+    names = [ p.ident for p in self.funcs[func.ident].params ]
+    fixed_text = ', '.join(f'{names[i]} = {v!r}' for i, v in fixed)
+    self.report.append(f"'{func.ident}' especializada como '{spec.ident}' ({fixed_text})")
+
+    self._function(spec, bound)
+    self.pending.append(spec)
+    return spec
+
+  # Statements
+
+  def visit(self, n: CompoundStmt):
+    n.decls = [ decl.accept(self) for decl in n.decls ]
+    n.stmts = [ stmt.accept(self) for stmt in n.stmts ]
+    return n
+
+  def visit(self, n: VarDeclStmt):
+    if n.expr is not None:
+      n.expr = n.expr.accept(self)
+    return n
+
+  def visit(self, n: ExprStmt):
+    n.expr = n.expr.accept(self)
+    return n
+
+  def visit(self, n: PrintfStmt):
+    n.args = [ arg.accept(self) for arg in n.args ]
+    return n
+
+  def visit(self, n: IfStmt):
+    n.expr  = n.expr.accept(self)
+    n.then  = n.then.accept(self)
+    if n.else_:
+      n.else_ = n.else_.accept(self)
+    if isinstance(n.expr, ConstExpr) and isinstance(n.expr.value, bool):
+      if n.expr.value:
+        return n.then
+      return n.else_ if n.else_ else NullStmt()
+    return n
+
+  def visit(self, n: WhileStmt):
+    n.expr = n.expr.accept(self)
+    n.stmt = n.stmt.accept(self)
+    if isinstance(n.expr, ConstExpr) and n.expr.value is False:
+      return NullStmt()
+    return n
+
+  def visit(self, n: ForStmt):
+    n.init = n.init.accept(self)
+    n.cond = n.cond.accept(self)
+    n.iter = n.iter.accept(self)
+    n.stmt = n.stmt.accept(self)
+    return n
+
+  def visit(self, n: ReturnStmt):
+    # Las llamadas de cola se vuelven a marcar sobre el programa residual
+    n.__dict__.pop('tailcall', None)
+    if n.expr is not None:
+      n.expr = n.expr.accept(self)
+    return n
+
+  # Expresiones
+
+  def _fold(self, n, fold):
+    try:
+      value = fold()
+    except (Exception, MiniCExit):
+      return n
+    return ConstExpr(value) if _representable(value) else n
+
+  def visit(self, n: ConstExpr):
+    return n
+
+  def visit(self, n: VarExpr):
+    if n.ident in self.params:
+      return ConstExpr(self.params[n.ident])
+    if n.ident in self.locals:
+      return n
+    if n.ident in self.known:
+      return ConstExpr(self.known[n.ident])
+    if n.ident in consts and n.ident not in self.funcs and isinstance(consts[n.ident], (int, float)):
+      return ConstExpr(consts[n.ident])
+    return n
+
+  def visit(self, n: BinaryOpExpr):
+    n.left  = n.left.accept(self)
+    n.right = n.right.accept(self)
+    if isinstance(n.left, ConstExpr) and isinstance(n.right, ConstExpr):
+      return self._fold(n, lambda: self.interp._binary_op(n, n.left.value, n.right.value))
+    return n
+
+  def visit(self, n: LogicalOpExpr):
+    n.left  = n.left.accept(self)
+    n.right = n.right.accept(self)
+    if isinstance(n.left, ConstExpr) and isinstance(n.right, ConstExpr):
+      if n.opr == '&&':
+        return ConstExpr(n.right.value if n.left.value is True else n.left.value)
+      if n.opr == '||':
+        return ConstExpr(n.left.value if n.left.value is True else n.right.value)
+    return n
+
+  def visit(self, n: UnaryOpExpr):
+    n.expr = n.expr.accept(self)
+    if isinstance(n.expr, ConstExpr):
+      return self._fold(n, lambda: self.interp._unary_op(n, n.expr.value))
+    return n
+
+  def visit(self, n: Grouping):
+    n.expr = n.expr.accept(self)
+    if isinstance(n.expr, ConstExpr):
+      return n.expr
+    return n
+
+  def visit(self, n: IntToFloatExpr):
+    n.expr = n.expr.accept(self)
+    if isinstance(n.expr, ConstExpr) and isinstance(n.expr.value, int):
+      return ConstExpr(float(n.expr.value))
+    return n
+
+  def visit(self, n: VarAssignmentExpr):
+    n.expr = n.expr.accept(self)
+    return n
+
+  def visit(self, n: OperatorAssign):
+    n.expr1 = n.expr1.accept(self)
+    return n
+
+  def visit(self, n: ArrayLoockupExpr):
+    n.expr = n.expr.accept(self)
+    return n
+
+  def visit(self, n: ArrayAssignmentExpr):
+    n.ndx  = n.ndx.accept(self)
+    n.expr = n.expr.accept(self)
+    return n
+
+  def visit(self, n: CallExpr):
+    n.args = [ arg.accept(self) for arg in n.args or [] ]
+    constant = all(isinstance(arg, ConstExpr) for arg in n.args)
+
+    if n.ident in builtins and n.ident not in self.funcs:
+      builtin = builtins[n.ident]
+      if builtin.pure and constant:
+        return self._fold(n, lambda: builtin(self.interp, *[ arg.value for arg in n.args ]))
+      return n
+
+    func = self.funcs.get(n.ident)
+    if func is None:
+      return n
+    if constant and func.pure and func._type != 'void':
+      value = self._call(n.ident, [ arg.value for arg in n.args ])
+      if _representable(value):
+        args = ', '.join(repr(arg.value) for arg in n.args)
+        self.report.append(f"llamada {n.ident}({args}) precalculada = {value!r}")
+        return ConstExpr(value)
+      return n
+
+    recursive = self.current is not None and self.current.ident.split('__')[0] == n.ident
+    if any(isinstance(arg, ConstExpr) for arg in n.args) and not recursive:
+      spec = self._specialize(func, n.args)
+      if spec is not None:
+        n.ident = spec.ident
+        n.args  = [ arg for arg in n.args if not isinstance(arg, ConstExpr) ]
+    return n
+
+  def visit(self, n: Node):
+    return n
+
+  # Limpieza del programa residual
+
+  def _remove_dead_code(self, program):
+    funcs = { d.ident: d for d in program.decls if isinstance(d, FuncDeclStmt) }
+
+    # Funciones alcanzables desde main
+    reachable, pending = set(), [ 'main' ]
+    while pending:
+      name = pending.pop()
+      if name in reachable or name not in funcs:
+        continue
+      reachable.add(name)
+      # Una funcion tambien se alcanza pasada como valor: vectorize(f, a)
+      pending.extend(n.ident for n in walk(funcs[name]) if isinstance(n, (CallExpr, VarExpr)))
+    for decl in list(program.decls):
+      if isinstance(decl, FuncDeclStmt) and decl.ident not in reachable and 'main' in funcs:
+        program.decls.remove(decl)
+        self.report.append(f"funcion '{decl.ident}' eliminada (inalcanzable)")
+
+    # Globales propagadas que ya nadie lee
+    read = set()
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        local = self._locals(decl)
+        read |= { n.ident for n in walk(decl) if isinstance(n, VarExpr) and n.ident not in local }
+      elif isinstance(decl, VarDeclStmt) and decl.expr is not None:
+        read |= { n.ident for n in walk(decl.expr) if isinstance(n, VarExpr) }
+
+    main = funcs.get('main')
+    for stmt in self.prefix:
+      if stmt.expr.var not in read and main is not None and stmt in main.stmts.stmts:
+        main.stmts.stmts.remove(stmt)
+    for decl in list(program.decls):
+      if isinstance(decl, VarDeclStmt) and decl.ident in self.known and decl.ident not in read:
+        program.decls.remove(decl)
@@ -0,0 +1,227 @@
+# mcpasses.py
+'''
+Administrador de pases de optimizacion
+======================================
+Los analisis y transformaciones que se aplican al AST antes de ejecutar
+(pureza, evaluacion parcial, vectorizacion, ciclos, limites de
+arreglos, llamadas de cola...) se registran aqui como pases en un orden
+fijo. Cada nivel de optimizacion (-O0, -O1, -O2)
+habilita los pases cuyo 'level' no lo supera; --enable-pass y
+--disable-pass ajustan la seleccion pase por pase.
+
+En modo depuracion (-d) el AST, y su IR cuando el programa tiene
+traduccion, se validan despues de cada pase. Con --time-passes se
+reporta el tiempo de cada pase y el cambio en el numero de nodos.
+'''
+import time
+
+from rich       import print
+from rich.table import Table
+
+from MiniCppAST         import *
+from MiniCppChecker     import Checker
+from MiniCppTailCall    import TailCallMarker
+from MiniCppPartialEval import PartialEvaluator
+from MiniCppIR          import IRBuilder, IRError
+from MiniCppLoops       import LoopUnroller, RangeLoopMarker
+from MiniCppVector      import Vectorizer
+from MiniCppBounds      import BoundsAnalyzer
+
+
+class Pass:
+  '''
+  Pase de la tuberia. 'run' recibe el programa y devuelve el programa
+  (el mismo u otro) que reciben los pases siguientes.
+  '''
+  name  = None
+  kind  = 'transform'     # 'analysis' no modifica el AST
+  level = 1               # nivel minimo de -O que lo habilita
+  help  = ''
+
+  def run(self, context, program):
+    return program
+
+
+class PurityPass(Pass):
+  name  = 'purity'
+  kind  = 'analysis'
+  level = 1
+  help  = 'Clasifica las funciones puras (memoizacion, evaluacion parcial)'
+
+  def run(self, context, program):
+    Checker().classify_purity(program)
+    return program
+
+
+class PartialEvalPass(Pass):
+  name  = 'peval'
+  level = 2
+  help  = 'Evaluacion parcial con el presupuesto --peval-budget'
+
+  def run(self, context, program):
+    residual, report = PartialEvaluator.specialize(program, context.peval_budget)
+    return residual
+
+
+class VectorizePass(Pass):
+  name  = 'vectorize'
+  kind  = 'analysis'
+  level = 1
+  help  = 'Ejecuta los ciclos elemento a elemento sobre arreglos con NumPy'
+
+  def run(self, context, program):
+    Vectorizer.mark(program)
+    return program
+
+
+class UnrollPass(Pass):
+  name  = 'unroll'
+  level = 2
+  help  = 'Desenrolla los ciclos for contados (--unroll-factor, --unroll-full)'
+
+  def run(self, context, program):
+    LoopUnroller.unroll(program, context.unroll_factor, context.unroll_full, context.clone)
+    return program
+
+
+class RangeLoopPass(Pass):
+  name  = 'rangeloops'
+  kind  = 'analysis'
+  level = 1
+  help  = 'Ejecuta los ciclos for contados con un range nativo'
+
+  def run(self, context, program):
+    RangeLoopMarker.mark(program)
+    return program
+
+
+class BoundsPass(Pass):
+  name  = 'bounds'
+  kind  = 'analysis'
+  level = 1
+  help  = 'Omite la revision de limites de los accesos con indice en rango'
+
+  def run(self, context, program):
+    BoundsAnalyzer.mark(program)
+    return program
+
+
+class TailCallPass(Pass):
+  name  = 'tailcalls'
+  level = 1
+  help  = 'Convierte las llamadas de cola recursivas en ciclos'
+
+  def run(self, context, program):
+    context.tailcalls = TailCallMarker.mark(program)
+    return program
+
+
+class PassManager:
+
+  # Orden de la tuberia
+  passes = [ PurityPass, PartialEvalPass, VectorizePass, UnrollPass, RangeLoopPass,
+             BoundsPass, TailCallPass ]
+
+  def __init__(self, context):
+    self.context = context
+    self.level   = 1
+    self.enabled  = set()
+    self.disabled = set()
+    self.debug   = False
+    self.timings = [ ]
+
+  @classmethod
+  def names(cls):
+    return [ p.name for p in cls.passes ]
+
+  def pipeline(self):
+    '''
+    Pases habilitados por el nivel y los ajustes, en orden
+    '''
+    selected = [ ]
+    for cls in self.passes:
+      if cls.name in self.disabled:
+        continue
+      if cls.level <= self.level or cls.name in self.enabled:
+        selected.append(cls())
+    return selected
+
+  def run(self, program):
+    self.timings = [ ]
+    if not isinstance(program, Program):
+      return program
+    for p in self.pipeline():
+      before = count_nodes(program)
+      start = time.perf_counter()
+      program = p.run(self.context, program)
+      elapsed = time.perf_counter() - start
+      self.timings.append((p, elapsed, before, count_nodes(program)))
+
+      if self.debug:
+        errors = verify_program(program)
+        for message in errors:
+          self.context.error(f"Pase '{p.name}'", message)
+        if errors:
+          break
+    return program
+
+  def print_timings(self):
+    table = Table(title=f'[bold blue] Pases de optimizacion (-O{self.level}) [/bold blue]')
+    table.add_column('Pase')
+    table.add_column('Tipo')
+    table.add_column('Tiempo (ms)', justify='right')
+    table.add_column('Nodos', justify='right')
+    table.add_column('Cambio', justify='right')
+    total = 0.0
+    for p, elapsed, before, after in self.timings:
+      total += elapsed
+      table.add_row(p.name, p.kind, f'{elapsed * 1000:.2f}', f'{before} -> {after}', f'{after - before:+d}')
+    table.add_row('total', '', f'{total * 1000:.2f}', '', '')
+    print(table)
+
+
+def count_nodes(program):
+  return sum(1 for _ in walk(program))
+
+
+def verify_program(program):
+  '''
+  Invariantes que todo pase debe conservar. Devuelve la lista de errores.
+  '''
+  errors = [ ]
+  seen = set()
+  funcs = set()
+  for node in walk(program):
+    # El interprete guarda datos por id(node): un nodo no puede quedar
+    # compartido entre dos lugares del arbol
+    if id(node) in seen:
+      errors.append(f'{type(node).__name__} aparece mas de una vez en el AST')
+    seen.add(id(node))
+
+    if isinstance(node, FuncDeclStmt):
+      if not isinstance(node.stmts, CompoundStmt):
+        errors.append(f"el cuerpo de '{node.ident}' no es un CompoundStmt")
+    elif isinstance(node, (WhileStmt, ForStmt)) and not isinstance(node.stmt, Node):
+      errors.append(f'{type(node).__name__} sin cuerpo')
+    elif isinstance(node, IfStmt) and not isinstance(node.then, Node):
+      errors.append('IfStmt sin rama then')
+    elif isinstance(node, ReturnStmt) and getattr(node, 'tailcall', None) is not None:
+      call = node.expr
+      while isinstance(call, Grouping):
+        call = call.expr
+      if call is not node.tailcall:
+        errors.append("llamada de cola marcada que no es la expresion del return")
+
+  for decl in program.decls:
+    if isinstance(decl, FuncDeclStmt):
+      if decl.ident in funcs:
+        errors.append(f"funcion '{decl.ident}' declarada mas de una vez")
+      funcs.add(decl.ident)
+
+  if not errors:
+    try:
+      errors += IRBuilder.lower(program).verify()
+    except IRError:
+      # Programas con clases: no tienen IR, solo se valida el AST
+      pass
+  return errors
@@ -0,0 +1,320 @@
+# mcstackeval.py
+'''
+Evaluador no recursivo
+======================
+El interprete de arbol (MiniCppInterp) usa varios marcos de Python por
+cada nivel de expresion o de llamada (accept, el despachador de
+multimethod y visit), de modo que la recursion del programa invitado
+queda limitada por sys.getrecursionlimit().
+
+Este modulo evalua el mismo AST con una pila de trabajo explicita. Cada
+nodo en evaluacion es un registro de continuacion (un generador) que
+entrega con 'yield' los hijos que necesita y recibe su valor. Las
+excepciones de control (return, break, continue) se propagan lanzandolas
+dentro del registro padre. La profundidad solo esta limitada por un
+presupuesto de memoria configurable.
+
+Las operaciones en si (aritmetica, asignaciones, printf, llamadas a
+builtins) se comparten con el Interpreter para conservar la semantica.
+'''
+from MiniCppAST      import *
+from MiniCpptypes    import LRUCache, new_container
+from MiniCppBuiltins import CallError
+from MiniCppInterp   import (Function, ReturnException, TailCallException,
+                             BreakException, ContinueException, _is_truthy)
+
+
+# Costo estimado (bytes) de un registro de continuacion: el generador,
+# su marco y las variables locales que mantiene vivas.
+RECORD_SIZE = 512
+
+
+class _Call:
+  '''
+  Registro de llamada a una funcion del usuario
+  '''
+  def __init__(self, func, args):
+    self.func = func
+    self.args = args
+
+
+class StackEvaluator:
+
+  def __init__(self, interp, budget):
+    self.interp  = interp
+    self.budget  = budget
+    self.max_records = max(budget // RECORD_SIZE, 1)
+
+    # Nodos que no tienen hijos que evaluar: se resuelven directamente
+    # con el Interpreter sin apilar un registro
+    self.leaves = (ConstExpr, VarExpr, PreInc, PreDec, PostInc, PostDec,
+                   ArraySizeExpr, SizeOfExpr, BreakStmt, ContinueStmt,
+                   NullStmt, FuncDeclStmt)
+
+    self.records = {
+      _Call             : self._call,
+      Program           : self._program,
+      CompoundStmt      : self._compound,
+      VarDeclStmt       : self._vardecl,
+      ExprStmt          : self._exprstmt,
+      PrintfStmt        : self._printf,
+      SprintfStmt       : self._sprintf,
+      ScanfStmt         : self._scanf,
+      IfStmt            : self._if,
+      WhileStmt         : self._while,
+      ForStmt           : self._for,
+      ReturnStmt        : self._return,
+      BinaryOpExpr      : self._binary,
+      LogicalOpExpr     : self._logical,
+      UnaryOpExpr       : self._unary,
+      Grouping          : self._grouping,
+      VarAssignmentExpr : self._assign,
+      OperatorAssign    : self._operator_assign,
+      CallExpr          : self._callexpr,
+      NewArrayExpr      : self._newarray,
+      ArrayLoockupExpr  : self._lookup,
+      ArrayAssignmentExpr : self._array_assign,
+    }
+
+  def call(self, func, args=()):
+    return self.run(_Call(func, list(args)))
+
+  def run(self, node):
+    '''
+    Ciclo principal: mantiene la pila de registros y trasiega valores y
+    excepciones entre ellos sin recursion en Python.
+    '''
+    stack = [ self._record(node) ]
+    value = None
+    error = None
+    while stack:
+      record = stack[-1]
+      try:
+        if error is not None:
+          thrown, error = error, None
+          child = record.throw(thrown)
+        else:
+          child = record.send(value)
+      except StopIteration as e:
+        stack.pop()
+        value = e.value
+        continue
+      except Exception as e:
+        stack.pop()
+        if not stack:
+          raise
+        error = e
+        continue
+
+      if isinstance(child, self.leaves):
+        try:
+          value = child.accept(self.interp)
+        except Exception as e:
+          error = e
+        continue
+
+      if len(stack) >= self.max_records:
+        self.interp.error(self._position(child),
+          f"Desbordamiento de pila: se excedio el presupuesto de {self.budget} bytes")
+      stack.append(self._record(child))
+      value = None
+    return value
+
+  def _record(self, node):
+    make = self.records.get(type(node))
+    if make is None:
+      return self._fallback(node)
+    return make(node)
+
+  def _position(self, node):
+    if isinstance(node, _Call):
+      return f"llamada a '{node.func.node.ident}'"
+    return node
+
+  # Registros de continuacion
+
+  def _fallback(self, node):
+    # Nodos sin version iterativa: se evaluan con el interprete de arbol
+    return node.accept(self.interp)
+    yield
+
+  def _call(self, call):
+    interp = self.interp
+    node = call.func.node
+    args = call.args
+    oldenv = interp.env
+    try:
+      while True:
+        try:
+          interp.env = call.func.bind_args(call.func.env.new_child(), args)
+        except CallError as err:
+          interp.error(node, str(err))
+        try:
+          yield node.stmts
+          result = None
+        except TailCallException as e:
+          args = e.values
+          continue
+        except ReturnException as e:
+          result = e.value
+        return result
+    finally:
+      interp.env = oldenv
+
+  def _program(self, node):
+    for decl in node.decls:
+      yield decl
+
+  def _compound(self, node):
+    interp = self.interp
+    interp.env = interp.env.new_child()
+    for decl in node.decls:
+      yield decl
+    for stmt in node.stmts:
+      yield stmt
+    interp.env = interp.env.parents
+
+  def _vardecl(self, node):
+    expr = (yield node.expr) if node.expr else new_container(node._type)
+    self.interp._declare(node, expr)
+
+  def _exprstmt(self, node):
+    yield node.expr
+
+  def _printf(self, node):
+    args = []
+    for arg in node.args:
+      args.append((yield arg))
+    self.interp._printf(node, args)
+
+  def _sprintf(self, node):
+    args = []
+    for arg in node.args:
+      args.append((yield arg))
+    self.interp._sprintf(node, args)
+
+  def _scanf(self, node):
+    ndxs = []
+    for arg in node.args:
+      ndxs.append((yield arg.expr) if isinstance(arg, ArrayLoockupExpr) else None)
+    self.interp._scanf(node, ndxs)
+
+  def _if(self, node):
+    interp = self.interp
+    interp.env['ifstmt'] = True
+    expr = yield node.expr
+    if _is_truthy(expr):
+      yield node.then
+    elif node.else_:
+      yield node.else_
+    interp.env['ifstmt'] = False
+
+  def _while(self, node):
+    interp = self.interp
+    interp.env['incycle'] = True
+    env = interp.env
+    while _is_truthy((yield node.expr)):
+      try:
+        yield node.stmt
+      except BreakException:
+        interp.env = env
+        return
+      except ContinueException:
+        interp.env = env
+        continue
+    interp.env['incycle'] = False
+
+  def _for(self, node):
+    interp = self.interp
+    interp.env['incycle'] = True
+    yield node.init
+    env = interp.env
+    while _is_truthy((yield node.cond)):
+      try:
+        yield node.stmt
+      except BreakException:
+        interp.env = env
+        return
+      except ContinueException:
+        interp.env = env
+        yield node.iter
+        continue
+      yield node.iter
+    interp.env['incycle'] = False
+
+  def _return(self, node):
+    call = getattr(node, 'tailcall', None)
+    if call is not None:
+      values = []
+      for arg in call.args:
+        values.append((yield arg))
+      raise TailCallException(values)
+
+    value = 0 if not node.expr else (yield node.expr)
+    raise ReturnException(value)
+
+  def _binary(self, node):
+    left  = yield node.left
+    right = yield node.right
+    return self.interp._binary_op(node, left, right)
+
+  def _logical(self, node):
+    left = yield node.left
+    if node.opr == '||':
+      return left if _is_truthy(left) else (yield node.right)
+    if node.opr == '&&':
+      return (yield node.right) if _is_truthy(left) else left
+    raise NotImplementedError(f"Mal operador {node.opr}")
+
+  def _unary(self, node):
+    expr = yield node.expr
+    return self.interp._unary_op(node, expr)
+
+  def _grouping(self, node):
+    return (yield node.expr)
+
+  def _assign(self, node):
+    expr = yield node.expr
+    self.interp._assign(node, expr)
+
+  def _operator_assign(self, node):
+    expr = yield node.expr1
+    return self.interp._operator_assign(node, expr)
+
+  def _newarray(self, node):
+    size = yield node.expr
+    return self.interp._new_array(node, size)
+
+  def _lookup(self, node):
+    array = self.interp._array(node, node.ident)
+    ndx = yield node.expr
+    return self.interp._array_load(node, array, ndx)
+
+  def _array_assign(self, node):
+    array = self.interp._array(node, node.ident)
+    ndx  = yield node.ndx
+    expr = yield node.expr
+    return self.interp._array_store(node, array, ndx, expr)
+
+  def _callexpr(self, node):
+    interp = self.interp
+    callee = interp.env[node.ident]
+    if not callable(callee):
+      interp.error(node.ident, f'{interp.ctxt.find_source(node.ident)!r} no es invocable')
+
+    args = []
+    for arg in node.args:
+      args.append((yield arg))
+
+    if isinstance(callee, Function):
+      if len(args) != callee.arity:
+        interp.error(node.ident, f"Experado {callee.arity} argumentos")
+      if callee.memo is None:
+        return (yield _Call(callee, args))
+      key = Function.memo_key(args)
+      result = callee.memo.get(key)
+      if result is LRUCache._missing:
+        result = yield _Call(callee, args)
+        callee.memo.put(key, result)
+      return result
+    return interp._call(node, callee, args)
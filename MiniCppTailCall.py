@@ -0,0 +1,73 @@
+# mctailcall.py
+'''
+Eliminacion de llamadas de cola (tail-call)
+===========================================
+Una sentencia 'return f(...)' dentro de la funcion 'f' es una llamada
+de cola: no queda nada por hacer en el marco actual despues de la
+llamada. El interprete puede entonces reutilizar el marco en lugar de
+anidar otro 'Function.__call__' (ver MiniCppInterp.Function).
+
+Este modulo solo marca los nodos ReturnStmt con el atributo 'tailcall'
+y devuelve la lista de llamadas convertidas para poder reportarlas.
+'''
+from MiniCppAST import *
+
+
+class TailCallMarker(Visitor):
+
+  def __init__(self):
+    self.func = None
+    self.converted = []
+
+  @classmethod
+  def mark(cls, n: Node):
+    marker = cls()
+    n.accept(marker)
+    return marker.converted
+
+  # Declaraciones
+
+  def visit(self, n: Program):
+    for decl in n.decls:
+      decl.accept(self)
+
+  def visit(self, n: ClassDeclStmt):
+    for meth in n.class_body:
+      meth.accept(self)
+
+  def visit(self, n: FuncDeclStmt):
+    self.func = n
+    n.stmts.accept(self)
+    self.func = None
+
+  # Statements
+
+  def visit(self, n: CompoundStmt):
+    for stmt in n.stmts:
+      stmt.accept(self)
+
+  def visit(self, n: IfStmt):
+    n.then.accept(self)
+    if n.else_:
+      n.else_.accept(self)
+
+  def visit(self, n: WhileStmt):
+    n.stmt.accept(self)
+
+  def visit(self, n: ForStmt):
+    n.stmt.accept(self)
+
+  def visit(self, n: ReturnStmt):
+    call = n.expr
+    while isinstance(call, Grouping):
+      call = call.expr
+    if self.func is None or not isinstance(call, CallExpr):
+      return
+    params = self.func.params or []
+    args = call.args or []
+    if call.ident == self.func.ident and len(args) == len(params):
+      n.tailcall = call
+      self.converted.append((self.func, n))
+
+  def visit(self, n: Node):
+    pass
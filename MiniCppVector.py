@@ -0,0 +1,549 @@
+# mcvector.py
+'''
+Vectorizacion de ciclos elemento a elemento
+===========================================
+Un ciclo contado (ver MiniCppLoops) cuyo cuerpo solo tiene asignaciones
+a celdas de arreglos en la posicion de la variable de induccion
+
+    for (i = 0; i < n; i++) {
+      c[i] = a[i] * k + b[i];
+      d[i] = c[i] - a[i+1];
+    }
+
+se ejecuta como una expresion de NumPy por sentencia sobre rebanadas de
+los arreglos, en lugar de iterar en el interprete. Las expresiones
+admitidas son constantes numericas, variables escalares (que el cuerpo
+no modifica), la variable de induccion, lecturas a[i + c] y los
+operadores + - * / % y el menos unario.
+
+Dependencias
+------------
+El analisis estatico (match_vector) descarta los ciclos con dependencias
+entre iteraciones: un arreglo escrito en el ciclo solo se puede leer en
+la misma posicion i. Las lecturas a[i + c] con c != 0 solo se admiten
+para arreglos que el ciclo no escribe.
+
+Al ejecutar (VectorLoop.run) se revisa ademas lo que el analisis no ve:
+que los nombres sean arreglos numericos, que ningun arreglo escrito
+comparta memoria con otro nombre usado en el ciclo, que todos los
+indices esten dentro de los limites y que no haya divisiones por cero.
+Si algo falla, el ciclo se ejecuta de forma escalar, de modo que los
+errores se reportan igual que sin vectorizar. Los resultados se
+calculan completos antes de escribir el primero.
+
+Funciones
+---------
+El builtin vectorize(f, a, b, ...) aplica una funcion escalar del
+usuario a todos los elementos de sus argumentos (lift). FunctionLifter
+traduce el cuerpo a operaciones de NumPy con mascaras; si no puede, la
+funcion se llama una vez por elemento.
+'''
+from MiniCppAST   import *
+from MiniCppLoops import match_counted, declared_types
+from MiniCpptypes import np, Array, array_dtypes, new_array
+
+
+class VectorFallback(Exception):
+  '''
+  El ciclo no se puede ejecutar vectorizado con los valores actuales
+  '''
+
+
+# Operadores binarios con version vectorial
+_binops = ('+', '-', '*', '/', '%')
+
+
+class VectorLoop:
+  '''
+  Ciclo contado cuyo cuerpo es una lista de asignaciones a[i] = expr
+  '''
+  def __init__(self, loop, stmts):
+    self.loop  = loop         # CountedLoop
+    self.stmts = stmts        # [ (arreglo, expr) ]
+    self.names = set()        # variables escalares
+    self.reads = set()        # (arreglo, desplazamiento)
+    for _, expr in stmts:
+      for n in walk(expr):
+        if isinstance(n, VarExpr) and n.ident != loop.var:
+          self.names.add(n.ident)
+        elif isinstance(n, ArrayLoockupExpr):
+          self.reads.add((n.ident, _offset(n.expr, loop.var)))
+    self.written = { ident for ident, _ in stmts }
+    self.arrays  = self.written | { ident for ident, _ in self.reads }
+    self.runs      = 0
+    self.fallbacks = 0
+
+  def run(self, interp, values):
+    '''
+    Ejecuta el ciclo para los valores 'values' (un range) de la variable
+    de induccion. Devuelve False, sin haber modificado nada, si hay que
+    ejecutarlo de forma escalar.
+    '''
+    try:
+      self._run(interp, values)
+    except VectorFallback:
+      self.fallbacks += 1
+      return False
+    self.runs += 1
+    return True
+
+  def _run(self, interp, values):
+    env = { }
+    for name in self.arrays | self.names:
+      for scope in interp.env.maps:
+        if name in scope:
+          env[name] = scope[name]
+          break
+      else:
+        raise VectorFallback(name)
+
+    for name in self.arrays:
+      array = env[name]
+      if not isinstance(array, Array) or not array.numeric:
+        raise VectorFallback(name)
+      if name in self.written and not array.writable:
+        # El interprete reporta el error del arreglo de solo lectura
+        raise VectorFallback(name)
+      # Los ciclos trabajan sobre el buffer NumPy del arreglo
+      env[name] = array.data
+    for name in self.names:
+      if type(env[name]) not in (int, float):
+        raise VectorFallback(name)
+
+    # Un arreglo escrito no puede ser el mismo (o compartir memoria) con
+    # otro nombre del ciclo: seria una dependencia que el analisis no ve
+    for w in self.written:
+      for name in self.arrays:
+        if name != w and np.shares_memory(env[w], env[name]):
+          raise VectorFallback(name)
+
+    if not values:
+      return
+
+    slices = { }
+    for name, offset in self.reads | { (w, 0) for w in self.written }:
+      slices[name, offset] = _slice(values, offset, len(env[name]))
+
+    index = np.arange(values.start, values.stop, values.step)
+    results = { }
+    for ident, expr in self.stmts:
+      value = self._eval(expr, env, slices, results, index)
+      array = env[ident]
+      value = np.broadcast_to(np.asarray(value), len(values))
+      if array.dtype.kind == 'i' and value.dtype.kind == 'f':
+        if not np.all(np.isfinite(value)):
+          raise VectorFallback(ident)
+      # Las lecturas posteriores ven el valor ya convertido al tipo del
+      # arreglo, como en la ejecucion escalar
+      results[ident] = value.astype(array.dtype)
+
+    for ident, value in results.items():
+      env[ident][slices[ident, 0]] = value
+
+  def _eval(self, expr, env, slices, results, index):
+    if isinstance(expr, ConstExpr):
+      return expr.value
+    if isinstance(expr, Grouping):
+      return self._eval(expr.expr, env, slices, results, index)
+    if isinstance(expr, VarExpr):
+      if expr.ident == self.loop.var:
+        return index
+      return env[expr.ident]
+    if isinstance(expr, ArrayLoockupExpr):
+      offset = _offset(expr.expr, self.loop.var)
+      if offset == 0 and expr.ident in results:
+        return results[expr.ident]
+      return env[expr.ident][slices[expr.ident, offset]]
+    if isinstance(expr, UnaryOpExpr):
+      return -self._eval(expr.expr, env, slices, results, index)
+
+    left  = self._eval(expr.left, env, slices, results, index)
+    right = self._eval(expr.right, env, slices, results, index)
+    if expr.opr == '+':
+      return np.add(left, right)
+    if expr.opr == '-':
+      return np.subtract(left, right)
+    if expr.opr == '*':
+      return np.multiply(left, right)
+    # Division y modulo: con un divisor cero el ciclo escalar falla en la
+    # iteracion que corresponde
+    if np.any(np.asarray(right) == 0):
+      raise VectorFallback(expr.opr)
+    if expr.opr == '%':
+      return np.remainder(left, right)
+    if _is_integer(left) and _is_integer(right):
+      return np.floor_divide(left, right)
+    return np.true_divide(left, right)
+
+
+def _is_integer(value):
+  if isinstance(value, np.ndarray):
+    return value.dtype.kind == 'i'
+  return type(value) is int
+
+
+def _slice(values, offset, size):
+  first = values[0] + offset
+  last  = values[-1] + offset
+  if not (0 <= first < size and 0 <= last < size):
+    raise VectorFallback('indice')
+  stop = last + (1 if values.step > 0 else -1)
+  return slice(first, stop if stop >= 0 else None, values.step)
+
+
+def _offset(ndx, var):
+  '''
+  Desplazamiento c de un indice i, i + c o i - c. None si no tiene esa forma
+  '''
+  while isinstance(ndx, Grouping):
+    ndx = ndx.expr
+  if isinstance(ndx, VarExpr) and ndx.ident == var:
+    return 0
+  if isinstance(ndx, BinaryOpExpr) and ndx.opr in ('+', '-') and \
+     isinstance(ndx.left, VarExpr) and ndx.left.ident == var and \
+     isinstance(ndx.right, ConstExpr) and type(ndx.right.value) is int:
+    return ndx.right.value if ndx.opr == '+' else -ndx.right.value
+  return None
+
+
+def _supported(expr, var):
+  if isinstance(expr, ConstExpr):
+    return type(expr.value) in (int, float)
+  if isinstance(expr, VarExpr):
+    return True
+  if isinstance(expr, Grouping):
+    return _supported(expr.expr, var)
+  if isinstance(expr, ArrayLoockupExpr):
+    return _offset(expr.expr, var) is not None
+  if isinstance(expr, UnaryOpExpr):
+    return expr.opr == '-' and _supported(expr.expr, var)
+  if isinstance(expr, BinaryOpExpr):
+    return expr.opr in _binops and _supported(expr.left, var) and _supported(expr.right, var)
+  return False
+
+
+def match_vector(node: ForStmt, types, locals):
+  '''
+  Reconoce un ciclo elemento a elemento sin dependencias entre
+  iteraciones. Devuelve un VectorLoop o None.
+  '''
+  loop = match_counted(node, types, locals)
+  if loop is None:
+    return None
+  body = node.stmt
+  if not isinstance(body, CompoundStmt) or body.decls or not body.stmts:
+    return None
+
+  stmts = [ ]
+  for stmt in body.stmts:
+    if not (isinstance(stmt, ExprStmt) and isinstance(stmt.expr, ArrayAssignmentExpr)):
+      return None
+    assign = stmt.expr
+    if _offset(assign.ndx, loop.var) != 0 or not _supported(assign.expr, loop.var):
+      return None
+    stmts.append((assign.ident, assign.expr))
+
+  vector = VectorLoop(loop, stmts)
+  # Un arreglo escrito solo se puede leer en la posicion i, y ningun
+  # nombre puede ser a la vez escalar y arreglo
+  for ident, offset in vector.reads:
+    if ident in vector.written and offset != 0:
+      return None
+  if vector.names & vector.arrays:
+    return None
+  return vector
+
+
+class Vectorizer:
+  '''
+  Marca los ciclos vectorizables con n.vector = VectorLoop
+  '''
+  @classmethod
+  def mark(cls, program: Program):
+    marked = [ ]
+    if np is None:
+      return marked
+    for decl in program.decls:
+      if isinstance(decl, FuncDeclStmt):
+        types, locals = declared_types(decl, program)
+        for node in walk(decl.stmts):
+          if isinstance(node, ForStmt):
+            vector = match_vector(node, types, locals)
+            if vector is not None:
+              node.vector  = vector
+              node.counted = vector.loop
+              marked.append(vector)
+    return marked
+
+
+# ----------------------------------------------------------------------
+# Funciones escalares sobre arreglos completos (builtin 'vectorize')
+#
+class Unsupported(Exception):
+  '''
+  El cuerpo de la funcion tiene algo que FunctionLifter no traduce
+  '''
+
+
+class DataDependent(Unsupported):
+  '''
+  El cuerpo se traduce, pero los valores de esta llamada no: un divisor
+  cero o un argumento fuera del dominio en algun carril, una variable
+  que cambiaria de tipo... Con otros argumentos se puede volver a intentar
+  '''
+
+
+# Builtins matematicos con version en NumPy, y dominio valido
+_ufuncs = {
+  'sqrt' : (lambda x: np.sqrt(x),   lambda x: x >= 0),
+  'sin'  : (lambda x: np.sin(x),    None),
+  'cos'  : (lambda x: np.cos(x),    None),
+  'exp'  : (lambda x: np.exp(x),    None),
+  'log'  : (lambda x: np.log(x),    lambda x: x > 0),
+  'log10': (lambda x: np.log10(x),  lambda x: x > 0),
+  'abs'  : (lambda x: np.fabs(x),   None),
+  'floor': (lambda x: np.floor(x).astype('int64'), None),
+  'ceil' : (lambda x: np.ceil(x).astype('int64'),  None),
+}
+
+_compare = {
+  '==': np.equal,   '!=': np.not_equal,
+  '<' : np.less,    '<=': np.less_equal,
+  '>' : np.greater, '>=': np.greater_equal,
+} if np is not None else { }
+
+
+class FunctionLifter:
+  '''
+  Ejecuta una funcion escalar del usuario sobre todos los elementos de
+  sus argumentos a la vez. Cada variable local es un arreglo con un
+  valor por elemento ("carril") y cada sentencia se ejecuta bajo una
+  mascara con los carriles que llegan a ella: un 'if' divide la
+  mascara, un 'while' itera mientras algun carril cumpla la condicion y
+  'return' y 'break' retiran carriles.
+
+  Se admiten declaraciones, asignaciones, ++/--, if, while, for,
+  break, return y expresiones aritmeticas, de comparacion y logicas
+  con los builtins matematicos. Con cualquier otra cosa (printf,
+  llamadas a funciones, arreglos, escritura de globales...) se lanza
+  Unsupported antes de producir efectos visibles.
+  '''
+  def __init__(self, func, size):
+    self.func   = func
+    self.node   = func.node
+    self.size   = size
+    self.vars   = { }
+    self.done   = np.zeros(size, bool)
+    self.breaks = [ ]
+    self.result = None
+
+  def run(self, args):
+    for param, arg in zip(self.node.params, args):
+      if not isinstance(param, VarDeclStmt):
+        raise Unsupported(param)
+      self.vars[param.ident] = np.array(np.broadcast_to(arg, self.size))
+    self.result = np.zeros(self.size, array_dtype(self.node._type))
+    with np.errstate(all='ignore'):
+      self._exec(self.node.stmts, np.ones(self.size, bool))
+    if not self.done.all():
+      # Carriles que terminan sin 'return'
+      raise DataDependent('return')
+    return self.result
+
+  # Sentencias
+
+  def _live(self, mask):
+    live = mask & ~self.done
+    for brk in self.breaks:
+      live &= ~brk
+    return live
+
+  def _exec(self, n, mask):
+    live = self._live(mask)
+    if not live.any():
+      return
+    if isinstance(n, CompoundStmt):
+      for stmt in n.decls + n.stmts:
+        self._exec(stmt, live)
+    elif isinstance(n, VarDeclStmt):
+      self.vars.setdefault(n.ident, None)
+      if n.expr is not None:
+        self._store(n.ident, self._eval(n.expr, live), live)
+    elif isinstance(n, ExprStmt):
+      self._effect(n.expr, live)
+    elif isinstance(n, IfStmt):
+      cond = self._truthy(self._eval(n.expr, live))
+      self._exec(n.then, live & cond)
+      if n.else_:
+        self._exec(n.else_, live & ~cond)
+    elif isinstance(n, WhileStmt):
+      self._loop(n.expr, n.stmt, None, live)
+    elif isinstance(n, ForStmt):
+      if isinstance(n.init, VarDeclStmt):
+        self._exec(n.init, live)
+      else:
+        self._effect(n.init, live)
+      self._loop(n.cond, n.stmt, n.iter, live)
+    elif isinstance(n, ReturnStmt):
+      value = 0 if not n.expr else self._eval(n.expr, live)
+      self.result[live] = np.broadcast_to(value, self.size)[live]
+      self.done |= live
+    elif isinstance(n, BreakStmt):
+      if not self.breaks:
+        raise Unsupported(n)
+      self.breaks[-1] |= live
+    elif not isinstance(n, NullStmt):
+      raise Unsupported(n)
+
+  def _loop(self, cond, body, iter, live):
+    self.breaks.append(np.zeros(self.size, bool))
+    while True:
+      active = self._live(live)
+      active &= self._truthy(self._eval(cond, active))
+      if not active.any():
+        break
+      self._exec(body, active)
+      if iter is not None:
+        active = self._live(active)
+        if active.any():
+          self._effect(iter, active)
+    self.breaks.pop()
+
+  def _effect(self, n, live):
+    if isinstance(n, VarAssignmentExpr):
+      self._store(n.var, self._eval(n.expr, live), live)
+    elif isinstance(n, OperatorAssign) and isinstance(n.expr0, VarExpr):
+      op = { '+=': '+', '-=': '-', '*=': '*', '/=': '/' }[n.op]
+      self._store(n.expr0.ident, self._arith(op, self._eval(n.expr0, live),
+                                             self._eval(n.expr1, live), live), live)
+    elif isinstance(n, (PreInc, PostInc, PreDec, PostDec)) and isinstance(n.expr, VarExpr):
+      step = 1 if isinstance(n, (PreInc, PostInc)) else -1
+      self._store(n.expr.ident, self._eval(n.expr, live) + step, live)
+    else:
+      raise Unsupported(n)
+
+  def _store(self, name, value, live):
+    if name not in self.vars:
+      # Solo variables locales y parametros
+      raise Unsupported(name)
+    value = np.asarray(value)
+    old = self.vars[name]
+    if old is None:
+      self.vars[name] = np.array(np.broadcast_to(value, self.size))
+      return
+    if old.dtype.kind != value.dtype.kind and (~live & ~self.done).any():
+      # El interprete no convierte tipos al asignar: un carril tendria
+      # un int y otro un float
+      raise DataDependent(name)
+    self.vars[name] = np.where(live, value, old)
+
+  # Expresiones
+
+  def _truthy(self, value):
+    # Como _is_truthy: solo los bool pueden ser falsos
+    value = np.asarray(value)
+    if value.dtype.kind != 'b':
+      return np.ones(self.size, bool)
+    return np.broadcast_to(value, self.size)
+
+  def _eval(self, n, live):
+    if isinstance(n, ConstExpr):
+      if type(n.value) not in (int, float):
+        raise Unsupported(n)
+      return n.value
+    if isinstance(n, Grouping):
+      return self._eval(n.expr, live)
+    if isinstance(n, VarExpr):
+      if n.ident in self.vars:
+        value = self.vars[n.ident]
+        if value is None:
+          # Declarada sin valor y asignada solo en ramas que ningun carril tomo
+          raise DataDependent(n.ident)
+        return value
+      value = self.func.env.get(n.ident)
+      if type(value) not in (int, float, bool):
+        raise Unsupported(n.ident)
+      return value
+    if isinstance(n, UnaryOpExpr):
+      value = self._eval(n.expr, live)
+      if n.opr == '-':
+        return np.negative(value)
+      if n.opr == '!':
+        return ~self._truthy(value)
+      raise Unsupported(n)
+    if isinstance(n, BinaryOpExpr):
+      left  = self._eval(n.left, live)
+      right = self._eval(n.right, live)
+      if n.opr in _compare:
+        return _compare[n.opr](left, right)
+      return self._arith(n.opr, left, right, live)
+    if isinstance(n, LogicalOpExpr):
+      left  = np.asarray(self._eval(n.left, live))
+      right = np.asarray(self._eval(n.right, live))
+      if left.dtype.kind != 'b' or right.dtype.kind != 'b':
+        raise Unsupported(n)
+      return (left | right) if n.opr == '||' else (left & right)
+    if isinstance(n, CallExpr) and n.ident in _ufuncs and len(n.args or []) == 1 \
+       and not isinstance(self.func.env.get(n.ident), type(self.func)):
+      func, domain = _ufuncs[n.ident]
+      arg = self._eval(n.args[0], live)
+      if domain is not None and not np.all(np.broadcast_to(domain(arg), self.size)[live]):
+        # math.sqrt, math.log... fallarian en algun carril
+        raise DataDependent(n)
+      return func(arg)
+    raise Unsupported(n)
+
+  def _arith(self, opr, left, right, live):
+    if opr not in _binops:
+      raise Unsupported(opr)
+    if opr == '+':
+      return np.add(left, right)
+    if opr == '-':
+      return np.subtract(left, right)
+    if opr == '*':
+      return np.multiply(left, right)
+    if np.any(np.broadcast_to(np.asarray(right) == 0, self.size)[live]):
+      raise DataDependent(opr)
+    if opr == '%':
+      return np.remainder(left, right)
+    if _is_integer(left) and _is_integer(right):
+      return np.floor_divide(left, right)
+    return np.true_divide(left, right)
+
+
+def array_dtype(_type):
+  return array_dtypes.get(_type, 'float64')
+
+
+def lift(interp, func, args):
+  '''
+  Aplica func a cada elemento de los argumentos (arreglos del mismo
+  tamano o escalares) y devuelve el arreglo de resultados. Intenta
+  primero FunctionLifter y si no puede llama a la funcion por elemento.
+  '''
+  sizes = { len(arg) for arg in args if isinstance(arg, Array) }
+  size = sizes.pop()
+  if np is not None and getattr(func.node, 'liftable', True) and \
+     all(type(arg) in (int, float, bool) or
+         (isinstance(arg, Array) and isinstance(arg.data, np.ndarray)) for arg in args):
+    try:
+      data = [ arg.data if isinstance(arg, Array) else arg for arg in args ]
+      return Array(func.node._type, FunctionLifter(func, size).run(data))
+    except DataDependent:
+      # Solo esta llamada se hace elemento por elemento
+      pass
+    except Unsupported:
+      # No se vuelve a intentar con esta funcion
+      func.node.liftable = False
+
+  result = new_array(func.node._type, size)
+  for k in range(size):
+    values = [ _element(arg, k) for arg in args ]
+    result[k] = func(interp, *values)
+  return result
+
+
+def _element(arg, k):
+  if isinstance(arg, Array):
+    return arg[k]
+  return arg
@@ -19,9 +19,24 @@ punto de partida.
 Puede volver y refactorizar el sistema de tipos mas tarde.
 '''
 # types.py
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
+from itertools   import islice
 from typing      import Union, List
 
+import array as pyarray
+import io
+import mmap
+import os
+import sys
+
+from MiniCpptypesys import container_type
+
+try:
+  import numpy as np
+except ImportError:       # pragma: no cover
+  np = None
+
 
 @dataclass
 class CObject:
@@ -61,31 +76,607 @@ class Nil(CObject):
     return f'{self.value}'
 
 
-@dataclass
+# Arreglos 'new T[n]' en tiempo de ejecucion. Los elementos viven en un
+# buffer contiguo, sin un objeto por elemento: numpy.ndarray para los
+# tipos numericos (lo que permite vectorizar, ver MiniCppVector) o
+# array.array si NumPy no esta instalado. Los de cadenas son listas.
+array_dtypes = {
+  'int'   : 'int64',
+  'float' : 'float64',
+  'bool'  : 'bool',
+}
+
+array_typecodes = {
+  'int'   : 'q',
+  'float' : 'd',
+}
+
+# Codigos de memoryview.cast para los archivos mapeados sin NumPy
+mapped_typecodes = {
+  'int'   : 'q',
+  'float' : 'd',
+  'bool'  : '?',
+}
+
+array_defaults = {
+  'int'   : 0,
+  'float' : 0.0,
+  'bool'  : False,
+  'str'   : '',
+}
+
+
+class ListView:
+  '''
+  Vista de data[start:end] sobre una lista, sin copiarla
+  '''
+  __slots__ = ('data', 'start', 'size')
+
+  def __init__(self, data, start: int, end: int):
+    self.data  = data
+    self.start = start
+    self.size  = end - start
+
+  def __len__(self):
+    return self.size
+
+  def __getitem__(self, ndx):
+    if isinstance(ndx, slice):
+      start, end, _ = ndx.indices(self.size)
+      return ListView(self.data, self.start + start, self.start + end)
+    if not 0 <= ndx < self.size:
+      raise IndexError(ndx)
+    return self.data[self.start + ndx]
+
+  def __setitem__(self, ndx: int, value):
+    if not 0 <= ndx < self.size:
+      raise IndexError(ndx)
+    self.data[self.start + ndx] = value
+
+
 class Array(CObject):
-  _arr : List[CObject] = field(default_factory=list)
+  '''
+  Arreglo tipado de tamano fijo. len() es O(1).
+
+  Los accesos solo revisan a mano que el indice no sea negativo (en
+  Python seria valido); el limite superior y el tipo del indice los
+  revisa el propio buffer, que lanza IndexError o TypeError.
+  '''
+  __slots__ = ('_type', 'data', '_load')
+
+  # Asignaciones con new_array por tipo: [arreglos, elementos, bytes]
+  allocations = { }
+
+  # Arreglos mapeados con escritura, para bajarlos al archivo al terminar
+  mapped = [ ]
+
+  def __init__(self, _type: str, data):
+    self._type = _type
+    self.data  = data
+    self._load = data.item if np is not None and isinstance(data, np.ndarray) else data.__getitem__
+
+  @classmethod
+  def new(cls, _type: str, size: int):
+    if np is not None and _type in array_dtypes:
+      data = np.zeros(size, array_dtypes[_type])
+    elif _type in array_typecodes:
+      data = pyarray.array(array_typecodes[_type], bytes(8 * size))
+    else:
+      data = [ array_defaults.get(_type) ] * size
+    array = cls(_type, data)
+    stats = cls.allocations.setdefault(_type, [0, 0, 0])
+    stats[0] += 1
+    stats[1] += size
+    stats[2] += array.nbytes
+    return array
+
+  @classmethod
+  def map(cls, _type: str, path: str, mode: str = 'r', size: int = 0):
+    '''
+    Arreglo sobre el contenido de un archivo binario de valores nativos
+    (8 bytes por int o float, 1 por bool), sin copiarlo: las paginas se
+    leen al accederlas. mode 'r' es de solo lectura, 'rw' escribe en el
+    archivo y 'w' lo crea (o trunca) con size elementos en cero.
+    '''
+    itemsize = 1 if _type == 'bool' else 8
+    if mode == 'w':
+      with open(path, 'wb') as file:
+        file.truncate(size * itemsize)
+    nbytes = os.path.getsize(path)
+    if nbytes % itemsize:
+      raise ValueError(f"El tamano de '{path}' no es multiplo de {itemsize} bytes")
+
+    if nbytes == 0:
+      # mmap no admite archivos vacios
+      return cls.new(_type, 0)
+    if np is not None:
+      data = np.memmap(path, array_dtypes[_type], 'r' if mode == 'r' else 'r+')
+    else:
+      with open(path, 'rb' if mode == 'r' else 'r+b') as file:
+        buffer = mmap.mmap(file.fileno(), 0,
+                           access=mmap.ACCESS_READ if mode == 'r' else mmap.ACCESS_WRITE)
+      data = memoryview(buffer).cast(mapped_typecodes[_type])
+    array = cls(_type, data)
+    if mode != 'r':
+      cls.mapped.append(array)
+    return array
+
+  def view(self, start: int, end: int):
+    '''
+    Arreglo que comparte los elementos [start, end) con este
+    '''
+    data = self.data
+    if isinstance(data, pyarray.array):
+      data = memoryview(data)
+    elif isinstance(data, list):
+      return Array(self._type, ListView(data, start, end))
+    return Array(self._type, data[start:end])
+
+  @classmethod
+  def flush_mapped(cls):
+    for array in cls.mapped:
+      if isinstance(array.data, memoryview):
+        array.data.obj.flush()
+      else:
+        array.data.flush()
+    cls.mapped.clear()
+
+  @property
+  def writable(self) -> bool:
+    if isinstance(self.data, memoryview):
+      return not self.data.readonly
+    if np is not None and isinstance(self.data, np.ndarray):
+      return self.data.flags.writeable
+    return True
+
+  @property
+  def numeric(self) -> bool:
+    '''
+    True si los elementos estan en un ndarray de numeros
+    '''
+    return np is not None and isinstance(self.data, np.ndarray) and self.data.dtype.kind in 'bif'
+
+  def __len__(self):
+    return len(self.data)
+
+  def __getitem__(self, ndx: int):
+    if ndx < 0:
+      raise IndexError(ndx)
+    return self._load(ndx)
+
+  def __setitem__(self, ndx: int, value):
+    if ndx < 0:
+      raise IndexError(ndx)
+    if value.__class__ is str and self._type == 'bool':
+      # Las constantes booleanas llegan como 'true'/'false'
+      value = value == 'true'
+    elif value.__class__ is StrView:
+      # Los arreglos de cadenas guardan copias: una vista mantendria viva
+      # la cadena base y no se ordena junto a los str
+      value = str(value)
+    self.data[ndx] = value
+
+  @property
+  def itemsize(self) -> int:
+    if isinstance(self.data, (list, ListView)):
+      return 8        # un puntero por elemento
+    return self.data.itemsize
+
+  @property
+  def nbytes(self) -> int:
+    return self.itemsize * len(self.data)
+
+  def __str__(self):
+    return '[' + ', '.join(str(self._load(k)) for k in range(len(self.data))) + ']'
+
+
+class StrView(CObject):
+  '''
+  Subcadena [start, end) de una cadena (por ejemplo el texto de
+  read_text), sin copiarla. Se comporta como un str en printf, +, ==,
+  size() y como clave de un dict; el texto se copia solo cuando hace
+  falta un str de verdad (str(v))
+  '''
+  __slots__ = ('base', 'start', 'end')
+
+  def __init__(self, base: str, start: int, end: int):
+    self.base  = base
+    self.start = start
+    self.end   = end
+
+  @classmethod
+  def of(cls, text):
+    '''
+    Vista de un str o de otra vista (sobre la misma cadena base)
+    '''
+    if isinstance(text, StrView):
+      return text
+    return cls(text, 0, len(text))
+
+  def __len__(self):
+    return self.end - self.start
+
+  def __eq__(self, other):
+    # Compara en el lugar, sin copiar la subcadena
+    if isinstance(other, StrView):
+      other = str(other)
+    if not isinstance(other, str):
+      return NotImplemented
+    return len(other) == self.end - self.start and self.base.startswith(other, self.start, self.end)
+
+  def __hash__(self):
+    return hash(str(self))
+
+  # Orden de cadenas, para sort y max/min sobre arreglos con vistas
+  def __lt__(self, other):
+    return str(self) < str(other)
+
+  def __le__(self, other):
+    return str(self) <= str(other)
+
+  def __gt__(self, other):
+    return str(self) > str(other)
+
+  def __ge__(self, other):
+    return str(self) >= str(other)
+
+  def __add__(self, other):
+    return str(self) + str(other)
+
+  def __radd__(self, other):
+    return str(other) + str(self)
+
+  def __str__(self):
+    return self.base[self.start:self.end]
+
+
+class Matrix(CObject):
+  '''
+  Matriz densa de float: un ndarray 2-D float64 en orden de filas.
+  Las operaciones (+, -, *, / elemento a elemento, y las funciones
+  matmul, solve...) las ejecuta NumPy sobre el bloque completo.
+  '''
+  __slots__ = ('data',)
+
+  def __init__(self, data):
+    self.data = data
+
+  @classmethod
+  def zeros(cls, rows: int, cols: int):
+    return cls(np.zeros((rows, cols), dtype='float64'))
+
+  @property
+  def rows(self) -> int:
+    return self.data.shape[0]
+
+  @property
+  def cols(self) -> int:
+    return self.data.shape[1]
+
+  @property
+  def shape(self) -> str:
+    return f'{self.rows}x{self.cols}'
+
+  def _index(self, ndx):
+    i, j = ndx
+    # NumPy acepta indices negativos: aqui son un error
+    if not (0 <= i < self.rows and 0 <= j < self.cols):
+      raise IndexError(ndx)
+    return ndx
+
+  def __getitem__(self, ndx):
+    return self.data.item(self._index(ndx))
+
+  def __setitem__(self, ndx, value):
+    self.data[self._index(ndx)] = value
+
+  # Operaciones elemento a elemento; la forma la revisa el interprete
+  def __add__(self, other):
+    return Matrix(self.data + _operand(other))
+
+  def __sub__(self, other):
+    return Matrix(self.data - _operand(other))
+
+  def __mul__(self, other):
+    return Matrix(self.data * _operand(other))
 
-  def append(self, elem: CObject):
-    self._arr.append(elem)
+  __rmul__ = __mul__
+
+  def __truediv__(self, other):
+    return Matrix(self.data / _operand(other))
+
+  def __neg__(self):
+    return Matrix(-self.data)
+
+  def __str__(self):
+    return '\n'.join(' '.join(f'{x:g}' for x in row) for row in self.data.tolist())
+
+
+def _operand(value):
+  return value.data if isinstance(value, Matrix) else value
+
+
+# Tipo de los elementos en el diseno anterior: una lista de CObject
+_boxes = {
+  'int'   : lambda: Number(0),
+  'float' : lambda: Number(0.5),
+  'bool'  : lambda: Bool(False),
+  'str'   : lambda: String('a'),
+}
+
+def boxed_itemsize(_type: str) -> int:
+  '''
+  Bytes por elemento de una lista de CObject: el puntero en la lista,
+  el objeto, su __dict__ y el valor que envuelve
+  '''
+  box = _boxes[_type]()
+  return 8 + sys.getsizeof(box) + sys.getsizeof(box.__dict__) + sys.getsizeof(box.value)
+
+
+def new_array(_type: str, size: int):
+  return Array.new(_type, size)
+
+
+class Container(CObject):
+  '''
+  Contenedor generico (dict<K,V>...). Se crea vacio al declarar la
+  variable y, como los arreglos, se comparte al asignarlo o pasarlo a
+  una funcion. 'params' son los tipos de sus elementos
+  '''
+  __slots__ = ('_type', 'params', 'data')
+
+  def __init__(self, _type, params, data):
+    self._type  = _type
+    self.params = params
+    self.data   = data
+
+  def __len__(self):
+    return len(self.data)
+
+
+class Dict(Container):
+  '''
+  Diccionario de claves int o str: un dict de Python que guarda los
+  valores sin envolver
+  '''
+  __slots__ = ()
+
+  def __init__(self, _type, params):
+    super().__init__(_type, params, {})
+
+  def __str__(self):
+    return '{' + ', '.join(f'{k}: {v}' for k, v in self.data.items()) + '}'
+
+
+class Heap(Container):
+  '''
+  Cola de prioridad: lista con el orden de heapq de tuplas (prioridad,
+  orden de llegada, elemento). El orden de llegada desempata las
+  prioridades iguales y evita comparar los elementos
+  '''
+  __slots__ = ('count',)
+
+  def __init__(self, _type, params):
+    super().__init__(_type, params, [])
+    self.count = 0
+
+  def __str__(self):
+    return '[' + ', '.join(f'{item} ({prio})' for prio, _, item in sorted(self.data)) + ']'
+
+
+class Deque(Container):
+  '''
+  Cola doble: collections.deque, O(1) en los dos extremos
+  '''
+  __slots__ = ()
+
+  def __init__(self, _type, params):
+    super().__init__(_type, params, deque())
+
+  def __str__(self):
+    return '[' + ', '.join(str(item) for item in self.data) + ']'
+
+
+class StrBuf(Container):
+  '''
+  Constructor de cadenas: guarda los fragmentos en una lista y los une
+  una sola vez al pedir la cadena. Agregar es O(1) amortizado, en vez
+  de copiar todo lo acumulado como s = s + t
+  '''
+  __slots__ = ('length',)
+
+  def __init__(self, _type, params):
+    super().__init__(_type, params, [])
+    self.length = 0
+
+  def append(self, text: str):
+    self.data.append(text)
+    self.length += len(text)
+
+  def value(self) -> str:
+    if len(self.data) > 1:
+      # Se conserva la cadena unida: pedirla de nuevo no la rehace
+      self.data[:] = [ ''.join(self.data) ]
+    return self.data[0] if self.data else ''
+
+  def clear(self):
+    self.data.clear()
+    self.length = 0
 
   def __len__(self):
-    return len(self._arr)
+    return self.length
+
+  def __str__(self):
+    return self.value()
+
+
+_containers = {
+  'dict'  : Dict,
+  'heap'  : Heap,
+  'deque' : Deque,
+  'strbuf': StrBuf,
+}
+
+def new_container(_type: str):
+  '''
+  Contenedor vacio del tipo declarado o None si _type no es un contenedor
+  '''
+  parts = container_type(_type)
+  if parts is None:
+    return None
+  kind, params = parts
+  return _containers[kind](_type, params)
+
+
+class File(CObject):
+  '''
+  Archivo abierto con open(). Se lee y se escribe en binario a traves
+  de un buffer de BUFSIZE bytes: read_line decodifica cada linea y
+  read_into copia los bytes directo al buffer de un arreglo, sin pasar
+  por objetos intermedios. En modo 'm' el archivo se mapea en memoria,
+  solo para lectura, y las lecturas salen del mapa
+  '''
+  __slots__ = ('path', 'mode', 'file', 'eof')
+
+  BUFSIZE = 1 << 20
+
+  modes = {
+    'r' : 'rb',
+    'w' : 'wb',
+    'a' : 'ab',
+    'm' : 'rb',
+  }
+
+  # Archivos abiertos, para cerrarlos (y bajar lo escrito) al terminar
+  opened = [ ]
+
+  # Cada handle es un archivo distinto: el __eq__ de dataclass de
+  # CObject haria iguales a todos
+  __eq__   = object.__eq__
+  __hash__ = object.__hash__
 
-  def __setitem__(self, elem:CObject, idx: int):
-    if not 0 <= idx < len(self._arr):
-      raise IndexError('idx esta fuera de limite')
-    self._arr[idx] = elem
+  def __init__(self, path: str, mode: str = 'r'):
+    self.path = path
+    self.mode = mode
+    self.eof  = False
+    if mode == 'm':
+      with open(path, 'rb') as file:
+        # mmap no admite archivos vacios
+        if os.fstat(file.fileno()).st_size == 0:
+          self.file = io.BytesIO()
+        else:
+          self.file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+      self.file = open(path, self.modes[mode], buffering=self.BUFSIZE)
+    File.opened.append(self)
 
-  def __getitem__(self, idx: int):
-    if not 0 <= idx < len(self._arr):
-      raise IndexError('idx esta fuera de limite')
-    return self._arr[idx]
+  @property
+  def closed(self) -> bool:
+    return self.file is None
+
+  @property
+  def readable(self) -> bool:
+    return self.mode in ('r', 'm')
+
+  def read_line(self) -> str:
+    '''
+    Siguiente linea sin el '\\n' final. Al llegar al final del archivo
+    retorna '' y deja eof en True
+    '''
+    line = self.file.readline()
+    if not line:
+      self.eof = True
+      return ''
+    if line[-1] == 10:
+      line = line[:-1]
+    return line.decode()
+
+  def read_lines(self, count: int) -> list:
+    '''
+    Hasta count lineas seguidas, en bytes y con su '\\n'. Si no queda
+    ninguna deja eof en True
+    '''
+    lines = list(islice(iter(self.file.readline, b''), count))
+    if count and not lines:
+      self.eof = True
+    return lines
+
+  def read_into(self, data, itemsize: int = 0) -> int:
+    '''
+    Llena data (un buffer de valores nativos o de registros de itemsize
+    bytes) desde la posicion actual y retorna el numero de elementos
+    leidos. Un elemento incompleto al final del archivo no se cuenta ni
+    se consume
+    '''
+    buffer = memoryview(data)
+    itemsize = itemsize or buffer.itemsize
+    buffer = buffer.cast('B')
+    if isinstance(self.file, mmap.mmap):
+      pos = self.file.tell()
+      nbytes = min(len(buffer), len(self.file) - pos)
+      with memoryview(self.file) as mapped:
+        buffer[:nbytes] = mapped[pos:pos + nbytes]
+      self.file.seek(pos + nbytes)
+    else:
+      nbytes = self.file.readinto(buffer) or 0
+    if nbytes % itemsize:
+      self.file.seek(-(nbytes % itemsize), os.SEEK_CUR)
+    if nbytes == 0 and len(buffer) > 0:
+      self.eof = True
+    return nbytes // itemsize
+
+  def write(self, text: str):
+    self.file.write(text.encode())
+
+  def write_from(self, data):
+    self.file.write(memoryview(data).cast('B'))
+
+  def close(self):
+    if self.file is not None:
+      self.file.close()
+      self.file = None
+      File.opened = [ file for file in File.opened if file is not self ]
+
+  @classmethod
+  def close_all(cls):
+    for file in list(cls.opened):
+      file.close()
 
   def __str__(self):
-    output : str = '['
-    if len(self._arr) != 0:
-      for elem in self._arr:
-        output += str(elem) + ', '
-      output = output[:-2]
-    output += ']'
-    return output
+    return f'<file {self.path} ({self.mode})>'
+
+
+class LRUCache:
+  '''
+  Cache acotado con politica LRU y contadores de aciertos/fallos
+  '''
+  _missing = object()
+
+  def __init__(self, maxsize: int):
+    self.maxsize = maxsize
+    self.hits    = 0
+    self.misses  = 0
+    self._data   = OrderedDict()
+
+  def __len__(self):
+    return len(self._data)
+
+  def get(self, key):
+    value = self._data.get(key, self._missing)
+    if value is self._missing:
+      self.misses += 1
+      return self._missing
+    self.hits += 1
+    self._data.move_to_end(key)
+    return value
+
+  def put(self, key, value):
+    self._data[key] = value
+    self._data.move_to_end(key)
+    if len(self._data) > self.maxsize:
+      self._data.popitem(last=False)
+
+  @property
+  def hit_rate(self) -> float:
+    total = self.hits + self.misses
+    return self.hits / total if total else 0.0
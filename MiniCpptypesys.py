@@ -56,6 +56,25 @@ _binary_ops = {
     ('||', 'bool', 'bool') : 'bool',
     ('==', 'bool', 'bool') : 'bool',
     ('!=', 'bool', 'bool') : 'bool',
+
+    # Cadenas
+    ('+',  'str', 'str') : 'str',
+    ('==', 'str', 'str') : 'bool',
+    ('!=', 'str', 'str') : 'bool',
+
+    # Matrices: elemento a elemento entre matrices de la misma forma
+    # (el producto matricial es matmul) y escalado por un numero
+    ('+', 'matrix', 'matrix') : 'matrix',
+    ('-', 'matrix', 'matrix') : 'matrix',
+    ('*', 'matrix', 'matrix') : 'matrix',
+    ('/', 'matrix', 'matrix') : 'matrix',
+
+    ('*', 'matrix', 'float') : 'matrix',
+    ('*', 'matrix', 'int')   : 'matrix',
+    ('*', 'float', 'matrix') : 'matrix',
+    ('*', 'int', 'matrix')   : 'matrix',
+    ('/', 'matrix', 'float') : 'matrix',
+    ('/', 'matrix', 'int')   : 'matrix',
 }
 
 _unary_ops = {
@@ -69,8 +88,290 @@ _unary_ops = {
 
     # Bools
     ('!', 'bool') : 'bool',
+
+    # Matrices
+    ('-', 'matrix') : 'matrix',
+}
+
+# Tipo resultante de las funciones predefinidas (ver MiniCppBuiltins).
+# Los argumentos los valida cada builtin al ejecutarse (CallError)
+_builtin_types = {
+    'chr'      : 'str',
+    'clock'    : 'float',
+    'format'   : 'str',
+    'input'    : 'str',
+    'int'      : 'int',
+    'ord'      : 'int',
+    'read_csv' : 'int',
+    'read_records': 'int',
+    'read_text': 'str',
+    'scan_array': 'int',
+    'write_text': 'void',
+    # Arreglo del tipo que reciben como segundo argumento (ver Checker)
+    'map_array': None,
+    'map_create': None,
+    'str'      : 'str',
+
+    'close'      : 'void',
+    'eof'        : 'bool',
+    'open'       : 'file',
+    'read_bytes' : 'int',
+    'read_line'  : 'str',
+    'write'      : 'void',
+    'write_bytes': 'void',
+    'write_line' : 'void',
+
+    'abs'      : 'float',
+    'ceil'     : 'int',
+    'cos'      : 'float',
+    'exp'      : 'float',
+    'floor'    : 'int',
+    'log'      : 'float',
+    'log10'    : 'float',
+    'pow'      : 'float',
+    'sin'      : 'float',
+    'sqrt'     : 'float',
+
+    # Las vistas de substr y strip son de tipo str
+    'char_at'  : 'int',
+    'find'     : 'int',
+    'join'     : 'str',
+    'split'    : 'str',
+    'strip'    : 'str',
+    'substr'   : 'str',
+
+    're_findall': 'str',
+    're_match'  : 'bool',
+    're_search' : 'int',
+    're_sub'    : 'str',
+
+    'argmax'   : 'int',
+    'argmin'   : 'int',
+    'copy'     : 'void',
+    'fill'     : 'void',
+    'sort'     : 'void',
+    # dot, max, min, sum y slice tienen el tipo de los elementos del
+    # arreglo y vectorize el de la funcion que recibe (ver Checker)
+    'dot'      : None,
+    'max'      : None,
+    'min'      : None,
+    'slice'    : None,
+    'sum'      : None,
+    'vectorize': None,
+
+    'mean'     : 'float',
+    'median'   : 'float',
+    'mode'     : None,
+    'std'      : 'float',
+
+    'rand_float'  : 'float',
+    'rand_floats' : 'void',
+    'rand_int'    : 'int',
+    'rand_ints'   : 'void',
+    'rand_normal' : 'float',
+    'rand_normals': 'void',
+    'rand_seed'   : 'void',
+
+    'cols'     : 'int',
+    'flatten'  : 'float',
+    'identity' : 'matrix',
+    'matmul'   : 'matrix',
+    'mget'     : 'float',
+    'mset'     : 'void',
+    'reshape'  : 'matrix',
+    'rows'     : 'int',
+    'solve'    : 'matrix',
+    'transpose': 'matrix',
+    'zeros'    : 'matrix',
+
+    'dict_del'   : 'bool',
+    'dict_has'   : 'bool',
+    'dict_put'   : 'void',
+    # dict_get, dict_keys y dict_values tienen el tipo de los elementos
+    # del contenedor (ver _builtin_elements)
+    'dict_get'   : None,
+    'dict_keys'  : None,
+    'dict_values': None,
+
+    'heap_prio'  : 'float',
+    'heap_push'  : 'void',
+    'heap_peek'  : None,
+    'heap_pop'   : None,
+
+    'deque_push_back' : 'void',
+    'deque_push_front': 'void',
+    'sb_append'  : 'void',
+    'sb_clear'   : 'void',
+    'sb_str'     : 'str',
+    'deque_back'      : None,
+    'deque_front'     : None,
+    'deque_pop_back'  : None,
+    'deque_pop_front' : None,
+}
+
+# Tipos de los argumentos de las funciones predefinidas que los fijan.
+# Un arreglo se anota con el tipo de sus elementos (reshape recibe un
+# arreglo float); un int se acepta donde se pide float. El nombre de un
+# contenedor ('dict') acepta cualquier instancia y un entero k es el
+# k-esimo parametro del contenedor que llega como 1er argumento
+_builtin_params = {
+    'char_at'  : ('str', 'int'),
+    'find'     : ('str', 'str', 'int'),
+    'join'     : ('str', 'str'),
+    'split'    : ('str', 'str'),
+    'strip'    : ('str',),
+    'substr'   : ('str', 'int', 'int'),
+    'write_text': ('str', 'str'),
+
+    # read_bytes y write_bytes reciben un arreglo de cualquier tipo nativo
+    'close'      : ('file',),
+    'eof'        : ('file',),
+    'open'       : ('str', 'str'),
+    'read_bytes' : ('file',),
+    'read_csv'   : ('file', 'str'),
+    'read_line'  : ('file',),
+    'read_records': ('file', 'str'),
+    'write'      : ('file', 'str'),
+    'write_bytes': ('file',),
+    'write_line' : ('file', 'str'),
+
+    're_findall': ('str', 'str'),
+    're_match'  : ('str', 'str'),
+    're_search' : ('str', 'str'),
+    're_sub'    : ('str', 'str', 'str'),
+
+    'rand_float'  : ('float', 'float'),
+    'rand_floats' : ('float', 'float', 'float'),
+    'rand_int'    : ('int', 'int'),
+    'rand_ints'   : ('int', 'int', 'int'),
+    'rand_normal' : ('float', 'float'),
+    'rand_normals': ('float', 'float', 'float'),
+    'rand_seed'   : ('int',),
+
+    'cols'     : ('matrix',),
+    'flatten'  : ('matrix',),
+    'identity' : ('int',),
+    'matmul'   : ('matrix', 'matrix'),
+    'mget'     : ('matrix', 'int', 'int'),
+    'mset'     : ('matrix', 'int', 'int', 'float'),
+    'reshape'  : ('float', 'int', 'int'),
+    'rows'     : ('matrix',),
+    'solve'    : ('matrix', 'matrix'),
+    'transpose': ('matrix',),
+    'zeros'    : ('int', 'int'),
+
+    'dict_del'   : ('dict', 0),
+    'dict_get'   : ('dict', 0, 1),
+    'dict_has'   : ('dict', 0),
+    'dict_keys'  : ('dict',),
+    'dict_put'   : ('dict', 0, 1),
+    'dict_values': ('dict',),
+
+    'heap_peek'  : ('heap',),
+    'heap_pop'   : ('heap',),
+    'heap_prio'  : ('heap',),
+    'heap_push'  : ('heap', 'float', 0),
+
+    'deque_back'      : ('deque',),
+    'deque_front'     : ('deque',),
+    'deque_pop_back'  : ('deque',),
+    'deque_pop_front' : ('deque',),
+    'deque_push_back' : ('deque', 0),
+    'deque_push_front': ('deque', 0),
+
+    'sb_append'  : ('strbuf', 'str'),
+    'sb_clear'   : ('strbuf',),
+    'sb_str'     : ('strbuf',),
+}
+
+# Funciones cuyo resultado es el k-esimo parametro del contenedor que
+# reciben como 1er argumento (dict_keys devuelve un arreglo de claves)
+_builtin_elements = {
+    'dict_get'   : 1,
+    'dict_keys'  : 0,
+    'dict_values': 1,
+    'heap_peek'  : 0,
+    'heap_pop'   : 0,
+    'deque_back'      : 0,
+    'deque_front'     : 0,
+    'deque_pop_back'  : 0,
+    'deque_pop_front' : 0,
 }
 
+# Contenedores genericos. El tipo se escribe como en la declaracion,
+# sin espacios: 'dict<str,int>'. Numero de parametros de cada uno
+container_kinds = {
+    'dict'  : 2,    # clave (int o str), valor
+    'heap'  : 1,    # elemento; la prioridad es un float
+    'deque' : 1,    # elemento
+    'strbuf': 0,    # fragmentos de texto
+}
+
+def container_type(name):
+    '''
+    Descompone el nombre de un tipo contenedor: 'dict<str,int>' ->
+    ('dict', ('str', 'int')). Retorna None si name no es un contenedor
+    '''
+    if not isinstance(name, str):
+        return None
+    if container_kinds.get(name) == 0:
+        return name, ()
+    if not name.endswith('>'):
+        return None
+    kind, _, rest = name.partition('<')
+    params, depth, start = [], 0, 0
+    for k, c in enumerate(rest[:-1]):
+        if c == '<':
+            depth += 1
+        elif c == '>':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            params.append(rest[start:k])
+            start = k + 1
+    params.append(rest[start:-1])
+    if container_kinds.get(kind) != len(params):
+        return None
+    return kind, tuple(params)
+
+# Tipos de los campos de read_csv y, con su tamano en bytes, de los
+# registros binarios de read_records
+csv_field_types = {'int', 'float', 'str'}
+record_field_types = {
+    'int'   : 8,
+    'float' : 8,
+    'bool'  : 1,
+}
+
+def record_fields(spec, binary=False):
+    '''
+    Descompone la descripcion de los campos de un registro: 'int,-,float'
+    -> (',', [('int', True), (None, False), ('float', True)]). Un '-'
+    delante del tipo salta el campo; en un CSV basta el '-'. Los campos
+    se separan como las columnas del CSV: 'int;-;float' lee un archivo
+    separado por ';'. Lanza ValueError si spec es incorrecta
+    '''
+    delim = next((c for c in spec if not (c.isalpha() or c == '-')), ',')
+    valid = record_field_types if binary else csv_field_types
+    fields = []
+    for name in spec.split(delim):
+        keep = not name.startswith('-')
+        _type = name[0 if keep else 1:] or None
+        if _type is None and (keep or binary):
+            raise ValueError(f"falta el tipo de un campo en '{spec}'")
+        if _type is not None and _type not in valid:
+            raise ValueError(f"tipo de campo '{_type}' no soportado: debe ser {', '.join(sorted(valid))}")
+        fields.append((_type, keep))
+    if not any(keep for _, keep in fields):
+        raise ValueError(f"'{spec}' no selecciona ningun campo")
+    return delim, fields
+
+def is_reference_type(name):
+    '''
+    Matrices, archivos y contenedores: objetos que se comparten al
+    asignarlos o pasarlos a una funcion, como los arreglos
+    '''
+    return name in ('matrix', 'file') or container_type(name) is not None
+
 def loockup_type(name):
     '''
     Dado el nombre de un tipo primitivo, se busca el objeto "type" apropiado.
@@ -94,4 +395,35 @@ def check_unary_op(op, expr):
     Revisa si una operacion unaria es permitida o no. Retorna el type
     resultante or None si no es soportado
     '''
-    return _unary_ops.get((op, expr))
\ No newline at end of file
+    return _unary_ops.get((op, expr))
+
+def check_builtin_call(name):
+    '''
+    Retorna el type resultante de llamar la funcion predefinida name o
+    None si no existe
+    '''
+    return _builtin_types.get(name)
+
+def check_builtin_params(name):
+    '''
+    Retorna la tupla de tipos de los argumentos de la funcion predefinida
+    name o None si no los fija
+    '''
+    return _builtin_params.get(name)
+
+def check_builtin_element(name):
+    '''
+    Retorna el indice del parametro del contenedor que devuelve la
+    funcion predefinida name o None
+    '''
+    return _builtin_elements.get(name)
+
+def check_param_type(param, arg):
+    '''
+    Revisa si un argumento de tipo arg es valido para un parametro de
+    tipo param de una funcion predefinida
+    '''
+    if param == arg or (param == 'float' and arg == 'int'):
+        return True
+    parts = container_type(arg)
+    return parts is not None and parts[0] == param